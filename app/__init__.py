@@ -1,16 +1,70 @@
+import os
+import sys
+import threading
 from flask import Flask
 from app.modules.scheduler import start_scheduler
+from app.modules.outbox import outbox_worker
+from app.setup.config import Config
 
-def create_app():
+_warm_lock = threading.Lock()
+_warmed_up = False
+
+def warm_up():
+    """งานตอนเริ่ม process: migration + scheduler (โหมด lazy จะเรียกตอน request แรก หลัง fork แล้ว)"""
+    global _warmed_up
+    with _warm_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+
+    # สร้าง index ที่ยังไม่มี (idempotent)
+    if Config.AUTO_MIGRATE:
+        from app.setup.migrations import migrate
+        try:
+            migrate()
+        except Exception as e:
+            print(f"Migration Error: {e}")
+    
+    # โหลด index ค้นชื่อสำหรับ #check
+    from app.modules.user_search import user_search
+    try:
+        user_search.sync(force=True)
+    except Exception as e:
+        print(f"User Search Index Error: {e}")
+
+    # Start Scheduler
+    start_scheduler()
+
+    # ส่ง push notification ที่ค้างใน outbox (รวมของ process ก่อนรีสตาร์ท)
+    outbox_worker.start()
+
+def _is_cli_command():
+    """`flask <คำสั่ง>` (เช่น export / send-reminders) ที่ไม่ใช่ `flask run` -> ไม่ต้อง migrate / เปิด scheduler / outbox worker"""
+    argv = sys.argv or [""]
+    is_flask = os.path.basename(argv[0]) == "flask" or argv[0].endswith(os.path.join("flask", "__main__.py"))
+    return is_flask and "run" not in argv[1:]
+
+def create_app(lazy=None):
     app = Flask(__name__)
     
     # Register Blueprint (Routes)
     from app.routes import bp
     app.register_blueprint(bp)
-    
-    # Start Scheduler
-    start_scheduler()
+
+    # CLI: flask db-migrate / flask db-verify
+    from app.commands import register_commands
+    register_commands(app)
+
+    if _is_cli_command():
+        # คำสั่ง CLI ต่อ DB / LINE เองเมื่อใช้ (ProcessLocal) ไม่ต้องมีงานเบื้องหลังของ web server
+        return app
+
+    if Config.LAZY_STARTUP if lazy is None else lazy:
+        # ยังไม่ต่อ DB / ไม่เปิด scheduler จนกว่าจะมี request แรกใน process นี้
+        app.before_request(warm_up)
+    else:
+        warm_up()
     
     return app
 
-app = create_app()
\ No newline at end of file
+app = create_app()
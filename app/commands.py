@@ -0,0 +1,85 @@
+import click
+from app.setup.migrations import migrate, verify_indexes
+
+@click.command("db-migrate")
+def db_migrate():
+    """สร้าง index + รัน data migration (รันซ้ำได้)"""
+    result = migrate()
+    if result["skipped"]:
+        click.echo("another process is migrating, try again later")
+        raise SystemExit(1)
+    for col_name, indexes in result["indexes"].items():
+        click.echo(f"{col_name}: {indexes}")
+    click.echo(f"migrations: {result['migrations'] or 'up to date'}")
+    for col_name, indexes in result["post_migration_indexes"].items():
+        click.echo(f"{col_name}: {indexes}")
+    for c in result["nickname_collisions"]:
+        click.echo(f"nickname collision '{c['_id']}': {', '.join(c['user_ids'])}")
+    if result["nickname_collisions"]:
+        raise SystemExit(1)
+
+@click.command("db-verify")
+def db_verify():
+    """เช็คด้วย explain() ว่า query หลักใช้ index ทั้งหมด"""
+    failed = False
+    for name, ok, stages in verify_indexes():
+        click.echo(f"{'✅' if ok else '❌'} {name}: {' <- '.join(stages)}")
+        failed = failed or not ok
+    if failed:
+        raise SystemExit(1)
+
+@click.command("send-reminders")
+@click.option("--dry-run", is_flag=True, help="แสดงแผนการส่ง (จำนวนชุด/ผู้รับ) โดยไม่ส่งจริง")
+def send_reminders_command(dry_run):
+    """ส่ง reminder รายคนให้คนที่ค้างชำระ / ใกล้ครบกำหนด ผ่าน LINE multicast"""
+    from app.modules.reminders import send_reminders
+    report = send_reminders(dry_run=dry_run)
+    for batch in report.get("plan", []):
+        click.echo(f"[{batch['recipients']} users] {batch['text']}")
+    click.echo(f"batches: {report['batches']}, recipients: {report['recipients']}, failed: {report['failed_batches']}")
+
+@click.command("ledger-replay")
+@click.option("--apply", "apply_changes", is_flag=True, help="เขียน next_due_date ที่คำนวณใหม่ลง DB (ไม่ใส่ = ดู diff อย่างเดียว)")
+@click.option("--run-id", default=None, help="ชื่อรอบ สำหรับบันทึก checkpoint / ทำต่อจากรอบที่ค้าง")
+@click.option("--batch-users", default=500, show_default=True)
+def ledger_replay(apply_changes, run_id, batch_users):
+    """คำนวณ next_due_date ของทุก user ใหม่จากประวัติรายการที่อนุมัติแล้ว"""
+    from app.modules.ledger import replay_ledger
+    report = replay_ledger(dry_run=not apply_changes, run_id=run_id, batch_users=batch_users)
+    for diff in report.get("diffs", []):
+        click.echo(f"{diff['user_id']}: {diff['stored']} -> {diff['replayed']}")
+    click.echo(
+        f"users: {report['users']}, transactions: {report['transactions']}, "
+        f"changed: {report['changed']}, written: {report['written']}"
+    )
+
+@click.command("export")
+@click.argument("kind", type=click.Choice(["transactions", "users"]))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json"]), default="csv", show_default=True)
+@click.option("--from", "start", type=click.DateTime(["%Y-%m-%d"]), default=None, help="ตั้งแต่วันที่ (รวม)")
+@click.option("--to", "end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="ถึงวันที่ (ไม่รวม)")
+@click.option("--status", default=None, help="เฉพาะ transactions เช่น completed / pending / rejected")
+@click.option("--gzip", is_flag=True, help="บีบอัดเป็น .gz")
+@click.option("-o", "--output", default=None, help="ไฟล์ปลายทาง (ไม่ใส่ = ตั้งชื่อให้อัตโนมัติ, - = stdout)")
+def export_command(kind, fmt, start, end, status, gzip, output):
+    """Export ข้อมูลแบบ stream (หน่วยความจำคงที่) สำหรับกระทบยอด"""
+    from app.modules.export import export_stream, export_filename
+    output = output or export_filename(kind, fmt, gzip)
+    stream = click.get_binary_stream("stdout") if output == "-" else open(output, "wb")
+    written = 0
+    try:
+        for chunk in export_stream(kind, fmt, start, end, status, gzip):
+            stream.write(chunk)
+            written += len(chunk)
+    finally:
+        if output != "-":
+            stream.close()
+    if output != "-":
+        click.echo(f"{output}: {written} bytes")
+
+def register_commands(app):
+    app.cli.add_command(db_migrate)
+    app.cli.add_command(db_verify)
+    app.cli.add_command(send_reminders_command)
+    app.cli.add_command(ledger_replay)
+    app.cli.add_command(export_command)
@@ -0,0 +1,65 @@
+import threading
+import time
+from datetime import timedelta
+from app.setup.config import Config
+from app.setup.database import find_slip_hash, iter_slip_hashes
+from app.utils.bktree import BKTree
+from app.utils.watermark import Watermark
+
+# ดึง hash ใหม่จาก worker อื่นไม่บ่อยกว่านี้ (วินาที)
+SYNC_INTERVAL = 5
+# ดึงย้อนหลังซ้อนกับรอบก่อน (hash ที่ worker อื่น insert ช้ากว่า created_at ของมัน)
+SYNC_OVERLAP = timedelta(minutes=1)
+
+class SlipHashIndex:
+    """
+    index ของ perceptual hash ในหน่วยความจำ (BK-tree) สำหรับหาสลิปที่ "เกือบเหมือน" กัน
+    สร้างครั้งแรกตอนใช้งาน แล้วดึงเฉพาะ hash ใหม่จาก MongoDB เป็นระยะ
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self._watermark = Watermark(SYNC_OVERLAP)
+        self._last_sync = 0
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._last_sync < SYNC_INTERVAL:
+            return
+        with self._lock:
+            if now - self._last_sync < SYNC_INTERVAL:
+                return
+            for doc in iter_slip_hashes(self._watermark.since()):
+                if self._watermark.is_new(doc["_id"], doc.get("created_at")) and doc.get("phash"):
+                    self._tree.add(int(doc["phash"], 16), doc["_id"])
+            self._watermark.prune()
+            self._last_sync = now
+
+    def find_similar(self, phash):
+        """คืนค่า document ของสลิปที่ใกล้เคียงที่สุด (ที่ยังมีอยู่ใน MongoDB) หรือ None"""
+        self._sync()
+        with self._lock:
+            matches = self._tree.search(int(phash, 16), self.max_distance)
+        for _, _, sha256 in matches:
+            # entry ที่ถูกลบไปแล้ว (เช่น รายการถูกปฏิเสธ) ยังค้างใน tree ได้ -> เช็คกับ DB อีกรอบ
+            doc = find_slip_hash(sha256)
+            if doc:
+                return doc
+        return None
+
+slip_hash_index = SlipHashIndex(Config.SLIP_PHASH_DISTANCE)
+
+def find_duplicate_slip(sha256):
+    """สลิปที่เคยใช้แจ้งโอนแล้ว (ไฟล์เดียวกันทุก byte) -> ปฏิเสธได้ทันที"""
+    return find_slip_hash(sha256)
+
+def find_similar_slip(phash):
+    """
+    สลิปที่ "หน้าตาคล้าย" สลิปเดิม (perceptual hash ใกล้กัน) -> ใช้เตือนแอดมินเท่านั้น ห้ามปฏิเสธเอง
+    สลิปจากแอปธนาคารเดียวกันมี layout เหมือนกันมาก ต่างกันแค่ตัวเลข/ชื่อ จึงได้ hash ใกล้กันแม้เป็นคนละรายการ
+    """
+    if not phash:
+        return None
+    return slip_hash_index.find_similar(phash)
@@ -0,0 +1,78 @@
+import io
+import csv
+import json
+import zlib
+from datetime import datetime
+from app.setup.database import iter_transactions_for_export, iter_users_for_export
+
+# คอลัมน์ของแต่ละชุดข้อมูล (ลำดับตามไฟล์ CSV)
+EXPORT_FIELDS = {
+    "transactions": [
+        "_id", "uid", "nickname", "amount", "cnt_month", "billing", "period_start", "period_end",
+        "status", "created_at", "approved_at", "rejected_at",
+    ],
+    "users": [
+        "user_id", "nickname", "first_name", "last_name", "tel_number", "email",
+        "next_due_date", "last_transaction_id", "registered_at",
+    ],
+}
+FLUSH_BYTES = 64 * 1024
+
+def iter_rows(kind, start=None, end=None, status=None):
+    if kind == "transactions":
+        return iter_transactions_for_export(start, end, status)
+    if kind == "users":
+        return iter_users_for_export(start, end)
+    raise ValueError(f"ไม่รู้จักชุดข้อมูล '{kind}' (มี: {', '.join(EXPORT_FIELDS)})")
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def iter_csv(rows, fields):
+    """แปลง row เป็น CSV ทีละก้อน (~64KB) แบบ utf-8-sig ให้ Excel อ่านภาษาไทยได้"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_value(row.get(f)) for f in fields])
+        if buf.tell() >= FLUSH_BYTES:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode()
+
+def iter_json(rows, fields):
+    """JSON Lines (1 บรรทัดต่อ 1 row) -> stream ได้โดยไม่ต้องถือทั้ง array"""
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps({f: _value(row.get(f)) for f in fields}, ensure_ascii=False, default=str) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+    yield "".join(chunk).encode()
+
+def gzip_stream(chunks):
+    """บีบอัดเป็น gzip ระหว่าง stream (wbits=31 = gzip header)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(kind, fmt="csv", start=None, end=None, status=None, gzip=False):
+    """คืนค่า generator ของ bytes สำหรับ export ทั้งชุด (ใช้ได้ทั้ง HTTP response และเขียนไฟล์)"""
+    if fmt not in ("csv", "json"):
+        raise ValueError("format ต้องเป็น csv หรือ json")
+    fields = EXPORT_FIELDS.get(kind)
+    rows = iter_rows(kind, start, end, status)
+    chunks = iter_csv(rows, fields) if fmt == "csv" else iter_json(rows, fields)
+    return gzip_stream(chunks) if gzip else chunks
+
+def export_filename(kind, fmt, gzip=False):
+    ext = "csv" if fmt == "csv" else "jsonl"
+    return f"{kind}-{datetime.now():%Y%m%d-%H%M%S}.{ext}" + (".gz" if gzip else "")
@@ -1,6 +1,7 @@
-import os
 import io
+import os
 import uuid
+import hashlib
 from datetime import datetime, timedelta
 from linebot.models import (
     MessageEvent, TextMessage, TextSendMessage, ImageMessage,
@@ -8,140 +9,184 @@ from linebot.models import (
 )
 from app.modules.line_api import line_bot_api, handler
 from app.setup.database import (
-    users_col, get_user, save_slip_image, register_user, 
-    check_is_registered, save_temp_slip_id, find_users_by_nickname, 
-    check_nickname_available, create_transaction
+    get_user, clear_temp_slip, save_slip_image, register_user, 
+    check_is_registered, save_temp_slip_id, 
+    check_nickname_available, create_transaction,
+    delete_file_from_storage, save_slip_hash, get_overdue_report, get_billing_rollup
 )
+from app.modules.duplicates import find_duplicate_slip, find_similar_slip
+from app.modules.outbox import notify, outbox_worker
+from app.modules.router import CommandRouter
+from app.modules.user_search import user_search
+from app.modules.previews import schedule_preview
 from app.setup.config import Config
-from app.utils.date_time import get_thai_month_year, parse_month_year, calculate_next_due_date_from_text
-from app.utils.validators import validate_slip_format
+from app.setup.storage import CHUNK_SIZE as SLIP_CHUNK_SIZE
+from app.utils.date_time import get_thai_time, get_thai_month_year
+from app.utils.validators import validate_slip_format, normalize_nickname
+from app.utils.image import dhash
 from app.ui.flex_messages import get_main_menu_flex, create_admin_flex
+from app.ui.text_messages import format_overdue_report, format_billing_report
+from app.utils.billing_period import parse_billing_period
+
+def require_registration(user_id, reply_token):
+    if not check_is_registered(user_id):
+        reply_txt = (
+            "⛔️ พี่ ๆ ลงทะเบียนกับน้องฝอยก่อนน้า\n\n"
+            "พิมพ์ตามรูปแบบนี้นะคับ:\n"
+            "#regis\n"
+            "[ชื่อจริง] [นามสกุล]\n"
+            "[ชื่อเล่น]\n"
+            "[เบอร์]\n"
+            "[เมล]"
+        )
+        line_bot_api.reply_message(reply_token, TextSendMessage(text=reply_txt))
+        return False # Not registered
+    return True # Registered
+
+router = CommandRouter(require_registration)
+
+@handler.filter
+def skip_chatter(event):
+    # ข้อความแชททั่วไปในกลุ่มไม่ต้องผ่าน dedup (ไม่ต้องเขียน webhook_events ทุกข้อความ)
+    if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+        return router.matches(event.message.text.strip())
+    return True
 
 @handler.add(MessageEvent, message=TextMessage)
 def handle_text_message(event):
-    msg = event.message.text.strip()
-    user_id = event.source.user_id
-    is_group = event.source.type == "group"
-
-    # --- Admin Commands ---
-    if msg.startswith("#check") or msg in ["MyID", "MyGroup"]:
-        if user_id != Config.ADMIN_USER_ID: return
-
-        if msg.startswith("#check"):
-            try:
-                target_nick = msg.split()[1]
-                users = find_users_by_nickname(target_nick)
-                if not users:
-                    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"❌ ไม่พบบัญชีผู้ใช้งานนี้: {target_nick}"))
-                else:
-                    reply_msg = f"🔎 ผลการค้นหา:\n\n"
-                    for u in users:
-                        next_due = u.get('next_due_date')
-                        status = get_thai_month_year(next_due) if next_due else "ยังไม่มีข้อมูล"
-
-                        reply_msg += f"- {u.get('first_name')} ({u.get('nickname')}) : บิลถัดไป {status}\n"
-                    
-                    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_msg.strip()))
-            except Exception as e:
-                line_bot_api.reply_message(event.reply_token, TextSendMessage(text="❌ คำสั่งผิด! ตัวอย่าง: #check ฝ้าย"))
-            return
+    router.route(event, event.message.text.strip())
 
-        if msg == "MyID":
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"User ID: {user_id}"))
-            return
-        if msg == "MyGroup":
-            if is_group:
-                group_id = event.source.group_id
-                line_bot_api.push_message(user_id, TextSendMessage(text=f"Group ID: {group_id}"))
-                line_bot_api.reply_message(event.reply_token, TextSendMessage(text="ส่ง ID ไปที่แชทส่วนตัวฝ้ายนะ!"))
-            return
+# --- Admin Commands ---
+@router.command("overdue", r"^#overdue$", admin=True)
+def cmd_overdue(ctx):
+    report = get_overdue_report(get_thai_time().replace(tzinfo=None))
+    if not report:
+        reply_msg = "✅ ไม่มียอดค้างชำระค่ะ"
+    else:
+        reply_msg = "⚠️ ยอดค้างชำระ:\n" + format_overdue_report(report)
+    line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=reply_msg))
 
-    # --- Registration ---
-    if msg.startswith("#regis"):
-        try:
-            lines = [line.strip() for line in msg.split('\n') if line.strip()]
-            
-            if len(lines) < 5:
-                raise ValueError("ข้อมูลไม่ครบ! พี่ ๆ สามารถดูตัวอย่างการพิมพ์ตามข้างล่างได้เลย 👇🏼")
-        
-            full_name = lines[1].split() 
-            if len(full_name) < 2:
-                raise ValueError("ฝากพี่ ๆ พิมพ์ 'ชื่อ' และ 'นามสกุล' ให้ครบด้วยน้า (มีเว้นวรรค)")
-            
-            fname = full_name[0]
-            lname = " ".join(full_name[1:])
-            
-            nname = lines[2]
-            tel = lines[3]
-            email = lines[4]
-            
-            if not check_nickname_available(nname, user_id):
-                raise ValueError(f"❌ ชื่อเล่น '{nname}' มีคนใช้แล้วค่ะ!")
+@router.command("report", r"^#report", admin=True)
+def cmd_report(ctx):
+    # "#report" = เดือนนี้, "#report ม.ค. 68" = เดือนที่ระบุ
+    now = get_thai_time()
+    period = parse_billing_period(ctx.msg[len("#report"):], now)
+    year, month = (period.start_year, period.start_month) if period else (now.year, now.month)
+    rollup = get_billing_rollup(year, month)
+    month_label = get_thai_month_year(datetime(year, month, 1))
+    line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=format_billing_report(rollup, month_label)))
+
+@router.command("check", r"^#check", admin=True)
+def cmd_check(ctx):
+    event = ctx.event
+    try:
+        target_nick = ctx.msg.split()[1]
+        # ค้นจาก index ในหน่วยความจำ (ขึ้นต้นด้วย / พิมพ์ผิดเล็กน้อยก็เจอ)
+        users = user_search.search(target_nick)
+        if not users:
+            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"❌ ไม่พบบัญชีผู้ใช้งานนี้: {target_nick}"))
+        else:
+            reply_msg = f"🔎 ผลการค้นหา:\n\n"
+            for u in users:
+                next_due = u.get('next_due_date')
+                status = get_thai_month_year(next_due) if next_due else "ยังไม่มีข้อมูล"
 
-            register_user(user_id, fname, lname, nname, tel, email)
+                reply_msg += f"- {u.get('first_name')} ({u.get('nickname')}) : บิลถัดไป {status}\n"
             
-            reply = (
-                f"✅ ลงทะเบียนสำเร็จ!\n"
-                f"ยินดีต้อนรับพี่ {nname} ({email})\n\n"
-                f"น้องฝอยพร้อมดูแลค้าบ 🥸☝🏼"
-            )
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply))
-
-        except ValueError as e:
-            err_msg = (
-                f"❌ {str(e)}\n\n"
-                "ตัวอย่างการพิมพ์:\n"
-                "#regis\n"
-                "ชนัดดา คนชม\n"
-                "ฝ้าย\n"
-                "0812345678\n"
-                "fforfaii@gmail.com"
-            )
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=err_msg))
-        return
+            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_msg.strip()))
+    except Exception as e:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text="❌ คำสั่งผิด! ตัวอย่าง: #check ฝ้าย"))
+
+@router.command("my_id", r"^MyID$", admin=True)
+def cmd_my_id(ctx):
+    line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=f"User ID: {ctx.user_id}"))
+
+@router.command("my_group", r"^MyGroup$", admin=True)
+def cmd_my_group(ctx):
+    if ctx.is_group:
+        group_id = ctx.event.source.group_id
+        line_bot_api.push_message(ctx.user_id, TextSendMessage(text=f"Group ID: {group_id}"))
+        line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text="ส่ง ID ไปที่แชทส่วนตัวฝ้ายนะ!"))
 
-    # --- User Commands ---
-    if msg.startswith("น้องฝอย"):
-        if not require_registration(user_id, event.reply_token): return
+# --- Registration ---
+@router.command("register", r"^#regis")
+def cmd_register(ctx):
+    try:
+        lines = ctx.lines
         
-        line_bot_api.reply_message(event.reply_token, FlexSendMessage(alt_text="เมนูหลัก", contents=get_main_menu_flex()))
-        return
+        if len(lines) < 5:
+            raise ValueError("ข้อมูลไม่ครบ! พี่ ๆ สามารถดูตัวอย่างการพิมพ์ตามข้างล่างได้เลย 👇🏼")
+    
+        full_name = lines[1].split() 
+        if len(full_name) < 2:
+            raise ValueError("ฝากพี่ ๆ พิมพ์ 'ชื่อ' และ 'นามสกุล' ให้ครบด้วยน้า (มีเว้นวรรค)")
+        
+        fname = full_name[0]
+        lname = " ".join(full_name[1:])
+        
+        nname = lines[2]
+        tel = lines[3]
+        email = lines[4]
+        
+        if not check_nickname_available(nname, ctx.user_id):
+            raise ValueError(f"❌ ชื่อเล่น '{nname}' มีคนใช้แล้วค่ะ!")
 
-    if ("จ่ายเงิน" in msg) or ("ชำระเงิน" in msg):
-        if not require_registration(user_id, event.reply_token): return
+        register_user(ctx.user_id, fname, lname, nname, tel, email)
+        user_search.touch()
+        
+        reply = (
+            f"✅ ลงทะเบียนสำเร็จ!\n"
+            f"ยินดีต้อนรับพี่ {nname} ({email})\n\n"
+            f"น้องฝอยพร้อมดูแลค้าบ 🥸☝🏼"
+        )
+        line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=reply))
 
-        if is_group:
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="พี่ ๆ สามารถเรียก \"น้องฝอย\" เพื่อกดปุ่มในเมนูทำรายการในแชทส่วนตัวนะคะ 🔒"))
-        else:
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="เข้าสู่โหมดชำระเงินคับ 🧾\n1. ส่ง \"รูปสลิป\" มาก่อนได้เลย\n2. แล้วค่อยพิมพ์แจ้งรายละเอียดในขั้นตอนถัดไป!"))
-        return
+    except ValueError as e:
+        err_msg = (
+            f"❌ {str(e)}\n\n"
+            "ตัวอย่างการพิมพ์:\n"
+            "#regis\n"
+            "ชนัดดา คนชม\n"
+            "ฝ้าย\n"
+            "0812345678\n"
+            "fforfaii@gmail.com"
+        )
+        line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=err_msg))
 
-    if "เช็คยอด" in msg:
-        if not require_registration(user_id, event.reply_token): return
+# --- User Commands ---
+@router.command("menu", r"^น้องฝอย", registered=True)
+def cmd_menu(ctx):
+    line_bot_api.reply_message(ctx.event.reply_token, FlexSendMessage(alt_text="เมนูหลัก", contents=get_main_menu_flex()))
 
-        user_data = get_user(user_id)
-        next_due = user_data.get('next_due_date') 
+@router.command("payment_mode", r"จ่ายเงิน|ชำระเงิน", registered=True)
+def cmd_payment_mode(ctx):
+    if ctx.is_group:
+        line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text="พี่ ๆ สามารถเรียก \"น้องฝอย\" เพื่อกดปุ่มในเมนูทำรายการในแชทส่วนตัวนะคะ 🔒"))
+    else:
+        line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text="เข้าสู่โหมดชำระเงินคับ 🧾\n1. ส่ง \"รูปสลิป\" มาก่อนได้เลย\n2. แล้วค่อยพิมพ์แจ้งรายละเอียดในขั้นตอนถัดไป!"))
+
+@router.command("status", r"เช็คยอด", registered=True)
+def cmd_status(ctx):
+    user_data = get_user(ctx.user_id)
+    next_due = user_data.get('next_due_date') 
+    
+    if not user_data or not next_due:
+        nname = user_data.get('nickname', 'พี่ ๆ') if user_data else 'พี่ ๆ'
+        reply = f"พี่{nname}ยังไม่มีกำหนดชำระรอบถัดไปเลย มาเริ่มจ่ายรอบแรกก่อนน้า"
+    else:
+        now = datetime.now()
+        month_str = get_thai_month_year(next_due)
         
-        if not user_data or not next_due:
-            nname = user_data.get('nickname', 'พี่ ๆ') if user_data else 'พี่ ๆ'
-            reply = f"พี่{nname}ยังไม่มีกำหนดชำระรอบถัดไปเลย มาเริ่มจ่ายรอบแรกก่อนน้า"
+        if next_due > now:
+            reply = f"✅ สถานะ: ปกติ\n(ครบกำหนดชำระรอบถัดไป: 13 {month_str})"
         else:
-            now = datetime.now()
-            month_str = get_thai_month_year(next_due)
-            
-            if next_due > now:
-                reply = f"✅ สถานะ: ปกติ\n(ครบกำหนดชำระรอบถัดไป: 13 {month_str})"
-            else:
-                reply = f"❌ เลยกำหนดชำระแล้ว!\n(ต้องจ่ายรอบ: 13 {month_str})\nรีบเคลียร์ยอดน้า เดี๋ยวโดนตัดพรีเมี่ยม 🥺"
-        
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply))
-        return
+            reply = f"❌ เลยกำหนดชำระแล้ว!\n(ต้องจ่ายรอบ: 13 {month_str})\nรีบเคลียร์ยอดน้า เดี๋ยวโดนตัดพรีเมี่ยม 🥺"
+    
+    line_bot_api.reply_message(ctx.event.reply_token, TextSendMessage(text=reply))
 
-    if msg.startswith("#โอน"):
-        if is_group: return
-        if not require_registration(user_id, event.reply_token): return
-        
-        _process_transfer_submission(event, msg, user_id)
+@router.command("transfer", r"^#โอน", dm_only=True, registered=True)
+def cmd_transfer(ctx):
+    _process_transfer_submission(ctx.event, ctx.msg, ctx.user_id, ctx.lines)
 
 @handler.add(MessageEvent, message=ImageMessage)
 def handle_image_message(event):
@@ -154,13 +199,35 @@ def handle_image_message(event):
 
     try:
         message_content = line_bot_api.get_message_content(event.message.id)
-        file_stream = io.BytesIO()
-        for chunk in message_content.iter_content():
-            file_stream.write(chunk)
-        file_stream.seek(0)
         
-        file_id = save_slip_image(file_stream, f"{event.message.id}.jpg")
-        save_temp_slip_id(user_id, file_id)
+        # เขียนลง storage ทีละ chunk ตรงจาก LINE และเก็บ byte ที่ไหลผ่านไว้ทำ hash / preview (ไม่ต้องอ่านไฟล์กลับจาก storage)
+        captured = io.BytesIO()
+        file_id = save_slip_image(
+            _capture(message_content.iter_content(chunk_size=SLIP_CHUNK_SIZE), captured),
+            f"{event.message.id}.jpg"
+        )
+        data = captured.getvalue()
+
+        # กันสลิปซ้ำ: ไฟล์เดียวกันทุก byte (SHA-256) = ใช้ซ้ำแน่นอน -> ปฏิเสธ
+        slip_hash = {"sha256": hashlib.sha256(data).hexdigest(), "phash": None}
+        duplicate = find_duplicate_slip(slip_hash["sha256"])
+        if duplicate:
+            if duplicate.get("file_id") != file_id:
+                delete_file_from_storage(file_id)
+            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="⚠️ สลิปนี้เคยใช้แจ้งโอนไปแล้วค่ะ! ถ้าส่งผิดรูป ลองส่งสลิปใหม่อีกครั้งนะคะ"))
+            return
+
+        # หน้าตาคล้ายสลิปเดิม (แคปหน้าจอ/ย่อรูป หรือแค่ธนาคารเดียวกัน) -> รับไว้ แล้วเตือนแอดมินในการ์ดอนุมัติ
+        try:
+            slip_hash["phash"] = f"{dhash(data):016x}"
+            similar = find_similar_slip(slip_hash["phash"])
+            if similar:
+                slip_hash["similar_to"] = {"tx_id": similar.get("tx_id"), "uid": similar.get("uid")}
+        except Exception as e:
+            print(f"Perceptual hash error: {e}")
+
+        save_temp_slip_id(user_id, file_id, slip_hash)
+        schedule_preview(file_id, data)
 
         reply_txt = (
             "ได้รับสลิปแล้วค่ะ 📥\n\n"
@@ -179,14 +246,36 @@ def handle_image_message(event):
         )
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_txt))
 
+    except ValueError as e:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=str(e)))
     except Exception as e:
         print(f"Error saving image: {e}")
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text="เกิดข้อผิดพลาดในการบันทึกรูป ลองใหม่อีกครั้งนะคะ"))
 
 # --- Internal Helper ---
-def _process_transfer_submission(event, msg, user_id):
+def _capture(chunks, buf):
+    for chunk in chunks:
+        buf.write(chunk)
+        yield chunk
+
+def _similar_slip_warning(slip_hash, user_id):
+    """ข้อความเตือนในการ์ดแอดมิน ถ้าสลิปคล้ายกับสลิปที่เคยแจ้งโอนแล้ว (None ถ้าไม่คล้าย)"""
+    similar = (slip_hash or {}).get("similar_to")
+    if not similar:
+        return None
+    if similar.get("uid") == user_id:
+        owner = "ของคนนี้เอง"
+    else:
+        other = get_user(similar.get("uid")) or {}
+        owner = f"ของ {other.get('nickname', 'คนอื่น')}"
+    return (
+        f"⚠️ สลิปหน้าตาคล้ายสลิปที่เคยแจ้งโอน{owner} (รายการ {str(similar.get('tx_id'))[:8]})\n"
+        "เช็คยอด/วันที่/เลขอ้างอิงก่อนกดรับยอดนะคะ"
+    )
+
+def _process_transfer_submission(event, msg, user_id, lines=None):
     try:
-        data = validate_slip_format(msg)
+        data = validate_slip_format(msg, lines)
         user = get_user(user_id)
         if not user:
              line_bot_api.reply_message(event.reply_token, TextSendMessage(text="❌ ไม่พบข้อมูล"))
@@ -194,7 +283,7 @@ def _process_transfer_submission(event, msg, user_id):
 
         # Check Name
         registered_nickname = user.get('nickname', '')
-        if data['nickname'].strip().lower() != registered_nickname.strip().lower():
+        if normalize_nickname(data['nickname']) != normalize_nickname(registered_nickname):
             raise ValueError(f"❌ ชื่อเล่นไม่ถูกต้อง (ไม่ตรงกับที่ลงทะเบียนไว้)")
 
         current_next_due = user.get('next_due_date')
@@ -202,7 +291,8 @@ def _process_transfer_submission(event, msg, user_id):
         if current_next_due:
             # คำนวณว่า "ยอดใหม่" ที่ส่งมา จะมี Due Date วันไหน?
             # เช่น ส่ง "ม.ค." (1 เดือน) -> Due Date คือ 13 ก.พ.
-            input_due_date = calculate_next_due_date_from_text(data['billing'], data['months'])
+            period = data['period']
+            input_due_date = period.next_due_date(data['months']) if period else None
             
             if input_due_date:
                 # ถ้า Due Date ของยอดใหม่ "น้อยกว่า หรือ เท่ากับ" Due Date ที่มีอยู่แล้ว
@@ -226,40 +316,45 @@ def _process_transfer_submission(event, msg, user_id):
             return
 
         tx_id = str(uuid.uuid4())
-        
-        create_transaction(
-            tx_id, 
-            user_id, 
-            data['amount'], 
-            data['months'], 
-            data['billing']
-        )
+        slip_hash = user.get('temp_slip_hash')
 
         # Notify Admin
         base_url = os.environ.get("BASE_URL", "http://localhost:8000")
-        file_id = user.get('temp_slip_id')
         image_url = f"{base_url}/slip/{file_id}"
+        preview_url = f"{image_url}/preview"
         
         flex_msg = create_admin_flex(
             data['nickname'], 
             data['amount'], 
             data['months'], 
             data['billing'], 
-            tx_id
+            tx_id,
+            warning=_similar_slip_warning(slip_hash, user_id)
         )
         
         full_info = f"{user.get('first_name')} {user.get('last_name')}\n📞 {user.get('tel_number', '-')}\n📧 {user.get('email', '-')}"
-        
-        line_bot_api.push_message(Config.ADMIN_USER_ID, [
+        admin_messages = [
             TextSendMessage(text=f"📨 แจ้งโอนจาก {data['nickname']}\n{full_info}"),
-            ImageSendMessage(original_content_url=image_url, preview_image_url=image_url),
+            ImageSendMessage(original_content_url=image_url, preview_image_url=preview_url),
             FlexSendMessage(alt_text="บิลแจ้งโอน", contents=flex_msg)
-        ])
-        
-        users_col.update_one(
-            {"user_id": user_id}, 
-            {"$unset": {"temp_slip_id": "", "slip_uploaded_at": ""}}
+        ]
+
+        # การ์ดของแอดมินถูกบันทึกลง outbox พร้อมกับรายการ (ไม่มีรายการที่แอดมินไม่เห็น)
+        create_transaction(
+            tx_id, 
+            user_id, 
+            data['amount'], 
+            data['months'], 
+            data['billing'],
+            slip_id=file_id,
+            notify=lambda tx, session: notify(Config.ADMIN_USER_ID, admin_messages, key=f"submitted:{tx_id}", session=session)
         )
+        outbox_worker.notify()
+
+        if slip_hash:
+            save_slip_hash(slip_hash['sha256'], slip_hash.get('phash'), user_id, file_id, tx_id)
+        
+        clear_temp_slip(user_id)
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text="✅ น้องฝอยบันทึกข้อมูลเรียบร้อยค่ะ! รอแอดมินพี่ฝ้ายตรวจสอบนะคะ ⏳\n\nขอบคุณที่ใช้บริการค้าบ 🤓🫶🏼"))
 
     except ValueError as e:
@@ -267,18 +362,3 @@ def _process_transfer_submission(event, msg, user_id):
     except Exception as e:
         print(f"System Error: {e}")
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"ระบบขัดข้อง ลองใหม่อีกครั้งนะคะ"))
-
-def require_registration(user_id, reply_token):
-    if not check_is_registered(user_id):
-        reply_txt = (
-            "⛔️ พี่ ๆ ลงทะเบียนกับน้องฝอยก่อนน้า\n\n"
-            "พิมพ์ตามรูปแบบนี้นะคับ:\n"
-            "#regis\n"
-            "[ชื่อจริง] [นามสกุล]\n"
-            "[ชื่อเล่น]\n"
-            "[เบอร์]\n"
-            "[เมล]"
-        )
-        line_bot_api.reply_message(reply_token, TextSendMessage(text=reply_txt))
-        return False # Not registered
-    return True # Registered
\ No newline at end of file
@@ -1,10 +1,12 @@
 from linebot.models import PostbackEvent, TextSendMessage
 from app.modules.line_api import line_bot_api, handler
+from app.modules.outbox import notify, outbox_worker
+from app.modules.user_search import user_search
 from app.setup.database import (
-    get_transaction, get_user, update_user_payment, 
-    complete_transaction, reject_transaction
+    get_transaction, approve_transaction, reject_transaction, delete_slip_hash
 )
-from app.utils.date_time import calculate_next_due_date_from_text, THAI_MONTHS
+from app.utils.billing_period import BillingPeriod
+from app.utils.date_time import calculate_next_bill_date, THAI_MONTHS
 
 @handler.add(PostbackEvent)
 def handle_postback(event):
@@ -13,42 +15,65 @@ def handle_postback(event):
     action = params.get('action')
     tx_id = params.get('txid')
 
+    if action == 'approve':
+        _process_approve(event, tx_id)
+    elif action == 'reject':
+        # เปลี่ยน status แบบมีเงื่อนไข pending -> กดซ้ำ/กดพร้อมกันจะผ่านแค่ครั้งเดียว
+        transaction = reject_transaction(tx_id, _notify_rejected)
+        if not transaction:
+            _reply_not_pending(event, tx_id)
+            return
+        outbox_worker.notify()
+        delete_slip_hash(tx_id)
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text="กดปฏิเสธเรียบร้อย"))
+
+def _notify_rejected(tx, session):
+    notify(
+        tx['uid'], TextSendMessage(text="❌ ยอดโอนถูกปฏิเสธ (ข้อมูลไม่ถูกต้อง) ทักแชทหาแอดมินพี่ฝ้ายได้เลยค่ะ!"),
+        key=f"rejected:{tx['_id']}", session=session
+    )
+
+def _notify_approved(tx, new_due_date, session):
+    notify(
+        tx['uid'], TextSendMessage(text=f"✅ แอดมินพี่ฝ้ายรับยอดแล้ว!\n(รอบบิลถัดไป: {_thai_due_date(new_due_date)})"),
+        key=f"approved:{tx['_id']}", session=session
+    )
+
+def _thai_due_date(due_date):
+    thai_year = due_date.year + 543
+    return f"13 {THAI_MONTHS[due_date.month-1]} {str(thai_year)[2:]}"
+
+def _reply_not_pending(event, tx_id):
+    # อ่านซ้ำเฉพาะตอนที่อนุมัติ/ปฏิเสธไม่สำเร็จ เพื่อบอกเหตุผล
     transaction = get_transaction(tx_id)
     if not transaction:
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text="❌ ไม่พบข้อมูลรายการนี้"))
         return
-
-    if transaction['status'] != 'pending':
-        status_msg = "อนุมัติ" if transaction['status'] == 'completed' else "ปฏิเสธ"
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"⚠️ รายการนี้ถูก '{status_msg}' ไปแล้วค่ะ"))
+    if transaction['status'] == 'pending':
+        # มีคนกดอนุมัติอยู่ (approving_at) ยังไม่เสร็จ
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text="⏳ รายการนี้กำลังถูกอนุมัติอยู่ค่ะ"))
         return
+    status_msg = "อนุมัติ" if transaction['status'] == 'completed' else "ปฏิเสธ"
+    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"⚠️ รายการนี้ถูก '{status_msg}' ไปแล้วค่ะ"))
 
-    if action == 'approve':
-        _process_approve(event, transaction, tx_id)
-    elif action == 'reject':
-        reject_transaction(tx_id)
-        line_bot_api.push_message(transaction['uid'], TextSendMessage(text="❌ ยอดโอนถูกปฏิเสธ (ข้อมูลไม่ถูกต้อง) ทักแชทหาแอดมินพี่ฝ้ายได้เลยค่ะ!"))
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text="กดปฏิเสธเรียบร้อย"))
-
-def _process_approve(event, tx_data, tx_id):
-    user_id = tx_data['uid']
+def _next_due_date(tx_data, user_record):
     months = int(tx_data['cnt_month'])
-    billing_txt = tx_data['billing'] 
-
-    new_due_date = calculate_next_due_date_from_text(billing_txt, months)
-    
-    if not new_due_date:
-        from app.utils.date_time import calculate_next_bill_date
-        user_record = get_user(user_id)
-        current_due = user_record.get('next_due_date') if user_record else None
-        new_due_date = calculate_next_bill_date(current_due, months)
+    if tx_data.get('period_start'):
+        # ใช้ช่วงเดือนที่แกะไว้ตอนสร้างรายการ (ไม่แกะ billing ใหม่เทียบกับวันนี้ ปีจะเพี้ยนถ้าอนุมัติข้ามปี)
+        return BillingPeriod.from_fields(tx_data['period_start'], tx_data['period_end']).next_due_date(months)
 
-    update_user_payment(user_id, tx_id, new_due_date)
-    complete_transaction(tx_id)
+    # user_record อ่านใน transaction เดียวกับการอนุมัติ (ไม่ผ่าน user_cache ที่อาจเก่า)
+    current_due = user_record.get('next_due_date') if user_record else None
+    return calculate_next_bill_date(current_due, months)
 
-    thai_year = new_due_date.year + 543
-    thai_month = THAI_MONTHS[new_due_date.month-1]
-    thai_date_str = f"13 {thai_month} {str(thai_year)[2:]}" 
+def _process_approve(event, tx_id):
+    # ข้อความแจ้ง user ถูกบันทึกลง outbox พร้อมกับการอนุมัติ (อนุมัติใหม่หลังตายกลางทางก็ไม่ส่งซ้ำ)
+    result = approve_transaction(tx_id, _next_due_date, _notify_approved)
+    if not result:
+        _reply_not_pending(event, tx_id)
+        return
+    _, new_due_date = result
+    outbox_worker.notify()
+    user_search.touch()
 
-    line_bot_api.push_message(user_id, TextSendMessage(text=f"✅ แอดมินพี่ฝ้ายรับยอดแล้ว!\n(รอบบิลถัดไป: {thai_date_str})"))
-    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"บันทึกยอดเรียบร้อย (รอบบิลถัดไป: {thai_date_str})"))
\ No newline at end of file
+    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"บันทึกยอดเรียบร้อย (รอบบิลถัดไป: {_thai_due_date(new_due_date)})"))
@@ -0,0 +1,84 @@
+import time
+from itertools import groupby
+from operator import itemgetter
+from app.setup.database import (
+    iter_completed_transactions, get_due_dates, set_due_dates,
+    get_replay_checkpoint, save_replay_checkpoint
+)
+from app.utils.billing_period import BillingPeriod, parse_billing_period
+from app.utils.date_time import calculate_next_bill_date
+
+def _approved_at(tx):
+    return tx.get("approved_at") or tx.get("created_at")
+
+def replay_user(transactions):
+    """
+    คำนวณ next_due_date ใหม่จากรายการที่อนุมัติแล้วของ user เดียว ด้วย logic เดียวกับตอนกดอนุมัติ
+    (มีช่วงเดือน [period_start หรือแกะจาก billing] -> ใช้เดือนเริ่ม + จำนวนเดือน, ไม่ได้ -> ต่อจาก Due Date เดิม ณ เวลาที่อนุมัติ)
+    คืนค่า (due_date, tx_id ล่าสุด)
+    """
+    due, last_tx_id = None, None
+    for tx in sorted(transactions, key=_approved_at):
+        months = int(tx["cnt_month"])
+        approved_at = _approved_at(tx)
+        if tx.get("period_start"):
+            period = BillingPeriod.from_fields(tx["period_start"], tx["period_end"])
+        else:
+            # รายการเก่าที่ยังไม่มี period_start: ปีที่ไม่ได้ระบุให้นับจากตอนอนุมัติ ไม่ใช่ปีปัจจุบัน
+            period = parse_billing_period(tx.get("billing") or "", approved_at)
+        if period:
+            due = period.next_due_date(months)
+        else:
+            due = calculate_next_bill_date(due, months, now=approved_at)
+        last_tx_id = tx["_id"]
+    return due, last_tx_id
+
+def replay_ledger(dry_run=True, run_id=None, batch_users=500, batch_size=1000):
+    """
+    replay รายการที่อนุมัติแล้วทั้งหมดเพื่อคำนวณ next_due_date ของทุก user ใหม่ แล้วเขียนเฉพาะที่ต่างด้วย bulk_write
+    - dry_run=True: คืนค่า diff อย่างเดียว ไม่เขียน
+    - run_id: บันทึก checkpoint (user_id ล่าสุดที่ทำเสร็จ) ทุก batch ถ้าสะดุดกลางทางรันซ้ำด้วย run_id เดิมจะทำต่อ
+    """
+    t0 = time.monotonic()
+    stats = {"users": 0, "transactions": 0, "changed": 0, "written": 0}
+    diffs = []
+
+    after_uid = None
+    if run_id:
+        checkpoint = get_replay_checkpoint(run_id)
+        if checkpoint and checkpoint.get("done"):
+            return {"dry_run": dry_run, "run_id": run_id, "done": True, **checkpoint["stats"]}
+        if checkpoint and not dry_run:
+            after_uid = checkpoint["last_uid"]
+            stats = checkpoint["stats"]
+
+    def flush(replayed):
+        stored = get_due_dates(replayed)
+        changes = {}
+        for user_id, (due, tx_id) in replayed.items():
+            if stored.get(user_id) != due:
+                changes[user_id] = (due, tx_id)
+                diffs.append({"user_id": user_id, "stored": stored.get(user_id), "replayed": due})
+        stats["changed"] += len(changes)
+        if not dry_run:
+            stats["written"] += set_due_dates(changes)
+            if run_id:
+                save_replay_checkpoint(run_id, max(replayed), stats)
+
+    replayed = {}
+    for user_id, txs in groupby(iter_completed_transactions(after_uid, batch_size), key=itemgetter("uid")):
+        txs = list(txs)
+        replayed[user_id] = replay_user(txs)
+        stats["users"] += 1
+        stats["transactions"] += len(txs)
+        if len(replayed) >= batch_users:
+            flush(replayed)
+            replayed = {}
+    if replayed:
+        flush(replayed)
+    if run_id and not dry_run:
+        save_replay_checkpoint(run_id, None, stats, done=True)
+
+    report = {"dry_run": dry_run, "run_id": run_id, **stats, "seconds": round(time.monotonic() - t0, 3), "diffs": diffs}
+    print(f"📒 Ledger replay: { {k: v for k, v in report.items() if k != 'diffs'} }")
+    return report
@@ -1,5 +1,109 @@
-from linebot import LineBotApi, WebhookHandler
+from functools import partial
+from linebot import LineBotApi
+from linebot.exceptions import LineBotApiError
 from app.setup.config import Config
+from app.modules.line_http import PooledHttpClient
+from app.modules.metrics import observe_send_failure
+from app.modules.webhook import EventHandler, EventQueue, EventDeduplicator
+from app.setup.database import mark_webhook_event, unmark_webhook_event
+from app.utils.context import current_event, event_target_id, scope_cache
+from app.utils.lazy import ProcessLocal
 
-line_bot_api = LineBotApi(Config.CHANNEL_ACCESS_TOKEN)
-handler = WebhookHandler(Config.CHANNEL_SECRET)
\ No newline at end of file
+MAX_MESSAGES_PER_REQUEST = 5 # ข้อจำกัดของ LINE ต่อ 1 reply/push
+
+class LineApi(LineBotApi):
+    """
+    LineBotApi ของบอท:
+    - ภายใน event เดียว reply/push ไปปลายทางเดียวกันจะถูกรวมเป็น request ละไม่เกิน 5 ข้อความ (ส่งตอน event จบ)
+    - ส่งข้อความแบบ push แทน ถ้า reply token หมดอายุ (เช่น event รอคิวนานเกินไป)
+    """
+
+    def _pending(self):
+        scoped = scope_cache()
+        if scoped is None or not Config.LINE_BATCH_MESSAGES:
+            return None
+        return scoped.setdefault("line_outbox", {})
+
+    def reply_message(self, reply_token, messages, notification_disabled=False, timeout=None):
+        pending = self._pending()
+        if pending is not None:
+            pending.setdefault(("reply", reply_token, notification_disabled), []).extend(_as_list(messages))
+            return
+        self._reply(reply_token, messages, notification_disabled, timeout)
+
+    def push_message(self, to, messages, retry_key=None, notification_disabled=False, custom_aggregation_units=None, timeout=None):
+        pending = self._pending()
+        if pending is not None and retry_key is None and custom_aggregation_units is None:
+            pending.setdefault(("push", to, notification_disabled), []).extend(_as_list(messages))
+            return
+        super().push_message(
+            to, messages, retry_key=retry_key, notification_disabled=notification_disabled,
+            custom_aggregation_units=custom_aggregation_units, timeout=timeout
+        )
+
+    def _reply(self, reply_token, messages, notification_disabled=False, timeout=None):
+        try:
+            super().reply_message(reply_token, messages, notification_disabled=notification_disabled, timeout=timeout)
+        except LineBotApiError as e:
+            event = current_event()
+            expired = e.status_code == 400 and "reply token" in str(e.error.message).lower()
+            if not expired or event is None or event.reply_token != reply_token:
+                raise
+            target = event_target_id(event)
+            if not target:
+                raise
+            print(f"Reply token expired, falling back to push ({target})")
+            super().push_message(target, messages, notification_disabled=notification_disabled, timeout=timeout)
+
+    def flush(self):
+        """
+        ส่งข้อความที่รวบรวมไว้ใน event นี้ (เรียกโดย EventHandler ตอน event จบ)
+        ส่งไม่สำเร็จจะนับใน ffortify_line_send_failures_total แล้วส่งปลายทางถัดไปต่อ
+        (ไม่โยน error: ถ้า /callback ตอบ 500 LINE จะส่ง event ซ้ำแล้ว handler ทำงานซ้ำทั้งหมด)
+        """
+        scoped = scope_cache()
+        pending = scoped.pop("line_outbox", None) if scoped is not None else None
+        if not pending:
+            return
+        event = current_event()
+        for (kind, target, notification_disabled), messages in pending.items():
+            for i in range(0, len(messages), MAX_MESSAGES_PER_REQUEST):
+                chunk = messages[i:i + MAX_MESSAGES_PER_REQUEST]
+                try:
+                    if kind == "reply" and i == 0:
+                        self._reply(target, chunk, notification_disabled)
+                    elif kind == "reply":
+                        # reply token ใช้ได้ครั้งเดียว ส่วนที่เกิน 5 ข้อความต้อง push ตาม
+                        super().push_message(event_target_id(event), chunk, notification_disabled=notification_disabled)
+                    else:
+                        super().push_message(target, chunk, notification_disabled=notification_disabled)
+                except LineBotApiError as e:
+                    observe_send_failure(kind, e.status_code)
+                    print(f"LINE API Error ({kind} {target}): {e.status_code} {e.error.message}")
+                except Exception as e:
+                    observe_send_failure(kind)
+                    print(f"LINE API Error ({kind} {target}): {e}")
+
+def _as_list(messages):
+    return list(messages) if isinstance(messages, (list, tuple)) else [messages]
+
+def _create_line_api():
+    return LineApi(
+        Config.CHANNEL_ACCESS_TOKEN,
+        endpoint=Config.LINE_API_ENDPOINT,
+        data_endpoint=Config.LINE_DATA_ENDPOINT,
+        http_client=partial(PooledHttpClient, pool_size=Config.LINE_HTTP_POOL_SIZE, max_retries=Config.LINE_MAX_RETRIES)
+    )
+
+line_bot_api = ProcessLocal(_create_line_api)
+handler = EventHandler(
+    Config.CHANNEL_SECRET,
+    dedup=EventDeduplicator(mark_webhook_event, unmark_webhook_event) if Config.WEBHOOK_DEDUP else None
+)
+handler.after_event(lambda event: line_bot_api.flush())
+event_queue = EventQueue(
+    handler,
+    workers=Config.WEBHOOK_WORKERS,
+    maxsize=Config.WEBHOOK_QUEUE_SIZE,
+    drain_timeout=Config.WEBHOOK_DRAIN_TIMEOUT
+)
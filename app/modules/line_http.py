@@ -0,0 +1,95 @@
+import re
+import time
+import uuid
+import random
+import threading
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from linebot.http_client import RequestsHttpClient, RequestsHttpResponse
+from app.modules.metrics import observe_line_api
+
+# endpoint ที่ LINE รองรับ X-Line-Retry-Key (ส่งซ้ำแล้วไม่เกิดข้อความซ้ำ)
+RETRY_KEY_PATHS = ("/v2/bot/message/push", "/v2/bot/message/multicast", "/v2/bot/message/narrowcast", "/v2/bot/message/broadcast")
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# reply token ใช้ได้ครั้งเดียว: ถ้ารอบแรก LINE ส่งไปแล้วแต่ตอบ 5xx/หลุด การส่งซ้ำจะได้ "Invalid reply token"
+# แล้ว LineApi._reply จะ fallback เป็น push -> ข้อความซ้ำ จึงไม่ retry เลย
+NO_RETRY_PATHS = ("/v2/bot/message/reply",)
+MAX_RETRY_DELAY = 30
+
+_local = threading.local()
+
+@contextmanager
+def retry_key(key):
+    """กำหนด X-Line-Retry-Key เองใน block นี้ (เช่น ใช้ id ของ outbox ให้ส่งซ้ำข้าม process ได้โดยไม่ซ้ำ)"""
+    previous = getattr(_local, "retry_key", None)
+    _local.retry_key = key
+    try:
+        yield
+    finally:
+        _local.retry_key = previous
+
+def _endpoint_name(method, url):
+    path = re.sub(r"^https?://[^/]+", "", url).split("?")[0]
+    # /v2/bot/message/123456/content -> /v2/bot/message/{id}/content
+    path = re.sub(r"/[0-9]{6,}(?=/|$)", "/{id}", path)
+    return f"{method} {path}"
+
+class PooledHttpClient(RequestsHttpClient):
+    """
+    HttpClient ของ line-bot-sdk ที่ใช้ requests.Session เดียว (keep-alive connection pool)
+    + retry แบบ exponential backoff เมื่อเจอ 429 / 5xx / connection error
+    """
+
+    def __init__(self, timeout=RequestsHttpClient.DEFAULT_TIMEOUT, pool_size=10, max_retries=3, backoff=0.5):
+        super().__init__(timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method, url, headers=None, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        headers = dict(headers or {})
+        if method == "POST" and url.endswith(RETRY_KEY_PATHS) and "X-Line-Retry-Key" not in headers:
+            headers["X-Line-Retry-Key"] = getattr(_local, "retry_key", None) or str(uuid.uuid4())
+
+        endpoint = _endpoint_name(method, url)
+        max_retries = 0 if method == "POST" and url.endswith(NO_RETRY_PATHS) else self.max_retries
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError:
+                observe_line_api(endpoint, time.monotonic() - t0, retried=attempt > 0)
+                if attempt >= max_retries:
+                    raise
+                delay = None
+            else:
+                observe_line_api(endpoint, time.monotonic() - t0, response.status_code, retried=attempt > 0)
+                if response.status_code not in RETRY_STATUS or attempt >= max_retries:
+                    return RequestsHttpResponse(response)
+                delay = response.headers.get("Retry-After")
+
+            try:
+                delay = float(delay)
+            except (TypeError, ValueError):
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.2)
+            time.sleep(min(delay, MAX_RETRY_DELAY))
+            attempt += 1
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        return self._request("GET", url, headers=headers, params=params, stream=stream, timeout=timeout)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        return self._request("POST", url, headers=headers, data=data, timeout=timeout)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        return self._request("DELETE", url, headers=headers, data=data, timeout=timeout)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        return self._request("PUT", url, headers=headers, data=data, timeout=timeout)
@@ -0,0 +1,94 @@
+import os
+import threading
+from pymongo import monitoring
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# gunicorn หลาย worker: ตั้ง PROMETHEUS_MULTIPROC_DIR แล้ว metric ของทุก process จะถูกรวมตอน /metrics
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+HANDLER_SECONDS = Histogram(
+    "ffortify_handler_seconds", "เวลาประมวลผล webhook event ต่อชนิด event / คำสั่ง",
+    ["event", "command"]
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "ffortify_mongo_command_seconds", "เวลาของคำสั่ง MongoDB ต่อ collection / operation",
+    ["collection", "command"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "ffortify_mongo_command_failures_total", "คำสั่ง MongoDB ที่ error",
+    ["collection", "command"]
+)
+LINE_API_SECONDS = Histogram(
+    "ffortify_line_api_seconds", "เวลาเรียก LINE API ต่อ endpoint (รวมทุกครั้งที่ retry)",
+    ["endpoint"]
+)
+LINE_API_ERRORS = Counter(
+    "ffortify_line_api_errors_total", "LINE API ที่ตอบ error / ต่อไม่ได้",
+    ["endpoint", "status"]
+)
+LINE_API_RETRIES = Counter(
+    "ffortify_line_api_retries_total", "การเรียก LINE API ซ้ำ (retry หลัง 429 / 5xx / ต่อไม่ได้)",
+    ["endpoint"]
+)
+LINE_SEND_FAILURES = Counter(
+    "ffortify_line_send_failures_total", "reply/push ที่รวบรวมไว้แล้วส่งไม่สำเร็จตอน event จบ (handler ไม่เห็น error นี้)",
+    ["kind", "status"]
+)
+JOB_SECONDS = Histogram(
+    "ffortify_scheduler_job_seconds", "เวลารัน scheduler job",
+    ["job", "status"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+)
+
+def observe_handler(event_type, command, seconds):
+    HANDLER_SECONDS.labels(event=event_type, command=command or "-").observe(seconds)
+
+def observe_line_api(endpoint, seconds, status=None, retried=False):
+    LINE_API_SECONDS.labels(endpoint=endpoint).observe(seconds)
+    if retried:
+        LINE_API_RETRIES.labels(endpoint=endpoint).inc()
+    if status is None or status >= 400:
+        LINE_API_ERRORS.labels(endpoint=endpoint, status=str(status or "connection")).inc()
+
+def observe_send_failure(kind, status=None):
+    LINE_SEND_FAILURES.labels(kind=kind, status=str(status or "connection")).inc()
+
+def observe_job(job_id, seconds, error=None):
+    JOB_SECONDS.labels(job=job_id, status="error" if error else "ok").observe(seconds)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """จับเวลาทุกคำสั่งที่ pymongo ส่งไป MongoDB (ต่อ collection + ชื่อคำสั่ง)"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = collection
+
+    def _collection(self, event):
+        with self._lock:
+            return self._pending.pop((event.request_id, event.connection_id), "-")
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(self._collection(event), event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        MONGO_COMMAND_SECONDS.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+def render_metrics():
+    """คืนค่า (body, content_type) ในรูปแบบ Prometheus text"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,144 @@
+import os
+import uuid
+import atexit
+import threading
+from datetime import datetime, timedelta
+from linebot.exceptions import LineBotApiError
+from linebot.models import TextSendMessage, ImageSendMessage, FlexSendMessage
+from app.modules.line_api import line_bot_api
+from app.modules.line_http import retry_key
+from app.setup.config import Config
+from app.setup.database import (
+    enqueue_notification, claim_outbox_batch, mark_outbox_sent, mark_outbox_failed
+)
+
+# type ของข้อความที่เก็บใน outbox -> class สำหรับสร้างกลับ
+MESSAGE_TYPES = {
+    "text": TextSendMessage,
+    "image": ImageSendMessage,
+    "flex": FlexSendMessage,
+}
+MAX_BACKOFF_SECONDS = 60 * 60
+
+def _serialize(messages):
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    for m in messages:
+        if m.type not in MESSAGE_TYPES:
+            raise ValueError(f"Outbox ไม่รองรับข้อความ type '{m.type}'")
+    return [m.as_json_dict() for m in messages]
+
+def _deserialize(messages):
+    return [MESSAGE_TYPES[m["type"]].new_from_json_dict(m) for m in messages]
+
+def _backoff(attempts):
+    return min(Config.OUTBOX_POLL_SECONDS * (2 ** attempts), MAX_BACKOFF_SECONDS)
+
+class OutboxWorker:
+    """
+    thread ที่ส่งข้อความใน outbox (MongoDB) ทีละชุด
+    ส่งไม่ผ่านจะ retry แบบ backoff จนครบ OUTBOX_MAX_ATTEMPTS แล้วเป็น 'dead'
+    ข้อความค้างจาก process ที่ตาย/รีสตาร์ทจะถูก worker ไหนก็ได้มาส่งต่อ
+    """
+
+    def __init__(self, batch_size, max_attempts, poll_seconds, lock_seconds):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.lock_seconds = lock_seconds
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def notify(self):
+        """ปลุก worker ให้ส่งทันที (ไม่ต้องรอรอบ poll)"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # clear ก่อน drain: notify() ที่มาระหว่าง drain จะทำให้ wait() ด้านล่างคืนทันที (ไม่หายไปรอครบ poll_seconds)
+            self._wake.clear()
+            try:
+                drained = self.drain()
+            except Exception as e:
+                print(f"Outbox Error: {e}")
+                drained = 0
+            if drained < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+
+    def drain(self):
+        """ส่ง 1 ชุด คืนค่าจำนวนรายการที่จองมาได้"""
+        batch = claim_outbox_batch(self.owner, self.batch_size, self.lock_seconds)
+        for doc in batch:
+            self._deliver(doc)
+        return len(batch)
+
+    def _deliver(self, doc):
+        try:
+            with retry_key(doc["retry_key"]):
+                line_bot_api.push_message(doc["to"], _deserialize(doc["messages"]))
+        except LineBotApiError as e:
+            if e.status_code == 409:
+                # retry key นี้ LINE รับไปแล้ว (รอบก่อนส่งสำเร็จแต่บันทึกผลไม่ทัน)
+                mark_outbox_sent(doc["_id"])
+                self.sent += 1
+                return
+            # 4xx อื่น (เช่น user block บอท / ข้อความผิดรูปแบบ) ส่งซ้ำก็ไม่ผ่าน
+            retryable = e.status_code == 429 or e.status_code >= 500
+            self._fail(doc, f"{e.status_code} {e.error.message}", retryable)
+        except Exception as e:
+            self._fail(doc, str(e), True)
+        else:
+            mark_outbox_sent(doc["_id"])
+            self.sent += 1
+
+    def _fail(self, doc, error, retryable):
+        if retryable and doc["attempts"] < self.max_attempts:
+            mark_outbox_failed(doc["_id"], error, datetime.now() + timedelta(seconds=_backoff(doc["attempts"])))
+            self.retried += 1
+        else:
+            mark_outbox_failed(doc["_id"], error)
+            self.dead += 1
+            print(f"Outbox Dead ({doc['_id']} -> {doc['to']}): {error}")
+
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+outbox_worker = OutboxWorker(
+    batch_size=Config.OUTBOX_BATCH_SIZE,
+    max_attempts=Config.OUTBOX_MAX_ATTEMPTS,
+    poll_seconds=Config.OUTBOX_POLL_SECONDS,
+    lock_seconds=Config.OUTBOX_LOCK_SECONDS
+)
+
+def notify(to, messages, key=None, session=None):
+    """
+    push แบบ durable: บันทึกลง outbox แล้วให้ worker ส่งต่อ (ไม่รอ LINE API)
+    ถ้าอยู่ใน transaction (session) ผู้เรียกต้องเรียก outbox_worker.notify() เองหลัง commit
+    """
+    outbox_id = enqueue_notification(to, _serialize(messages), key=key, session=session)
+    if session is None:
+        outbox_worker.notify()
+    return outbox_id
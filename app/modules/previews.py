@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.setup.config import Config
+from app.setup.database import get_slip_image, save_slip_preview, has_slip_preview
+from app.utils.image import render_preview
+
+_pool = None
+_pool_pid = None
+
+def _get_pool():
+    # สร้าง process pool ต่อ 1 process (หลัง gunicorn fork) และสร้างเมื่อใช้ครั้งแรกเท่านั้น
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ProcessPoolExecutor(max_workers=Config.PREVIEW_WORKERS)
+        _pool_pid = os.getpid()
+    return _pool
+
+def _store_preview(file_id, future):
+    try:
+        save_slip_preview(file_id, future.result())
+    except Exception as e:
+        print(f"Preview Error ({file_id}): {e}")
+
+def schedule_preview(file_id, data=None):
+    """ส่งงานย่อรูปสลิปไปทำใน process pool แล้วเก็บผลลัพธ์คู่กับไฟล์ต้นฉบับ"""
+    try:
+        # สลิปเดิมที่ถูกส่งซ้ำ (storage คืน file_id เดิม) มี preview อยู่แล้ว ไม่ต้องย่อใหม่
+        if has_slip_preview(file_id):
+            return
+        if data is None:
+            slip = get_slip_image(file_id)
+            if not slip:
+                return
+            data = slip.read()
+        future = _get_pool().submit(
+            render_preview, data, Config.PREVIEW_MAX_SIZE, Config.PREVIEW_QUALITY
+        )
+        future.add_done_callback(lambda f: _store_preview(file_id, f))
+    except Exception as e:
+        # preview ไม่ใช่ส่วนสำคัญ ถ้าสร้างไม่ได้ route /preview จะส่งรูปต้นฉบับแทน
+        print(f"Preview Error ({file_id}): {e}")
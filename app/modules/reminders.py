@@ -0,0 +1,80 @@
+import time
+import threading
+from linebot.exceptions import LineBotApiError
+from linebot.models import TextSendMessage
+from app.modules.line_api import line_bot_api
+from app.setup.config import Config
+from app.setup.database import get_reminder_groups
+from app.utils.const import THAI_MONTHS
+from app.utils.date_time import get_thai_time
+
+MULTICAST_LIMIT = 500 # ผู้รับสูงสุดต่อ 1 request ของ LINE multicast
+
+class RateLimiter:
+    """จำกัดจำนวนครั้งต่อวินาที (รอให้ครบช่วงห่างก่อนปล่อยครั้งถัดไป)"""
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_at = 0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def reminder_text(group):
+    months = group["months_overdue"]
+    if months:
+        return (
+            f"📢 แจ้งเตือน: ค้างชำระค่า Spotify {months} เดือน (฿{months * Config.MONTHLY_PRICE:g})\n"
+            "โอนแล้วส่งสลิปมาที่แชทนี้ได้เลยน้า 🙏"
+        )
+    due = group["due_date"]
+    return (
+        f"📢 แจ้งเตือน: ใกล้ถึงรอบจ่ายค่า Spotify แล้ว (วันที่ {due.day} {THAI_MONTHS[due.month - 1]})\n"
+        "อย่าลืมโอนแล้วส่งสลิปมานะคะ 🤓"
+    )
+
+def plan_reminders(now=None):
+    """แบ่งคนที่ต้องเตือนเป็นชุด ๆ ละไม่เกิน 500 คน (ข้อความเดียวกันต่อชุด) คืนค่า list ของ {text, to}"""
+    batches = []
+    for group in get_reminder_groups(now, Config.REMINDER_UPCOMING_DAYS):
+        text = reminder_text(group)
+        user_ids = group["user_ids"]
+        for i in range(0, len(user_ids), MULTICAST_LIMIT):
+            batches.append({"text": text, "to": user_ids[i:i + MULTICAST_LIMIT]})
+    return batches
+
+def send_reminders(dry_run=False, now=None):
+    """
+    ส่ง reminder รายคนผ่าน multicast (1 request ต่อชุด) จำกัดความถี่ตาม REMINDER_RATE_PER_SECOND
+    dry_run=True จะแค่คืนแผนการส่งโดยไม่เรียก LINE API
+    """
+    t0 = time.monotonic()
+    # next_due_date เก็บเป็นเวลาไทยแบบ naive -> เทียบกับเวลาไทย (เหมือน month_end_check) ไม่ใช่เวลาเครื่อง
+    batches = plan_reminders(now or get_thai_time().replace(tzinfo=None))
+    report = {
+        "dry_run": dry_run,
+        "batches": len(batches),
+        "recipients": sum(len(b["to"]) for b in batches),
+        "failed_batches": 0,
+    }
+    if dry_run:
+        report["plan"] = [{"text": b["text"], "recipients": len(b["to"])} for b in batches]
+        return report
+
+    limiter = RateLimiter(Config.REMINDER_RATE_PER_SECOND)
+    for batch in batches:
+        limiter.wait()
+        try:
+            line_bot_api.multicast(batch["to"], TextSendMessage(text=batch["text"]))
+        except LineBotApiError as e:
+            report["failed_batches"] += 1
+            print(f"Reminder Error ({len(batch['to'])} users): {e}")
+    report["seconds"] = round(time.monotonic() - t0, 3)
+    print(f"🔔 Reminders sent: {report}")
+    return report
@@ -0,0 +1,115 @@
+import re
+import time
+import threading
+from functools import cached_property
+from app.setup.config import Config
+from app.utils.context import scope_cache
+from app.utils.validators import split_lines
+
+class CommandContext:
+    """ข้อมูลของข้อความที่ส่งให้ command (แยกบรรทัดครั้งเดียวตอนใช้ครั้งแรก)"""
+
+    def __init__(self, event, msg, match):
+        self.event = event
+        self.msg = msg
+        self.match = match
+        self.user_id = event.source.user_id
+        self.is_group = event.source.type == "group"
+
+    @cached_property
+    def lines(self):
+        return split_lines(self.msg)
+
+class Command:
+    def __init__(self, name, pattern, func, admin=False, dm_only=False, registered=False):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.func = func
+        self.admin = admin
+        self.dm_only = dm_only
+        self.registered = registered
+
+class CommandRouter:
+    """
+    ตารางคำสั่งของข้อความแชท: เช็ค pattern ตามลำดับที่ลงทะเบียน แล้วเช็คเงื่อนไขจากถูกไปแพง
+    (DM อย่างเดียว -> admin -> ลงทะเบียนแล้ว [อ่าน DB])
+    ข้อความทั่วไปที่ไม่ใช่คำสั่งจะถูกกรองด้วย regex รวมตัวเดียว โดยไม่แตะ DB
+    """
+
+    def __init__(self, require_registration):
+        self.require_registration = require_registration
+        self._commands = []
+        self._any = None
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.unmatched = 0
+
+    def command(self, name, pattern, admin=False, dm_only=False, registered=False):
+        def decorator(func):
+            self._commands.append(Command(name, pattern, func, admin, dm_only, registered))
+            self._stats[name] = {"calls": 0, "denied": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            self._any = re.compile("|".join(f"(?:{c.pattern.pattern})" for c in self._commands))
+            return func
+        return decorator
+
+    def _allowed(self, command, ctx):
+        if command.dm_only and ctx.is_group:
+            return False
+        if command.admin and ctx.user_id != Config.ADMIN_USER_ID:
+            return False
+        if command.registered and not self.require_registration(ctx.user_id, ctx.event.reply_token):
+            return False
+        return True
+
+    def matches(self, msg):
+        """เช็คแบบถูก ๆ ว่าข้อความนี้อาจเป็นคำสั่ง (regex รวมตัวเดียว ไม่แตะ DB)"""
+        if self._any is None or not self._any.search(msg):
+            with self._lock:
+                self.unmatched += 1
+            return False
+        return True
+
+    def route(self, event, msg):
+        """เรียก command แรกที่ตรงกับข้อความ คืนค่า True ถ้ามี command รับไป"""
+        if not self.matches(msg):
+            return False
+
+        for command in self._commands:
+            match = command.pattern.search(msg)
+            if match:
+                break
+        else:
+            return False
+
+        ctx = CommandContext(event, msg, match)
+        scoped = scope_cache()
+        if scoped is not None:
+            scoped["command"] = command.name
+        stats = self._stats[command.name]
+        if not self._allowed(command, ctx):
+            with self._lock:
+                stats["denied"] += 1
+            return True
+
+        t0 = time.monotonic()
+        try:
+            command.func(ctx)
+        except Exception:
+            with self._lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            ms = (time.monotonic() - t0) * 1000
+            with self._lock:
+                stats["calls"] += 1
+                stats["total_ms"] += ms
+                stats["max_ms"] = max(stats["max_ms"], ms)
+        return True
+
+    def stats(self):
+        with self._lock:
+            commands = {
+                name: dict(s, avg_ms=s["total_ms"] / s["calls"] if s["calls"] else 0.0)
+                for name, s in self._stats.items()
+            }
+            return {"commands": commands, "unmatched": self.unmatched}
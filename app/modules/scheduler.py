@@ -1,11 +1,29 @@
+import os
+import time
+import uuid
+import atexit
+import socket
+import threading
+from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from linebot.models import TextSendMessage
 from app.modules.line_api import line_bot_api
-from app.setup.database import get_all_users, cleanup_expired_slips
+from app.modules.reminders import send_reminders
+from app.modules.metrics import observe_job
+from app.setup.database import (
+    client, DB_NAME, get_overdue_report, cleanup_expired_slips,
+    acquire_lease, release_lease, record_job_run, rebuild_billing_rollups
+)
 from app.setup.config import Config
 from app.utils.date_time import get_thai_time
+from app.ui.text_messages import format_overdue_report
 
-scheduler = BackgroundScheduler(timezone="Asia/Bangkok")
+TIMEZONE = "Asia/Bangkok"
+LEASE_NAME = "scheduler"
+
+scheduler = BackgroundScheduler(timezone=TIMEZONE)
 
 def monthly_reminder():
     if Config.GROUP_ID_TO_ALERT:
@@ -18,26 +36,151 @@ def monthly_reminder():
         except Exception as e:
             print(f"Reminder Error: {e}")
 
+    # เตือนรายคน (ค้างชำระ / ใกล้ครบกำหนด) ผ่าน multicast
+    if Config.REMINDER_DIRECT:
+        send_reminders()
+
 def month_end_check():
     if not Config.GROUP_ID_TO_ALERT: return
-    
+
     now = get_thai_time().replace(tzinfo=None)
-    unpaid_users = []
-    
-    for user in get_all_users():
-        # ถ้า next_due_date น้อยกว่าตอนนี้ แปลว่าเลยกำหนดจ่ายแล้ว (ค้างชำระ)
-        if user.get('next_due_date') and user['next_due_date'] <= now:
-            unpaid_users.append(user.get('nickname', 'Unknown'))
-            
+    # ถ้า next_due_date น้อยกว่าตอนนี้ แปลว่าเลยกำหนดจ่ายแล้ว (ค้างชำระ) - กรองฝั่ง DB
+    unpaid_users = get_overdue_report(now)
+
     if unpaid_users:
-        msg = "⚠️ สิ้นเดือนแล้ว! มียอดค้างชำระจาก:\n" + "\n".join(unpaid_users)
+        msg = "⚠️ สิ้นเดือนแล้ว! มียอดค้างชำระจาก:\n" + format_overdue_report(unpaid_users)
         line_bot_api.push_message(Config.GROUP_ID_TO_ALERT, TextSendMessage(text=msg))
 
-def start_scheduler():
+# job_id -> (ฟังก์ชัน, trigger)
+JOBS = {
     # วันที่ 13 เวลา 09:00
-    scheduler.add_job(monthly_reminder, 'cron', day=13, hour=9, minute=0)
+    "monthly_reminder": (monthly_reminder, CronTrigger(day=13, hour=9, minute=0, timezone=TIMEZONE)),
     # วันที่ 28 เวลา 18:00
-    scheduler.add_job(month_end_check, 'cron', day=28, hour=18, minute=0)
+    "month_end_check": (month_end_check, CronTrigger(day=28, hour=18, minute=0, timezone=TIMEZONE)),
     # Delte expired temp slips every hour
-    scheduler.add_job(cleanup_expired_slips, 'interval', hours=1)
-    scheduler.start()
\ No newline at end of file
+    "cleanup_expired_slips": (cleanup_expired_slips, IntervalTrigger(hours=1, timezone=TIMEZONE)),
+    # สร้างยอดรวมรายเดือนใหม่จาก transactions ทุกวัน 03:30 (แก้ยอดที่คลาด)
+    "rebuild_billing_rollups": (rebuild_billing_rollups, CronTrigger(hour=3, minute=30, timezone=TIMEZONE)),
+}
+
+def run_job(job_id):
+    """ตัวกลางที่ scheduler เรียก: รัน job แล้วบันทึกเวลารันล่าสุดลง MongoDB"""
+    if Config.SCHEDULER_MODE == "leader" and not leader.is_leader:
+        return
+    func, _ = JOBS[job_id]
+    started_at = datetime.now()
+    t0 = time.monotonic()
+    error = None
+    try:
+        func()
+    except Exception as e:
+        error = str(e)
+        print(f"Job Error ({job_id}): {e}")
+    seconds = time.monotonic() - t0
+    observe_job(job_id, seconds, error)
+    try:
+        record_job_run(job_id, started_at, round(seconds, 3), error)
+    except Exception as e:
+        print(f"Job Record Error ({job_id}): {e}")
+
+def _add_jobs(sched):
+    for job_id, (_, trigger) in JOBS.items():
+        job = sched.get_job(job_id)
+        if job is None:
+            sched.add_job(run_job, trigger, args=[job_id], id=job_id)
+        elif str(job.trigger) != str(trigger):
+            # เปลี่ยนเวลาในโค้ดแล้ว -> อัปเดต job ที่เก็บไว้
+            sched.reschedule_job(job_id, trigger=trigger)
+
+class LeaderScheduler:
+    """
+    ให้มี scheduler ทำงานแค่ 1 worker (gunicorn -w N):
+    ทุก worker พยายามถือ lease ใน MongoDB เป็นระยะ คนที่ได้จะเปิด scheduler
+    job เก็บใน MongoDBJobStore -> ถ้า leader ตาย/รีสตาร์ท worker ถัดไปที่ได้ lease
+    จะรัน job ที่พลาดไป (ภายใน misfire_grace_time) ให้ 1 ครั้ง
+    """
+
+    def __init__(self, lease_seconds):
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._scheduler = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._heartbeat, name="scheduler-leader", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _heartbeat(self):
+        while not self._stop.is_set():
+            try:
+                leader_now = acquire_lease(LEASE_NAME, self.owner, self.lease_seconds)
+            except Exception as e:
+                print(f"Scheduler Lease Error: {e}")
+                leader_now = False
+
+            try:
+                if leader_now and not self.is_leader:
+                    self._become_leader()
+                elif not leader_now and self.is_leader:
+                    self._step_down()
+            except Exception as e:
+                print(f"Scheduler Error: {e}")
+                self._step_down()
+            self._stop.wait(self.lease_seconds / 3)
+
+    def _become_leader(self):
+        from apscheduler.jobstores.mongodb import MongoDBJobStore
+
+        print(f"⏰ Scheduler leader: {self.owner}")
+        self.is_leader = True
+        self._scheduler = BackgroundScheduler(
+            timezone=TIMEZONE,
+            jobstores={"default": MongoDBJobStore(database=DB_NAME, collection="scheduler_jobs", client=client.get())},
+            job_defaults={"coalesce": True, "misfire_grace_time": Config.SCHEDULER_MISFIRE_GRACE}
+        )
+        self._scheduler.start(paused=True)
+        _add_jobs(self._scheduler)
+        self._scheduler.resume()
+
+    def _step_down(self):
+        print(f"⏰ Scheduler lost leadership: {self.owner}")
+        self.is_leader = False
+        if self._scheduler:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    def stop(self):
+        self._stop.set()
+        if self.is_leader:
+            self._step_down()
+            try:
+                release_lease(LEASE_NAME, self.owner)
+            except Exception:
+                pass
+
+leader = LeaderScheduler(Config.SCHEDULER_LEASE_SECONDS)
+
+def is_scheduler_running():
+    if Config.SCHEDULER_MODE == "leader":
+        return leader._thread is not None
+    return scheduler.running
+
+def start_scheduler():
+    """
+    SCHEDULER_MODE:
+    - "local"  : scheduler ในหน่วยความจำของทุก process (แบบเดิม เหมาะกับ worker เดียว)
+    - "leader" : เลือก worker เดียวผ่าน lease ใน MongoDB + เก็บ job ไว้ใน MongoDB
+    - "off"    : ไม่รัน scheduler ใน process นี้
+    """
+    if Config.SCHEDULER_MODE == "off":
+        return
+    if Config.SCHEDULER_MODE == "leader":
+        leader.start()
+        return
+    _add_jobs(scheduler)
+    scheduler.start()
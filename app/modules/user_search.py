@@ -0,0 +1,70 @@
+import threading
+import time
+from datetime import timedelta
+from app.setup.database import iter_users_for_search, find_users_by_nickname
+from app.utils.search import NameIndex
+from app.utils.watermark import Watermark
+
+# ดึง user ที่เปลี่ยนจาก worker อื่นไม่บ่อยกว่านี้ (วินาที)
+SYNC_INTERVAL = 5
+# ดึงย้อนหลังซ้อนกับรอบก่อน (user ที่ worker อื่นเขียนช้ากว่า updated_at ของมัน)
+SYNC_OVERLAP = timedelta(minutes=1)
+
+class UserSearchIndex:
+    """
+    index ชื่อเล่น/ชื่อจริงของ user สำหรับ #check (ค้นแบบขึ้นต้น + พิมพ์ผิด)
+    โหลดทั้งหมดครั้งแรก แล้วดึงเฉพาะ user ที่ updated_at ตั้งแต่ (ล่าสุดที่เห็น - SYNC_OVERLAP) เป็นระยะ
+    เก็บ next_due_date ไว้ใน record ด้วย แสดงสถานะได้โดยไม่ต้องถาม MongoDB ทีละคน
+    """
+
+    def __init__(self):
+        self._index = NameIndex()
+        self._lock = threading.Lock()
+        self._watermark = Watermark(SYNC_OVERLAP)
+        self._last_sync = 0
+        self._loaded = False
+        self._loading = None
+        self._loading_lock = threading.Lock()
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_sync < SYNC_INTERVAL:
+            return
+        with self._lock:
+            if not force and now - self._last_sync < SYNC_INTERVAL:
+                return
+            for user in iter_users_for_search(self._watermark.since()):
+                if self._watermark.is_new(user["user_id"], user.get("updated_at")):
+                    self._index.add(user["user_id"], [user.get("nickname"), user.get("first_name")], user)
+            self._watermark.prune()
+            self._last_sync = now
+            self._loaded = True
+
+    def _load_in_background(self):
+        with self._loading_lock:
+            if self._loading and self._loading.is_alive():
+                return
+            self._loading = threading.Thread(target=self._load, name="user-search-load", daemon=True)
+            self._loading.start()
+
+    def _load(self):
+        try:
+            self.sync(force=True)
+        except Exception as e:
+            print(f"User Search Index Error: {e}")
+
+    def touch(self):
+        """ให้ค้นครั้งถัดไปดึงข้อมูลใหม่ก่อน (เรียกหลังเขียนข้อมูล user ใน process นี้)"""
+        self._last_sync = 0
+
+    def search(self, query, limit=10):
+        """คืนค่า list ของ user record (user_id, nickname, first_name, next_due_date) เรียงตามความใกล้เคียง"""
+        if not self._loaded:
+            # index ยังไม่ได้โหลด (process เพิ่งเริ่ม / โหลดไม่สำเร็จ) -> โหลดเบื้องหลัง ระหว่างนี้ค้นชื่อเล่นแบบตรงตัวจาก MongoDB
+            self._load_in_background()
+            return find_users_by_nickname(query)[:limit]
+        self.sync()
+        with self._lock:
+            return [record for _, record in self._index.search(query, limit)]
+
+user_search = UserSearchIndex()
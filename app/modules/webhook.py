@@ -0,0 +1,243 @@
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+from linebot import WebhookHandler
+from linebot.models import MessageEvent
+from app.utils.context import event_scope, scope_cache
+from app.modules.metrics import observe_handler
+
+class EventDeduplicator:
+    """
+    กัน event ซ้ำจากการที่ LINE ส่ง webhook ซ้ำ (redelivery) โดยดูจาก webhookEventId
+    เช็คใน LRU ของ process ก่อน แล้วค่อยบันทึกลง store กลาง (mark(event_id) คืนค่า False ถ้าเคยเห็นแล้ว)
+    ถ้า handler ล้มเหลว ให้เรียก release(event) เพื่อลบ marker (unmark) ให้ redelivery ของ LINE ประมวลผลใหม่ได้
+    """
+
+    def __init__(self, mark, unmark=None, max_items=10000):
+        self.mark = mark
+        self.unmark = unmark
+        self.max_items = max_items
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.errors = 0
+
+    def _remember(self, event_id):
+        with self._lock:
+            self._seen[event_id] = True
+            self._seen.move_to_end(event_id)
+            while len(self._seen) > self.max_items:
+                self._seen.popitem(last=False)
+
+    def is_duplicate(self, event):
+        event_id = getattr(event, "webhook_event_id", None)
+        if not event_id:
+            return False
+        with self._lock:
+            if event_id in self._seen:
+                self.duplicates += 1
+                return True
+        try:
+            first_time = self.mark(event_id)
+        except Exception as e:
+            # store ใช้ไม่ได้ -> ประมวลผลต่อ (ยอมให้ซ้ำดีกว่าทำ event หาย)
+            print(f"Webhook Dedup Error: {e}")
+            self.errors += 1
+            return False
+        self._remember(event_id)
+        if not first_time:
+            with self._lock:
+                self.duplicates += 1
+        return not first_time
+
+    def release(self, event):
+        """ลบ marker ของ event ที่ประมวลผลไม่สำเร็จ (event นั้นจะไม่ถูกนับว่าซ้ำอีก)"""
+        event_id = getattr(event, "webhook_event_id", None)
+        if not event_id:
+            return
+        with self._lock:
+            self._seen.pop(event_id, None)
+        if self.unmark is None:
+            return
+        try:
+            self.unmark(event_id)
+        except Exception as e:
+            print(f"Webhook Dedup Error: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {"duplicates": self.duplicates, "errors": self.errors, "cached": len(self._seen)}
+
+class EventHandler(WebhookHandler):
+    """
+    WebhookHandler ที่แยกขั้น "ตรวจลายเซ็น" ออกจาก "เรียก handler"
+    เพื่อให้ /callback ตอบ LINE ได้ทันที แล้วค่อยประมวลผล event ทีหลัง
+    """
+
+    def __init__(self, channel_secret, dedup=None):
+        super().__init__(channel_secret)
+        self.dedup = dedup
+        self._after_event = []
+        self._filters = []
+
+    def filter(self, func):
+        """ลงทะเบียน filter(event) ถ้าคืนค่า False จะทิ้ง event ก่อน dedup (ไม่เขียน marker ลง DB)"""
+        self._filters.append(func)
+        return func
+
+    def after_event(self, func):
+        """ลงทะเบียนฟังก์ชันที่จะถูกเรียกหลัง handler ของทุก event (ยังอยู่ใน event_scope)"""
+        self._after_event.append(func)
+        return func
+
+    def parse(self, body, signature):
+        """ตรวจลายเซ็น + แปลง body เป็น payload (โยน InvalidSignatureError ถ้าไม่ผ่าน)"""
+        return self.parser.parse(body, signature, as_payload=True)
+
+    def handle(self, body, signature):
+        payload = self.parse(body, signature)
+        for event in payload.events:
+            self.dispatch(event, payload)
+
+    def find_handler(self, event):
+        func = None
+        if isinstance(event, MessageEvent):
+            func = self._handlers.get(f"{event.__class__.__name__}_{event.message.__class__.__name__}")
+        if func is None:
+            func = self._handlers.get(event.__class__.__name__)
+        return func or self._default
+
+    def dispatch(self, event, payload=None):
+        """เรียก handler ที่ลงทะเบียนไว้ด้วย @handler.add สำหรับ event เดียว"""
+        func = self.find_handler(event)
+        if func is None:
+            return
+        if not all(f(event) for f in self._filters):
+            return
+        if self.dedup and self.dedup.is_duplicate(event):
+            print(f"Duplicate webhook event dropped: {event.webhook_event_id}")
+            return
+        with event_scope(event):
+            t0 = time.monotonic()
+            try:
+                func(event)
+            except Exception:
+                # marker ถูกเขียนก่อนเรียก handler -> ลบทิ้งก่อนโยนต่อ ไม่งั้น LINE ส่งซ้ำมาก็จะถูกทิ้งเป็น duplicate
+                if self.dedup:
+                    self.dedup.release(event)
+                raise
+            finally:
+                for hook in self._after_event:
+                    hook(event)
+                # handler ที่มีหลายคำสั่ง (เช่น ข้อความ) ใส่ชื่อคำสั่งไว้ใน scope_cache()["command"]
+                observe_handler(event.__class__.__name__, scope_cache().get("command"), time.monotonic() - t0)
+
+class EventQueue:
+    """
+    คิว event แบบจำกัดขนาด + thread pool สำหรับโหมด WEBHOOK_MODE=async
+    - ถ้าคิวเต็ม (backpressure) จะประมวลผล event นั้นใน request thread แทน เพื่อไม่ให้ event หาย
+    - worker เริ่มทำงานตอน submit ครั้งแรก (หลัง gunicorn fork แล้ว)
+    """
+
+    def __init__(self, handler, workers=4, maxsize=100, drain_timeout=10):
+        self.handler = handler
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "enqueued": 0, "processed": 0, "failed": 0,
+            "inline": 0, "busy": 0, "max_depth": 0, "max_wait_ms": 0.0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._threads or self._closed:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"webhook-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            atexit.register(self.shutdown)
+
+    def submit(self, payload):
+        """ใส่ event ทั้งหมดของ payload ลงคิว"""
+        self.start()
+        for event in payload.events:
+            try:
+                if self._closed:
+                    raise queue.Full
+                self._queue.put_nowait((event, payload, time.monotonic()))
+            except queue.Full:
+                self._count("inline")
+                self._run(event, payload)
+                continue
+            self._count("enqueued")
+            depth = self._queue.qsize()
+            with self._lock:
+                self._stats["max_depth"] = max(self._stats["max_depth"], depth)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                event, payload, queued_at = item
+                wait_ms = (time.monotonic() - queued_at) * 1000
+                with self._lock:
+                    self._stats["busy"] += 1
+                    self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+                try:
+                    self._run(event, payload)
+                finally:
+                    self._count("busy", -1)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, event, payload):
+        try:
+            self.handler.dispatch(event, payload)
+            self._count("processed")
+        except Exception as e:
+            self._count("failed")
+            print(f"Webhook Worker Error ({event.__class__.__name__}): {e}")
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        """ตัวเลข backpressure สำหรับดูสถานะคิว"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["capacity"] = self._queue.maxsize
+        stats["workers"] = len(self._threads)
+        return stats
+
+    def shutdown(self, timeout=None):
+        """หยุดรับงานใหม่ แล้วรอให้ event ที่ค้างในคิวประมวลผลจนหมด (graceful drain)"""
+        timeout = self.drain_timeout if timeout is None else timeout
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        deadline = time.monotonic() + timeout
+        for _ in threads:
+            # คิวเต็ม: รอที่ว่างได้ไม่เกินเวลาที่เหลือ (ไม่ให้ shutdown ค้างเกิน drain_timeout)
+            try:
+                self._queue.put(None, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in threads:
+            t.join(max(0, deadline - time.monotonic()))
+        if self._queue.qsize():
+            print(f"⚠️ Webhook queue shutdown with {self._queue.qsize()} events left.")
@@ -1,28 +1,94 @@
-from flask import Blueprint, request, abort, send_file
-from linebot.exceptions import InvalidSignatureError
-from app.modules.line_api import handler
-from app.setup.database import get_slip_image
 import io
+import hmac
+import hashlib
+from datetime import datetime
+from flask import Blueprint, Response, request, abort, jsonify
+from werkzeug.wsgi import wrap_file
+from linebot.exceptions import InvalidSignatureError
+from app.modules.line_api import handler, event_queue, line_bot_api
+from app.modules.scheduler import is_scheduler_running
+from app.modules.outbox import outbox_worker
+from app.modules.metrics import render_metrics
+from app.modules.export import EXPORT_FIELDS, export_stream, export_filename
+from app.setup.config import Config
+from app.setup.database import get_slip_image, get_slip_preview, ping_database, user_cache
+from app.utils.cache import LRUByteCache
 # Import handlers เพื่อให้ decorator ทำงาน
 import app.modules.handlers 
+from app.modules.handlers.messages import router
 
 bp = Blueprint('main', __name__)
 
+# สลิปไม่เปลี่ยนหลังอัปโหลด -> cache ได้ทั้งฝั่ง server และ client
+SLIP_MAX_AGE = 365 * 24 * 60 * 60
+slip_cache = LRUByteCache(Config.SLIP_CACHE_BYTES)
+
+def _send_slip(fileobj, length, filename, etag, immutable=True):
+    """ส่งไฟล์แบบ stream พร้อม ETag / Cache-Control และรองรับ If-None-Match (304) กับ Range (206)"""
+    rv = Response(
+        wrap_file(request.environ, fileobj),
+        mimetype='image/jpeg',
+        direct_passthrough=True
+    )
+    rv.content_length = length
+    rv.headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    if etag:
+        rv.set_etag(etag)
+    if immutable:
+        rv.cache_control.public = True
+        rv.cache_control.max_age = SLIP_MAX_AGE
+        rv.cache_control.immutable = True
+    else:
+        rv.cache_control.no_cache = True
+    return rv.make_conditional(request, accept_ranges=True, complete_length=length)
+
+def _serve_cached(cache_key, slip):
+    """ส่งสลิปผ่าน LRU cache (ไฟล์ที่ใหญ่เกินจะ stream จาก storage โดยตรง)"""
+    if slip.length <= slip_cache.max_item_bytes:
+        data = slip.read()
+        etag = slip.sha256 or hashlib.sha256(data).hexdigest()
+        slip_cache.put(cache_key, (data, slip.filename, etag), len(data))
+        return _send_slip(io.BytesIO(data), len(data), slip.filename, etag)
+
+    return _send_slip(slip.fileobj, slip.length, slip.filename, slip.sha256)
+
+def _serve_from_cache(cache_key):
+    cached = slip_cache.get(cache_key)
+    if cached is None:
+        return None
+    data, filename, etag = cached
+    return _send_slip(io.BytesIO(data), len(data), filename, etag)
+
 @bp.route("/slip/<file_id>")
 def serve_slip(file_id):
-    # ดึงข้อมูลจาก MongoDB
-    file_doc = get_slip_image(file_id)
+    # ดูใน cache ก่อน (รีวิวสลิปรัว ๆ จะไม่ต้องวิ่งไป MongoDB ทุกครั้ง)
+    cached = _serve_from_cache(file_id)
+    if cached is not None:
+        return cached
+
+    slip = get_slip_image(file_id)
     
-    if not file_doc:
+    if not slip:
         return "Image not found", 404
-        
-    # แปลง Binary กลับเป็นรูปภาพแล้วส่งออกไป
-    return send_file(
-        io.BytesIO(file_doc['data']),
-        mimetype='image/jpeg',
-        as_attachment=False,
-        download_name=file_doc['filename']
-    )
+
+    return _serve_cached(file_id, slip)
+
+@bp.route("/slip/<file_id>/preview")
+def serve_slip_preview(file_id):
+    cache_key = f"{file_id}:preview"
+    cached = _serve_from_cache(cache_key)
+    if cached is not None:
+        return cached
+
+    preview = get_slip_preview(file_id)
+    if preview:
+        return _serve_cached(cache_key, preview)
+
+    # preview ยังสร้างไม่เสร็จ -> ส่งรูปต้นฉบับไปก่อน (ห้าม cache ไว้ที่ URL ของ preview)
+    slip = get_slip_image(file_id)
+    if not slip:
+        return "Image not found", 404
+    return _send_slip(slip.fileobj, slip.length, slip.filename, None, immutable=False)
 
 @bp.route("/callback", methods=['POST'])
 def callback():
@@ -30,11 +96,76 @@ def callback():
     body = request.get_data(as_text=True)
     
     try:
-        handler.handle(body, signature)
+        if Config.WEBHOOK_MODE == "async":
+            # ตรวจลายเซ็นก่อน แล้วค่อยให้ worker ประมวลผล event (ตอบ LINE ได้ทันที)
+            event_queue.submit(handler.parse(body, signature))
+        else:
+            handler.handle(body, signature)
     except InvalidSignatureError:
         abort(400)
     return 'OK'
 
+@bp.route("/ready")
+def ready():
+    """Readiness probe: 200 เมื่อ process นี้ต่อ MongoDB ได้แล้ว (เรียกครั้งแรกจะ warm connection ให้)"""
+    try:
+        mongo_ok = ping_database()
+    except Exception as e:
+        print(f"Readiness Error: {e}")
+        mongo_ok = False
+
+    status = {
+        "mongo": mongo_ok,
+        "line_api": line_bot_api.ready,
+        "scheduler": is_scheduler_running(),
+        "webhook_queue": event_queue.stats(),
+        "commands": router.stats(),
+        "webhook_dedup": handler.dedup.stats() if handler.dedup else None,
+        "outbox": outbox_worker.stats(),
+        "slip_cache": slip_cache.stats(),
+        "user_cache": user_cache.stats(),
+    }
+    return jsonify(status), 200 if mongo_ok else 503
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+@bp.route("/export/<kind>")
+def export(kind):
+    """
+    Export แบบ stream สำหรับกระทบยอดกับ statement ธนาคาร (ต้องส่ง Authorization: Bearer <EXPORT_TOKEN>)
+    ?format=csv|json &from=YYYY-MM-DD &to=YYYY-MM-DD (ไม่รวมวันนี้) &status=completed &gzip=1
+    """
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not Config.EXPORT_TOKEN or not hmac.compare_digest(token, Config.EXPORT_TOKEN):
+        abort(403)
+    if kind not in EXPORT_FIELDS:
+        abort(404)
+
+    fmt = request.args.get("format", "csv")
+    gzip = request.args.get("gzip") == "1"
+    try:
+        start = _parse_date(request.args.get("from"))
+        end = _parse_date(request.args.get("to"))
+        chunks = export_stream(kind, fmt, start, end, request.args.get("status"), gzip)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if gzip:
+        mimetype = "application/gzip"
+    else:
+        mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    rv = Response(chunks, mimetype=mimetype)
+    rv.headers["Content-Disposition"] = f'attachment; filename="{export_filename(kind, fmt, gzip)}"'
+    rv.headers["Cache-Control"] = "no-store"
+    return rv
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus metrics (รวมทุก gunicorn worker ถ้าตั้ง PROMETHEUS_MULTIPROC_DIR)"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @bp.route("/")
 def home():
     return "Spotify Bot Modular Version is Running!"
\ No newline at end of file
@@ -9,6 +9,7 @@ class Config:
     CHANNEL_ACCESS_TOKEN = os.getenv('CHANNEL_ACCESS_TOKEN')
     CHANNEL_SECRET = os.getenv('CHANNEL_SECRET')
     MONGO_URI = os.getenv('MONGO_URI')
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'spotify_bot')
     ADMIN_USER_ID = os.getenv('ADMIN_USER_ID')
     GROUP_ID_TO_ALERT = os.getenv('GROUP_ID_TO_ALERT')
 
@@ -17,4 +18,66 @@ class Config:
     MONTHLY_PRICE = 41.5  # ราคาต่อเดือน (บาท)
     ADMIN_USER_ID = os.environ.get("ADMIN_USER_ID")
 
-    SLIP_TIMEOUT_HOURS = int(os.environ.get('SLIP_TIMEOUT_HOURS', 1))
\ No newline at end of file
+    SLIP_TIMEOUT_HOURS = int(os.environ.get('SLIP_TIMEOUT_HOURS', 1))
+    SLIP_RETENTION_DAYS = int(os.environ.get('SLIP_RETENTION_DAYS', 90)) # เก็บสลิปของรายการที่จบแล้วไว้กี่วัน
+
+    # เลื่อนการต่อ DB / migration / scheduler ไปตอน request แรก (ใช้กับ gunicorn --preload ได้)
+    LAZY_STARTUP = os.environ.get('LAZY_STARTUP', '0') == '1'
+
+    # สร้าง index / รัน migration อัตโนมัติตอนเริ่มแอป (ปิดได้แล้วใช้ `flask db-migrate` แทน)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+
+    # ที่เก็บรูปสลิป: "gridfs" (MongoDB) หรือ "disk"
+    SLIP_STORAGE = os.environ.get('SLIP_STORAGE', 'gridfs')
+    SLIP_STORAGE_DIR = os.environ.get('SLIP_STORAGE_DIR', 'slips')
+    SLIP_MAX_BYTES = int(os.environ.get('SLIP_MAX_BYTES', 10 * 1024 * 1024))
+    SLIP_CACHE_BYTES = int(os.environ.get('SLIP_CACHE_BYTES', 32 * 1024 * 1024)) # LRU cache ของ /slip
+
+    # รูป preview ที่ส่งให้แอดมิน (ย่อจากสลิปจริงใน process pool)
+    PREVIEW_MAX_SIZE = int(os.environ.get('PREVIEW_MAX_SIZE', 480))
+    PREVIEW_QUALITY = int(os.environ.get('PREVIEW_QUALITY', 70))
+    PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 1))
+
+    # สลิปที่ perceptual hash ต่างกันไม่เกินนี้ (bit) ถือว่าหน้าตาคล้ายกัน -> เตือนแอดมินในการ์ดอนุมัติ (ไม่ปฏิเสธเอง)
+    SLIP_PHASH_DISTANCE = int(os.environ.get('SLIP_PHASH_DISTANCE', 6))
+
+    # cache ข้อมูล user ข้าม event (วินาที, 0 = cache เฉพาะภายใน event เดียว)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 0))
+
+    # Scheduler: "local" (ทุก process แบบเดิม), "leader" (เลือก worker เดียวผ่าน MongoDB lease), "off"
+    SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'local')
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 30))
+    SCHEDULER_MISFIRE_GRACE = int(os.environ.get('SCHEDULER_MISFIRE_GRACE', 6 * 60 * 60)) # รัน job ที่พลาดไปย้อนหลังได้ไม่เกินกี่วินาที
+
+    # LINE API (เปลี่ยน endpoint ได้เพื่อทดสอบกับ stub server)
+    LINE_API_ENDPOINT = os.environ.get('LINE_API_ENDPOINT', 'https://api.line.me')
+    LINE_DATA_ENDPOINT = os.environ.get('LINE_DATA_ENDPOINT', 'https://api-data.line.me')
+    LINE_HTTP_POOL_SIZE = int(os.environ.get('LINE_HTTP_POOL_SIZE', 10))
+    LINE_MAX_RETRIES = int(os.environ.get('LINE_MAX_RETRIES', 3))
+    LINE_BATCH_MESSAGES = os.environ.get('LINE_BATCH_MESSAGES', '1') == '1' # รวมข้อความใน event เดียวกันเป็น request เดียว
+
+    # Webhook: "sync" = ประมวลผลก่อนตอบ LINE (แบบเดิม), "async" = ตอบ 200 ทันทีแล้วส่งเข้าคิว
+    WEBHOOK_MODE = os.environ.get('WEBHOOK_MODE', 'sync')
+    WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 4))
+    WEBHOOK_QUEUE_SIZE = int(os.environ.get('WEBHOOK_QUEUE_SIZE', 100))
+    WEBHOOK_DRAIN_TIMEOUT = int(os.environ.get('WEBHOOK_DRAIN_TIMEOUT', 10))
+    WEBHOOK_DEDUP = os.environ.get('WEBHOOK_DEDUP', '1') == '1' # ทิ้ง event ที่ LINE ส่งซ้ำ (webhookEventId เดิม)
+    WEBHOOK_DEDUP_TTL_HOURS = int(os.environ.get('WEBHOOK_DEDUP_TTL_HOURS', 24))
+
+    # Outbox: push notification ที่บันทึกลง MongoDB ก่อนแล้วค่อยส่ง
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8)) # เกินนี้ -> status 'dead'
+    OUTBOX_POLL_SECONDS = int(os.environ.get('OUTBOX_POLL_SECONDS', 5))
+    OUTBOX_LOCK_SECONDS = int(os.environ.get('OUTBOX_LOCK_SECONDS', 60)) # worker ตายระหว่างส่ง -> ส่งใหม่หลังเวลานี้
+
+    # Reminder รายคน (multicast)
+    REMINDER_DIRECT = os.environ.get('REMINDER_DIRECT', '1') == '1'
+    REMINDER_UPCOMING_DAYS = int(os.environ.get('REMINDER_UPCOMING_DAYS', 3))
+    REMINDER_RATE_PER_SECOND = float(os.environ.get('REMINDER_RATE_PER_SECOND', 2)) # จำนวน request multicast ต่อวินาที
+
+    # ใช้ multi-document transaction ตอนอนุมัติรายการ (MongoDB ต้องเป็น replica set)
+    MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', '0') == '1'
+    APPROVE_CLAIM_SECONDS = int(os.environ.get('APPROVE_CLAIM_SECONDS', 60)) # คนกดอนุมัติตายกลางทาง -> กดใหม่ได้หลังเวลานี้
+
+    # token สำหรับ /export/<ชุดข้อมูล> (ไม่ตั้ง = ปิด endpoint)
+    EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN')
\ No newline at end of file
@@ -1,17 +1,53 @@
+import io
+import time
+import uuid
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-import bson.binary
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson.objectid import ObjectId
 from .config import Config
+from .storage import SlipFile, create_slip_storage
+from app.utils.cache import ScopedCache
+from app.utils.lazy import ProcessLocal
+from app.modules.metrics import MongoCommandListener
+from app.utils.validators import normalize_nickname
+from app.utils.billing_period import parse_billing_period, parse_many
+from app.utils.date_time import get_thai_time
 
-# เชื่อมต่อ Database
-client = MongoClient(Config.MONGO_URI)
-db = client['spotify_bot'] # เช็คชื่อ DB ให้ตรงกับของคุณ
+DB_NAME = Config.MONGO_DB_NAME # เช็คชื่อ DB ให้ตรงกับของคุณ
+
+# เชื่อมต่อ Database ตอนใช้งานครั้งแรกของแต่ละ process (ไม่ต่อตอน import / ก่อน gunicorn fork)
+client = ProcessLocal(lambda: MongoClient(Config.MONGO_URI, event_listeners=[MongoCommandListener()]))
+db = ProcessLocal(lambda: client.get()[DB_NAME])
+
+def collection(name):
+    return ProcessLocal(lambda: db.get()[name])
 
 # Collections
-users_col = db['users']
-transactions_col = db['transactions']
-slips_col = db['slips']
+users_col = collection('users')
+transactions_col = collection('transactions')
+slips_col = collection('slips') # สลิปแบบเก่า (เก็บ binary ไว้ใน document)
+slip_hashes_col = collection('slip_hashes') # hash ของสลิปที่ใช้แจ้งโอนแล้ว (กันส่งสลิปซ้ำ)
+locks_col = collection('locks') # lease สำหรับเลือก worker ที่รัน scheduler
+job_runs_col = collection('scheduler_runs') # เวลารันล่าสุดของแต่ละ job
+webhook_events_col = collection('webhook_events') # webhookEventId ที่เคยรับแล้ว (กัน redelivery)
+replay_checkpoints_col = collection('replay_checkpoints') # จุดที่ ledger replay ทำถึง (resume ได้)
+billing_rollups_col = collection('billing_rollups') # ยอดรวมต่อเดือน (อัปเดตตอนอนุมัติ/ปฏิเสธ + rebuild ทุกวัน)
+outbox_col = collection('outbox') # push notification ที่รอส่ง (ส่งโดย OutboxWorker)
+
+# ที่เก็บไฟล์สลิป (GridFS หรือ Disk ตาม Config.SLIP_STORAGE)
+slip_storage = ProcessLocal(lambda: create_slip_storage(db.get()))
+
+def ping_database():
+    """เช็คว่าต่อ MongoDB ได้ (สร้าง client ถ้ายังไม่มี)"""
+    client.admin.command("ping")
+    return True
+
+# collation ของ index ชื่อเล่น (query ที่ใช้ nickname_key ต้องส่ง collation เดียวกันถึงจะใช้ index ได้)
+NICKNAME_COLLATION = {"locale": "th", "strength": 2}
+
+# cache ข้อมูล user: ต่อ event เสมอ + ข้าม event ถ้าตั้ง USER_CACHE_TTL (ทุกฟังก์ชันที่เขียน users_col ต้อง invalidate)
+user_cache = ScopedCache("user", ttl=Config.USER_CACHE_TTL)
 
 # --- User Functions ---
 
@@ -20,151 +56,742 @@ def check_nickname_available(nickname, user_id):
     เช็คว่าชื่อเล่นว่างไหม (Case Insensitive)
     คืนค่า True ถ้าว่าง (หรือเป็นชื่อเดิมของตัวเอง), False ถ้ามีคนอื่นใช้แล้ว
     """
-    existing_user = users_col.find_one({
-        "nickname": {"$regex": f"^{nickname}$", "$options": "i"}, 
-        "user_id": {"$ne": user_id} 
-    })
+    existing_user = users_col.find_one(
+        {"nickname_key": normalize_nickname(nickname), "user_id": {"$ne": user_id}},
+        {"_id": 1},
+        collation=NICKNAME_COLLATION
+    )
     return existing_user is None
 
 def register_user(user_id, firstname, lastname, nickname, tel, email):
     """ลงทะเบียน (เพิ่มเบอร์, อีเมล และเช็คชื่อซ้ำก่อนเรียกฟังก์ชันนี้)"""
-    users_col.update_one(
-        {"user_id": user_id},
-        {"$set": {
-            "first_name": firstname,
-            "last_name": lastname,
-            "nickname": nickname,
-            "tel_number": tel,
-            "email": email,
-            "is_registered": True,
-            "registered_at": datetime.now()
-        }},
-        upsert=True
-    )
+    try:
+        users_col.update_one(
+            {"user_id": user_id},
+            {"$set": {
+                "first_name": firstname,
+                "last_name": lastname,
+                "nickname": nickname,
+                "nickname_key": normalize_nickname(nickname),
+                "tel_number": tel,
+                "email": email,
+                "is_registered": True,
+                "registered_at": datetime.now(),
+                "updated_at": datetime.now()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        user_cache.invalidate(user_id)
+        # มีคนลงทะเบียนชื่อเดียวกันตัดหน้าไประหว่างเช็คกับบันทึก (unique index กันไว้)
+        raise ValueError(f"❌ ชื่อเล่น '{nickname}' มีคนใช้แล้วค่ะ!")
+    user_cache.invalidate(user_id)
+
+def _load_user(user_id):
+    return users_col.find_one({'user_id': user_id})
 
 def check_is_registered(user_id):
     """เช็คสถานะลงทะเบียน"""
-    user = users_col.find_one({"user_id": user_id})
+    user = get_user(user_id)
     return user is not None and user.get("is_registered", False) is True
 
 def get_user(user_id):
-    """ดึงข้อมูล User"""
-    return users_col.find_one({'user_id': user_id})
+    """ดึงข้อมูล User (อ่านจาก DB อย่างมาก 1 ครั้งต่อ event)"""
+    return user_cache.get(user_id, _load_user)
 
-def get_all_users():
-    """ดึง User ทั้งหมด (สำหรับ Scheduler)"""
-    return users_col.find()
+def get_overdue_report(now=None):
+    """
+    รายชื่อคนค้างชำระ (next_due_date <= now) คำนวณฝั่ง MongoDB ใช้ index next_due_date
+    คืนค่า list ของ {user_id, nickname, next_due_date, months_overdue, amount_owed}
+    """
+    now = now or get_thai_time().replace(tzinfo=None)
+    pipeline = [
+        {"$match": {"next_due_date": {"$lte": now}}},
+        {"$project": {"_id": 0, "user_id": 1, "nickname": 1, "next_due_date": 1}},
+        *_months_overdue_stages(now),
+        {"$set": {"amount_owed": {"$multiply": ["$months_overdue", Config.MONTHLY_PRICE]}}},
+        {"$sort": {"next_due_date": 1}},
+    ]
+    return list(users_col.aggregate(pipeline))
+
+def _months_overdue_stages(now):
+    """stage ที่เติม months_overdue (จำนวนรอบที่ครบกำหนดแล้วแต่ยังไม่จ่าย, ยังไม่ถึงกำหนด = 0)"""
+    months_diff = {"$dateDiff": {"startDate": "$next_due_date", "endDate": now, "unit": "month"}}
+    return [
+        {"$set": {"months_diff": months_diff}},
+        # ครบรอบของเดือนล่าสุดแล้วหรือยัง (เช่น due 13 ม.ค. ถึงวันนี้ 20 ก.พ. = ค้าง 2 รอบ)
+        {"$set": {"months_overdue": {"$max": [0, {"$cond": [
+            {"$lte": [{"$dateAdd": {"startDate": "$next_due_date", "unit": "month", "amount": "$months_diff"}}, now]},
+            {"$add": ["$months_diff", 1]},
+            "$months_diff"
+        ]}]}}},
+        {"$unset": "months_diff"},
+    ]
+
+def get_reminder_groups(now=None, upcoming_days=3):
+    """
+    คนที่ต้องเตือน (ค้างชำระ หรือครบกำหนดภายใน upcoming_days วัน) จัดกลุ่มตามข้อความที่จะส่ง
+    คืนค่า list ของ {months_overdue, due_date, user_ids} (due_date มีเฉพาะกลุ่มที่ยังไม่ค้าง)
+    """
+    now = now or get_thai_time().replace(tzinfo=None)
+    pipeline = [
+        {"$match": {"next_due_date": {"$lte": now + timedelta(days=upcoming_days)}}},
+        {"$project": {"_id": 0, "user_id": 1, "next_due_date": 1}},
+        *_months_overdue_stages(now),
+        {"$group": {
+            "_id": {
+                "months_overdue": "$months_overdue",
+                "due_date": {"$cond": [
+                    {"$eq": ["$months_overdue", 0]},
+                    {"$dateTrunc": {"date": "$next_due_date", "unit": "day"}},
+                    None
+                ]}
+            },
+            "user_ids": {"$push": "$user_id"}
+        }},
+        {"$project": {"_id": 0, "months_overdue": "$_id.months_overdue", "due_date": "$_id.due_date", "user_ids": 1}},
+        {"$sort": {"months_overdue": -1, "due_date": 1}},
+    ]
+    return list(users_col.aggregate(pipeline))
 
 def find_users_by_nickname(nickname):
-    """ค้นหา User จากชื่อเล่น (Admin Search)"""
-    regex_query = {"$regex": f"^{nickname}$", "$options": "i"}
-    return list(users_col.find({"nickname": regex_query}))
+    """ค้นหา User จากชื่อเล่นแบบตรงตัว (ใช้ index nickname_key) สำหรับ #check ตอน index ในหน่วยความจำยังไม่พร้อม"""
+    return list(users_col.find(
+        {"nickname_key": normalize_nickname(nickname)},
+        {"_id": 0, "user_id": 1, "nickname": 1, "first_name": 1, "next_due_date": 1},
+        collation=NICKNAME_COLLATION
+    ))
 
-def update_user_payment(user_id, tx_id, new_due_date):
-    """อัปเดตวันครบกำหนดชำระใหม่"""
-    users_col.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "next_due_date": new_due_date,
-                "last_transaction_id": tx_id
-            }
-        }
+def find_nickname_collisions():
+    """ชื่อเล่นที่ normalize แล้วซ้ำกัน (ติด unique index ไม่ได้) คืนค่า list ของ {_id: key, nicknames, user_ids}"""
+    return list(users_col.aggregate([
+        {"$match": {"nickname_key": {"$exists": True}}},
+        {"$group": {"_id": "$nickname_key", "nicknames": {"$push": "$nickname"}, "user_ids": {"$push": "$user_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$project": {"count": 0}},
+    ], collation=NICKNAME_COLLATION))
+
+def iter_users_for_search(since=None):
+    """ข้อมูลที่ใช้ทำ index ค้นชื่อ (since = เอาเฉพาะที่ updated_at ตั้งแต่เวลานี้, None = ทั้งหมด)"""
+    query = {"is_registered": True}
+    if since is not None:
+        query["updated_at"] = {"$gte": since}
+    return users_col.find(
+        query,
+        {"_id": 0, "user_id": 1, "nickname": 1, "first_name": 1, "next_due_date": 1, "updated_at": 1}
     )
 
+def backfill_nickname_keys(batch_size=1000):
+    """เติม nickname_key ให้ user เก่าที่ลงทะเบียนก่อนมี field นี้ คืนค่าจำนวนที่อัปเดต"""
+    updated = 0
+    ops = []
+    cursor = users_col.find(
+        {"nickname": {"$exists": True}, "nickname_key": {"$exists": False}},
+        {"nickname": 1}
+    ).batch_size(batch_size)
+    for user in cursor:
+        ops.append(UpdateOne({"_id": user["_id"]}, {"$set": {"nickname_key": normalize_nickname(user["nickname"])}}))
+        if len(ops) >= batch_size:
+            updated += users_col.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += users_col.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+def _period_fields(period):
+    """เดือนแรก/เดือนสุดท้ายของรอบบิล (วันที่ 1) สำหรับ query ตามช่วงเดือน"""
+    if not period:
+        return {}
+    return {
+        "period_start": datetime(period.start_year, period.start_month, 1),
+        "period_end": datetime(period.end_year, period.end_month, 1),
+    }
+
+def backfill_billing_periods(batch_size=1000):
+    """แกะ billing ของรายการเก่าเป็น period_start / period_end คืนค่าจำนวนที่อัปเดต"""
+    updated = 0
+    cursor = transactions_col.find(
+        {"billing": {"$exists": True}, "period_start": {"$exists": False}},
+        {"billing": 1, "created_at": 1}
+    ).batch_size(batch_size)
+    batch = []
+
+    def flush(batch):
+        periods = parse_many([tx.get("billing") or "" for tx in batch], [tx.get("created_at") for tx in batch])
+        ops = [
+            UpdateOne({"_id": tx["_id"]}, {"$set": _period_fields(period)})
+            for tx, period in zip(batch, periods) if period
+        ]
+        return transactions_col.bulk_write(ops, ordered=False).modified_count if ops else 0
+
+    for tx in cursor:
+        batch.append(tx)
+        if len(batch) >= batch_size:
+            updated += flush(batch)
+            batch = []
+    if batch:
+        updated += flush(batch)
+    return updated
+
 # --- Transaction Functions ---
 
-def create_transaction(tx_id, user_id, amount, months, billing):
-    """สร้างรายการ (Lean Schema - แบบลดรูป)"""
+def create_transaction(tx_id, user_id, amount, months, billing, slip_id=None, notify=None):
+    """
+    สร้างรายการ (Lean Schema - แบบลดรูป)
+    notify(tx, session) = บันทึกข้อความแจ้งแอดมินลง outbox ใน transaction เดียวกัน
+    """
     data = {
         "_id": tx_id,
         "uid": user_id,          
         "amount": amount,
         "cnt_month": months,     
         "billing": billing,
+        "slip_id": slip_id,      # สลิปที่แนบ (กันไม่ให้ cleanup ลบ)
         "status": "pending",     
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        **_period_fields(parse_billing_period(billing))
     }
-    transactions_col.insert_one(data)
+
+    def run(session):
+        if notify:
+            # ไม่มี MONGO_TRANSACTIONS: บันทึก outbox ก่อน ถ้าตายกลางทางแอดมินได้การ์ดที่กดแล้วขึ้น "ไม่พบข้อมูล"
+            # ดีกว่ามีรายการ pending ค้างที่แอดมินไม่เคยเห็น
+            notify(data, session)
+        transactions_col.insert_one(data, session=session)
+
+    _with_transaction(run)
 
 def get_transaction(tx_id):
     return transactions_col.find_one({"_id": tx_id})
 
-def complete_transaction(tx_id):
-    transactions_col.update_one(
-        {"_id": tx_id},
-        {"$set": {"status": "completed", "approved_at": datetime.now()}}
-    )
+def _with_transaction(func):
+    """
+    เรียก func(session) ใน multi-document transaction ถ้าเปิด MONGO_TRANSACTIONS (ต้องเป็น replica set / Atlas)
+    ไม่งั้นเรียก func(None) ตรง ๆ
+    """
+    if not Config.MONGO_TRANSACTIONS:
+        return func(None)
+    with client.start_session() as session:
+        return session.with_transaction(func)
+
+def _claimable(tx_id, now):
+    """filter ของรายการที่ยัง pending และไม่มีใครกำลังอนุมัติอยู่ (หรือคนที่ถือ claim ค้างเกิน APPROVE_CLAIM_SECONDS)"""
+    return {
+        "_id": tx_id,
+        "status": "pending",
+        "$or": [
+            {"approving_at": {"$exists": False}},
+            {"approving_at": {"$lt": now - timedelta(seconds=Config.APPROVE_CLAIM_SECONDS)}},
+        ],
+    }
+
+def approve_transaction(tx_id, next_due_date_for, notify=None):
+    """
+    อนุมัติรายการ: pending -> completed ได้ครั้งเดียว (กดซ้ำ/กดพร้อมกันก็ไม่อนุมัติซ้ำ)
+    1. claim รายการด้วย approving_at (คนอื่นที่กดพร้อมกันจะ claim ไม่ได้)
+    2. อัปเดตวันครบกำหนดของ user ด้วย next_due_date_for(tx, user) (user อ่านด้วย session เดียวกัน อาจเป็น None)
+       ข้ามถ้า last_transaction_id เป็นรายการนี้แล้ว
+    3. notify(tx, new_due_date, session) บันทึกข้อความแจ้ง user ลง outbox (ใน transaction เดียวกัน)
+    4. เปลี่ยน status เป็น completed เป็นขั้นสุดท้าย
+    ถ้าตายกลางทางโดยไม่มี MONGO_TRANSACTIONS รายการยัง pending กดอนุมัติใหม่ได้หลัง APPROVE_CLAIM_SECONDS โดยวันครบกำหนดไม่เลื่อนซ้ำ
+    ส่วนยอดรวมรายเดือน (billing_rollups) อัปเดตหลัง commit แบบ best-effort
+    คืนค่า (tx, new_due_date) หรือ None ถ้ารายการไม่ได้อยู่ในสถานะ pending (หรือมีคนกำลังอนุมัติอยู่)
+    """
+    def run(session):
+        claimed_at = datetime.now()
+        tx = transactions_col.find_one_and_update(
+            _claimable(tx_id, claimed_at),
+            {"$set": {"approving_at": claimed_at}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if tx is None:
+            return None
+
+        user = users_col.find_one(
+            {"user_id": tx["uid"]}, {"next_due_date": 1, "last_transaction_id": 1}, session=session
+        )
+        if user and user.get("last_transaction_id") == tx_id:
+            # รอบก่อนอัปเดต user ไปแล้วแต่ยังไม่ได้ปิดรายการ -> ใช้วันครบกำหนดเดิม ไม่เลื่อนซ้ำ
+            new_due_date = user["next_due_date"]
+        else:
+            new_due_date = next_due_date_for(tx, user)
+            users_col.update_one(
+                {"user_id": tx["uid"], "last_transaction_id": {"$ne": tx_id}},
+                {"$set": {"next_due_date": new_due_date, "last_transaction_id": tx_id, "updated_at": datetime.now()}},
+                session=session
+            )
+
+        if notify:
+            notify(tx, new_due_date, session)
+
+        done = {"status": "completed", "approved_at": datetime.now()}
+        if not tx.get("period_start"):
+            # แกะช่วงเดือนจาก billing ไม่ได้ -> นับย้อนจาก Due Date ใหม่ (จ่าย n เดือน = n เดือนก่อนเดือนที่ครบกำหนด)
+            months = int(tx["cnt_month"])
+            due_index = new_due_date.year * 12 + new_due_date.month - 1
+            done.update({"period_start": _month_start(due_index - months), "period_end": _month_start(due_index - 1)})
+        # ปิดรายการเป็นขั้นสุดท้าย เฉพาะถ้า claim ยังเป็นของเรา (claim ที่ค้างอาจถูกคนอื่นรับช่วงไปแล้ว)
+        finalised = transactions_col.update_one(
+            {"_id": tx_id, "status": "pending", "approving_at": claimed_at},
+            {"$set": done, "$unset": {"approving_at": ""}},
+            session=session
+        )
+        if not finalised.modified_count:
+            return None
+        tx.update(done)
+        tx.pop("approving_at", None)
+        return tx, new_due_date
+
+    result = _with_transaction(run)
+    if result:
+        tx = result[0]
+        user_cache.invalidate(tx["uid"])
+        months = _covered_months(tx)
+        _try_inc_rollups(months, {
+            "paid_count": 1,
+            "amount_collected": tx["amount"] / len(months),
+            "expected_amount": Config.MONTHLY_PRICE,
+        }, payer=tx["uid"])
+    return result
 
-def reject_transaction(tx_id):
-    transactions_col.update_one(
-        {"_id": tx_id},
-        {"$set": {"status": "rejected", "rejected_at": datetime.now()}}
+def reject_transaction(tx_id, notify=None):
+    """
+    ปฏิเสธรายการแบบ atomic (เฉพาะที่ยัง pending และไม่มีใครกำลังอนุมัติอยู่) คืนค่า transaction หรือ None
+    notify(tx, session) = บันทึกข้อความแจ้ง user ลง outbox ใน transaction เดียวกัน
+    """
+    def run(session):
+        tx = transactions_col.find_one_and_update(
+            _claimable(tx_id, datetime.now()),
+            {"$set": {"status": "rejected", "rejected_at": datetime.now()}, "$unset": {"approving_at": ""}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if tx and notify:
+            notify(tx, session)
+        return tx
+
+    tx = _with_transaction(run)
+    if tx and tx.get("period_start"):
+        _try_inc_rollups(_covered_months(tx), {"rejected_count": 1})
+    return tx
+
+# --- Billing Rollups (ยอดรวมต่อเดือนของรอบบิล) ---
+
+def _month_start(month_index):
+    """month_index = ปี * 12 + (เดือน - 1) -> datetime วันที่ 1 ของเดือนนั้น"""
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+def rollup_key(year, month):
+    return f"{year:04d}-{month:02d}"
+
+def _covered_months(tx):
+    """คีย์ "YYYY-MM" ของทุกเดือนที่รายการนี้จ่าย (จาก period_start ถึง period_end)"""
+    start, end = tx["period_start"], tx["period_end"]
+    first = start.year * 12 + start.month - 1
+    last = max(first, end.year * 12 + end.month - 1)
+    return [rollup_key(i // 12, i % 12 + 1) for i in range(first, last + 1)]
+
+def _inc_rollups(months, inc, payer=None):
+    update = {"$inc": inc, "$set": {"updated_at": datetime.now()}}
+    if payer:
+        update["$addToSet"] = {"payers": payer}
+    billing_rollups_col.bulk_write(
+        [UpdateOne({"_id": month}, update, upsert=True) for month in months],
+        ordered=False
     )
 
+def _try_inc_rollups(months, inc, payer=None):
+    """
+    อัปเดต rollup หลังอนุมัติ/ปฏิเสธสำเร็จแล้ว (best-effort): ล้มเหลวก็ไม่ทำให้การอนุมัติล้ม
+    ตัวเลขที่คลาดจะถูกแก้ตอน rebuild_billing_rollups รอบถัดไป
+    """
+    try:
+        _inc_rollups(months, inc, payer=payer)
+    except Exception as e:
+        print(f"Billing Rollup Error ({', '.join(months)}): {e}")
+
+def get_billing_rollup(year, month):
+    return billing_rollups_col.find_one({"_id": rollup_key(year, month)})
+
+def rebuild_billing_rollups():
+    """
+    สร้าง billing_rollups ใหม่ทั้งหมดจาก transactions (แก้ยอดที่คลาดจากการอัปเดตทีละรายการ)
+    ใช้ $out แทนที่ collection เดิมแบบ atomic คืนค่าจำนวนเดือน
+    """
+    def month_index(field):
+        return {"$add": [{"$multiply": [{"$year": field}, 12]}, {"$subtract": [{"$month": field}, 1]}]}
+
+    completed = {"$eq": ["$status", "completed"]}
+    pipeline = [
+        {"$match": {"status": {"$in": ["completed", "rejected"]}, "period_start": {"$exists": True}}},
+        {"$project": {
+            "uid": 1, "status": 1, "amount": 1,
+            "first": month_index("$period_start"),
+            "last": {"$max": [month_index("$period_start"), month_index("$period_end")]},
+        }},
+        {"$set": {"month": {"$range": ["$first", {"$add": ["$last", 1]}]}, "share": {"$divide": ["$amount", {"$add": [{"$subtract": ["$last", "$first"]}, 1]}]}}},
+        {"$unwind": "$month"},
+        {"$group": {
+            "_id": "$month",
+            "paid_count": {"$sum": {"$cond": [completed, 1, 0]}},
+            "rejected_count": {"$sum": {"$cond": [completed, 0, 1]}},
+            "amount_collected": {"$sum": {"$cond": [completed, "$share", 0]}},
+            "payers": {"$addToSet": {"$cond": [completed, "$uid", "$$REMOVE"]}},
+        }},
+        {"$set": {
+            "_id": {"$concat": [
+                {"$toString": {"$toInt": {"$floor": {"$divide": ["$_id", 12]}}}}, "-",
+                {"$cond": [{"$lt": [{"$mod": ["$_id", 12]}, 9]}, "0", ""]},
+                {"$toString": {"$add": [{"$mod": ["$_id", 12]}, 1]}},
+            ]},
+            "expected_amount": {"$multiply": ["$paid_count", Config.MONTHLY_PRICE]},
+            "updated_at": datetime.now(),
+        }},
+        {"$out": "billing_rollups"},
+    ]
+    transactions_col.aggregate(pipeline)
+    return billing_rollups_col.count_documents({})
+
 # --- Slip (Image) Functions ---
 
-def save_temp_slip_id(user_id, file_id):
+def save_temp_slip_id(user_id, file_id, slip_hash=None):
     users_col.update_one(
         {"user_id": user_id},
         {
             "$set": {
                 "temp_slip_id": file_id,
+                "temp_slip_hash": slip_hash, # {"sha256": ..., "phash": ...} ไว้บันทึกตอนแจ้งโอน
                 "slip_uploaded_at": datetime.now() # บันทึกเวลาที่ส่งรูป
             }
         }
     )
+    user_cache.invalidate(user_id)
 
-def save_slip_image(file_stream, filename):
-    file_bytes = file_stream.read()
-    file_doc = {
-        "filename": filename,
-        "data": bson.binary.Binary(file_bytes),
-        "created_at": datetime.now()
-    }
-    result = slips_col.insert_one(file_doc)
-    return str(result.inserted_id)
+def clear_temp_slip(user_id):
+    """ล้างสลิปที่รอแจ้งโอน (หลังสร้างรายการแล้ว)"""
+    users_col.update_one(
+        {"user_id": user_id},
+        {"$unset": {"temp_slip_id": "", "temp_slip_hash": "", "slip_uploaded_at": ""}}
+    )
+    user_cache.invalidate(user_id)
+
+def save_slip_image(chunks, filename):
+    """เขียนรูปสลิปลง storage ทีละ chunk คืนค่า file_id"""
+    return slip_storage.save(chunks, filename)
 
 def get_slip_image(file_id):
+    """เปิดไฟล์สลิปเพื่ออ่านแบบ stream (คืนค่า SlipFile หรือ None)"""
+    slip = slip_storage.open(file_id)
+    if slip is not None:
+        return slip
+
+    # สลิปที่อัปโหลดก่อนย้ายไป storage ใหม่ยังอยู่ใน slips_col
     try:
-        return slips_col.find_one({"_id": ObjectId(file_id)})
-    except:
+        file_doc = slips_col.find_one({"_id": ObjectId(file_id)})
+    except Exception:
         return None
-    
+    if not file_doc:
+        return None
+    data = bytes(file_doc['data'])
+    return SlipFile(io.BytesIO(data), len(data), file_doc['filename'], None)
+
+def save_slip_preview(file_id, data):
+    slip_storage.save_preview(file_id, data)
+
+def has_slip_preview(file_id):
+    return slip_storage.has_preview(file_id)
+
+def get_slip_preview(file_id):
+    """เปิดรูป preview ของสลิป (None ถ้ายังสร้างไม่เสร็จ)"""
+    return slip_storage.open_preview(file_id)
+
+def find_slip_hash(sha256):
+    return slip_hashes_col.find_one({"_id": sha256})
+
+def save_slip_hash(sha256, phash, user_id, file_id, tx_id):
+    """บันทึก hash ของสลิปที่ผูกกับรายการโอนแล้ว"""
+    slip_hashes_col.update_one(
+        {"_id": sha256},
+        {"$setOnInsert": {
+            "phash": phash,
+            "uid": user_id,
+            "file_id": file_id,
+            "tx_id": tx_id,
+            "created_at": datetime.now()
+        }},
+        upsert=True
+    )
+
+def delete_slip_hash(tx_id):
+    """ลบ hash ของรายการที่ถูกปฏิเสธ (ให้ส่งสลิปเดิมมาแจ้งใหม่ได้)"""
+    slip_hashes_col.delete_many({"tx_id": tx_id})
+
+def iter_slip_hashes(since=None):
+    """ดึง hash ทั้งหมด (หรือเฉพาะที่ created_at ตั้งแต่ since) สำหรับสร้าง index ในหน่วยความจำ"""
+    query = {"created_at": {"$gte": since}} if since else {}
+    return slip_hashes_col.find(query, {"phash": 1, "created_at": 1}).sort("created_at", 1)
+
 def delete_file_from_storage(file_id):
-    """ฟังก์ชันช่วยลบไฟล์จริงออกจาก GridFS หรือ Disk"""
-    # ถ้าใช้ GridFS (ตามโค้ดเดิมน่าจะใช้ fs)
+    """ลบไฟล์สลิปออกจาก storage (รวมถึงสลิปแบบเก่าใน slips_col)"""
     try:
-        from app.setup.database import fs # หรือ import fs มาจากที่ที่คุณประกาศไว้
-        fs.delete(file_id)
+        slip_storage.delete(file_id)
+        if ObjectId.is_valid(file_id):
+            slips_col.delete_one({"_id": ObjectId(file_id)})
     except Exception as e:
         print(f"Error deleting file {file_id}: {e}")
 
-def cleanup_expired_slips():
-    """ค้นหาและลบสลิปที่ค้างไว้นานเกินกำหนด"""
-    timeout_hours = Config.SLIP_TIMEOUT_HOURS
-    # เวลาเส้นตาย = ตอนนี้ - 3 ชั่วโมง
-    cutoff_time = datetime.now() - timedelta(hours=timeout_hours)
-
-    # หา User ที่มี temp_slip_id และเวลาอัปโหลดเก่ากว่าเส้นตาย
-    expired_users = users_col.find({
-        "temp_slip_id": {"$exists": True},
-        "slip_uploaded_at": {"$lt": cutoff_time}
-    })
-
-    count = 0
-    for user in expired_users:
-        file_id = user.get('temp_slip_id')
-        if file_id:
-            # 1. ลบไฟล์จริง
-            delete_file_from_storage(file_id)
-            
-            # 2. ลบข้อมูลออกจาก User record
-            users_col.update_one(
-                {"_id": user["_id"]},
-                {"$unset": {"temp_slip_id": "", "slip_uploaded_at": ""}}
-            )
-            count += 1
-            
-    if count > 0:
-        print(f"🧹 Cleaned up {count} expired slips.")
\ No newline at end of file
+def _referenced_slip_ids(file_ids, retention_cutoff):
+    """จาก file_ids คืนค่าชุดที่ยังถูกใช้อยู่ (สลิปรอแจ้งโอน / รายการ pending / รายการที่ยังไม่พ้นระยะเก็บ)"""
+    referenced = set(users_col.distinct("temp_slip_id", {"temp_slip_id": {"$in": file_ids}}))
+    referenced.update(transactions_col.distinct("slip_id", {
+        "slip_id": {"$in": file_ids},
+        "$or": [{"status": "pending"}, {"created_at": {"$gte": retention_cutoff}}]
+    }))
+    return referenced
+
+def cleanup_expired_slips(batch_size=500):
+    """
+    ล้างสลิปที่ค้างไว้นานเกินกำหนด:
+    1. ยกเลิก temp_slip_id ที่หมดเวลาด้วย update_many ครั้งเดียว
+    2. ลบไฟล์ใน storage ที่ไม่มีใครอ้างอิงแล้ว (orphan) เป็นชุด ๆ
+    (สลิปแบบเก่าใน slips_col หมดอายุเองด้วย TTL index)
+    """
+    started = time.monotonic()
+    now = datetime.now()
+    # เวลาเส้นตาย = ตอนนี้ - SLIP_TIMEOUT_HOURS
+    cutoff_time = now - timedelta(hours=Config.SLIP_TIMEOUT_HOURS)
+    retention_cutoff = now - timedelta(days=Config.SLIP_RETENTION_DAYS)
+
+    expired = users_col.update_many(
+        {"temp_slip_id": {"$exists": True}, "slip_uploaded_at": {"$lt": cutoff_time}},
+        {"$unset": {"temp_slip_id": "", "temp_slip_hash": "", "slip_uploaded_at": ""}}
+    ).modified_count
+    if expired:
+        user_cache.clear()
+
+    deleted = 0
+    reclaimed_bytes = 0
+    batch = []
+
+    def sweep(batch):
+        referenced = _referenced_slip_ids(batch, retention_cutoff)
+        orphans = [f for f in batch if f not in referenced]
+        return len(orphans), slip_storage.delete_many(orphans) if orphans else 0
+
+    for file_id, _ in slip_storage.iter_older_than(cutoff_time):
+        batch.append(file_id)
+        if len(batch) >= batch_size:
+            n, size = sweep(batch)
+            deleted, reclaimed_bytes = deleted + n, reclaimed_bytes + size
+            batch = []
+    if batch:
+        n, size = sweep(batch)
+        deleted, reclaimed_bytes = deleted + n, reclaimed_bytes + size
+
+    report = {
+        "expired_temp_slips": expired,
+        "deleted_files": deleted,
+        "reclaimed_bytes": reclaimed_bytes,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    if expired or deleted:
+        print(f"🧹 Cleaned up slips: {report}")
+    return report
+
+# --- Lease / Scheduler State ---
+
+def acquire_lease(name, owner, ttl_seconds):
+    """
+    ขอ/ต่ออายุ lease (ได้ถ้ายังไม่มีใครถือ, lease เดิมหมดอายุ หรือเราถืออยู่แล้ว)
+    คืนค่า True ถ้าเราเป็นเจ้าของ lease หลังเรียก
+    """
+    now = datetime.now()
+    try:
+        locks_col.find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds), "renewed_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return True
+    except DuplicateKeyError:
+        # มี lease ที่ยังไม่หมดอายุของคนอื่นอยู่ (upsert ชน _id)
+        return False
+
+def release_lease(name, owner):
+    locks_col.delete_one({"_id": name, "owner": owner})
+
+def record_job_run(job_id, started_at, seconds, error=None):
+    job_runs_col.update_one(
+        {"_id": job_id},
+        {"$set": {"last_run_at": started_at, "seconds": seconds, "error": error}},
+        upsert=True
+    )
+
+def enqueue_notification(to, messages, key=None, session=None):
+    """
+    บันทึกข้อความที่จะ push ลง outbox (messages = list ของ dict จาก as_json_dict()) คืนค่า _id
+    key = _id ที่กำหนดเอง: เรียกซ้ำด้วย key เดิม (เช่น อนุมัติใหม่หลังตายกลางทาง) จะบันทึกแค่ครั้งเดียว
+    session = ใส่ใน multi-document transaction เดียวกับการเปลี่ยนสถานะรายการ
+    """
+    now = datetime.now()
+    doc = {
+        "to": to,
+        "messages": messages,
+        "retry_key": str(uuid.uuid4()), # X-Line-Retry-Key เดิมทุกครั้งที่ส่งซ้ำ -> LINE ไม่ส่งข้อความซ้ำ
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+    if key is None:
+        return outbox_col.insert_one(doc, session=session).inserted_id
+    outbox_col.update_one({"_id": key}, {"$setOnInsert": doc}, upsert=True, session=session)
+    return key
+
+def claim_outbox_batch(owner, limit, lock_seconds):
+    """
+    จองข้อความที่ถึงเวลาส่งทีละรายการแบบ atomic (หลาย worker ดึงพร้อมกันได้ไม่ชนกัน)
+    รวมถึงรายการ 'sending' ที่ worker เดิมจองไว้แต่หมดเวลาแล้ว
+    """
+    now = datetime.now()
+    claimed = []
+    for _ in range(limit):
+        doc = outbox_col.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "sending", "owner": owner, "locked_until": now + timedelta(seconds=lock_seconds)},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            break
+        claimed.append(doc)
+    return claimed
+
+def mark_outbox_sent(outbox_id):
+    outbox_col.update_one(
+        {"_id": outbox_id},
+        {"$set": {"status": "sent", "sent_at": datetime.now()}, "$unset": {"owner": "", "locked_until": ""}}
+    )
+
+def mark_outbox_failed(outbox_id, error, next_attempt_at=None):
+    """ส่งไม่สำเร็จ: ถ้ามี next_attempt_at จะกลับไปรอส่งใหม่ ไม่งั้นเป็น 'dead' (ต้องดูเอง)"""
+    status = "pending" if next_attempt_at else "dead"
+    update = {"status": status, "last_error": error}
+    if next_attempt_at:
+        update["next_attempt_at"] = next_attempt_at
+    outbox_col.update_one(
+        {"_id": outbox_id},
+        {"$set": update, "$unset": {"owner": "", "locked_until": ""}}
+    )
+
+def count_outbox(status):
+    return outbox_col.count_documents({"status": status})
+
+def mark_webhook_event(event_id):
+    """บันทึกว่ารับ event นี้แล้ว คืนค่า False ถ้าเคยรับมาก่อน (LINE ส่งซ้ำ)"""
+    try:
+        webhook_events_col.insert_one({"_id": event_id, "received_at": datetime.now()})
+        return True
+    except DuplicateKeyError:
+        return False
+
+def unmark_webhook_event(event_id):
+    """ลบ marker ของ event ที่ประมวลผลไม่สำเร็จ ให้ LINE ส่งซ้ำมาแล้วทำใหม่ได้"""
+    webhook_events_col.delete_one({"_id": event_id})
+
+# --- Ledger Replay ---
+
+def iter_completed_transactions(after_uid=None, batch_size=1000):
+    """รายการที่อนุมัติแล้ว เรียงตาม user (stream ทีละ batch)"""
+    query = {"status": "completed"}
+    if after_uid is not None:
+        query["uid"] = {"$gt": after_uid}
+    return transactions_col.find(
+        query,
+        {"uid": 1, "cnt_month": 1, "billing": 1, "period_start": 1, "period_end": 1, "created_at": 1, "approved_at": 1}
+    ).sort("uid", 1).batch_size(batch_size)
+
+def get_due_dates(user_ids):
+    """{user_id: next_due_date} ของหลาย user ใน query เดียว"""
+    cursor = users_col.find({"user_id": {"$in": list(user_ids)}}, {"user_id": 1, "next_due_date": 1})
+    return {u["user_id"]: u.get("next_due_date") for u in cursor}
+
+def set_due_dates(updates):
+    """เขียน next_due_date หลาย user ทีเดียว (updates = {user_id: (due_date, last_tx_id)}) คืนค่าจำนวนที่แก้"""
+    if not updates:
+        return 0
+    ops = [
+        UpdateOne({"user_id": user_id}, {"$set": {"next_due_date": due, "last_transaction_id": tx_id, "updated_at": datetime.now()}})
+        for user_id, (due, tx_id) in updates.items()
+    ]
+    modified = users_col.bulk_write(ops, ordered=False).modified_count
+    for user_id in updates:
+        user_cache.invalidate(user_id)
+    return modified
+
+def get_replay_checkpoint(run_id):
+    return replay_checkpoints_col.find_one({"_id": run_id})
+
+def save_replay_checkpoint(run_id, last_uid, stats, done=False):
+    replay_checkpoints_col.update_one(
+        {"_id": run_id},
+        {"$set": {"last_uid": last_uid, "stats": stats, "done": done, "updated_at": datetime.now()}},
+        upsert=True
+    )
+
+# --- Export ---
+
+def _date_range(field, start=None, end=None):
+    query = {}
+    if start or end:
+        query[field] = {}
+        if start:
+            query[field]["$gte"] = start
+        if end:
+            query[field]["$lt"] = end
+    return query
+
+def iter_transactions_for_export(start=None, end=None, status=None, batch_size=1000):
+    """
+    stream รายการ (กรองตาม created_at [start, end) และ status) พร้อมชื่อเล่นของ user
+    ดึงชื่อเล่นทีละ batch ด้วย $in -> หน่วยความจำคงที่ไม่ว่าจะมีกี่แถว
+    """
+    query = _date_range("created_at", start, end)
+    if status:
+        query["status"] = status
+    cursor = transactions_col.find(query, {"slip_id": 0}).sort("created_at", 1).batch_size(batch_size)
+
+    batch = []
+    for tx in cursor:
+        batch.append(tx)
+        if len(batch) >= batch_size:
+            yield from _with_nicknames(batch)
+            batch = []
+    if batch:
+        yield from _with_nicknames(batch)
+
+def _with_nicknames(batch):
+    uids = {tx.get("uid") for tx in batch}
+    nicknames = {
+        u["user_id"]: u.get("nickname")
+        for u in users_col.find({"user_id": {"$in": list(uids)}}, {"_id": 0, "user_id": 1, "nickname": 1})
+    }
+    for tx in batch:
+        tx["nickname"] = nicknames.get(tx.get("uid"))
+        yield tx
+
+def iter_users_for_export(start=None, end=None, batch_size=1000):
+    """stream user ที่ลงทะเบียนแล้ว (กรองตาม registered_at [start, end))"""
+    query = {"is_registered": True, **_date_range("registered_at", start, end)}
+    return users_col.find(
+        query,
+        {"_id": 0, "temp_slip_id": 0, "temp_slip_hash": 0, "slip_uploaded_at": 0, "nickname_key": 0}
+    ).batch_size(batch_size)
@@ -0,0 +1,172 @@
+import os
+import uuid
+import socket
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from .config import Config
+from .database import (
+    db, collection, NICKNAME_COLLATION, acquire_lease, release_lease, find_nickname_collisions,
+    backfill_nickname_keys, backfill_billing_periods, rebuild_billing_rollups
+)
+
+# กันไม่ให้หลาย worker (gunicorn -w N) รัน migration พร้อมกัน: คนที่ได้ lease รัน คนอื่นข้าม
+LEASE_NAME = "migrations"
+LEASE_SECONDS = 10 * 60
+
+# Index ที่ทุก collection ต้องมี (create_indexes ซ้ำได้ ถ้ามีอยู่แล้วจะไม่ทำอะไร)
+INDEXES = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("next_due_date", ASCENDING)], name="next_due_date"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel([("registered_at", ASCENDING)], name="registered_at"), # /export/users ตามช่วงวันที่ลงทะเบียน
+        IndexModel(
+            [("temp_slip_id", ASCENDING), ("slip_uploaded_at", ASCENDING)],
+            name="temp_slip",
+            partialFilterExpression={"temp_slip_id": {"$exists": True}}
+        ),
+    ],
+    "transactions": [
+        IndexModel([("uid", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)], name="uid_status_created_at"),
+        IndexModel([("slip_id", ASCENDING)], name="slip_id", sparse=True),
+        # /export/transactions: กรองช่วงวันที่ (+ status) แล้วเรียงตาม created_at
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+    ],
+    # สลิปแบบเก่า (binary ใน document) หมดอายุเองด้วย TTL
+    "slips": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=Config.SLIP_RETENTION_DAYS * 24 * 60 * 60),
+    ],
+    "slip_hashes": [
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel([("tx_id", ASCENDING)], name="tx_id"),
+    ],
+    "slips.files": [
+        IndexModel([("metadata.sha256", ASCENDING)], name="sha256"),
+        IndexModel([("metadata.preview_of", ASCENDING)], name="preview_of", sparse=True),
+        IndexModel([("uploadDate", ASCENDING)], name="uploadDate"),
+    ],
+    "webhook_events": [
+        IndexModel([("received_at", ASCENDING)], name="received_at_ttl", expireAfterSeconds=Config.WEBHOOK_DEDUP_TTL_HOURS * 60 * 60),
+    ],
+    "outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        # ข้อความที่ส่งแล้วเก็บไว้ 7 วัน (pending/dead ไม่มี sent_at จึงไม่ถูกลบ)
+        IndexModel([("sent_at", ASCENDING)], name="sent_at_ttl", expireAfterSeconds=7 * 24 * 60 * 60),
+    ],
+}
+
+# Index ที่ต้องสร้างหลัง data migration (unique ของ nickname_key ต้องรอ backfill + ไม่มีชื่อชนกันก่อน)
+POST_MIGRATION_INDEXES = {
+    "users": [
+        IndexModel(
+            [("nickname_key", ASCENDING)],
+            name="nickname_key_unique", unique=True, sparse=True, collation=NICKNAME_COLLATION
+        ),
+    ],
+}
+
+# Data migration ที่ต้องรันครั้งเดียว: (ชื่อ, ฟังก์ชัน) เรียงตามลำดับ บันทึกผลไว้ใน collection "migrations"
+MIGRATIONS = [
+    ("backfill_nickname_key", backfill_nickname_keys),
+    ("backfill_billing_period", backfill_billing_periods),
+    ("build_billing_rollups", rebuild_billing_rollups),
+]
+
+migrations_col = collection('migrations')
+
+def ensure_indexes(indexes=INDEXES):
+    """สร้าง index ที่ยังไม่มี คืนค่า {collection: [ชื่อ index]} หรือข้อความ error ของ collection นั้น"""
+    report = {}
+    for col_name, models in indexes.items():
+        try:
+            report[col_name] = db[col_name].create_indexes(models)
+        except OperationFailure as e:
+            # เช่น มี user_id ซ้ำอยู่แล้ว หรือมี index ชื่ออื่นที่ key เดียวกัน -> ต้องแก้ข้อมูลเองก่อน
+            report[col_name] = f"ERROR: {e}"
+            print(f"Index Error ({col_name}): {e}")
+    return report
+
+def run_migrations():
+    """รัน data migration ที่ยังไม่เคยรัน คืนค่า list ชื่อที่รันในรอบนี้"""
+    applied = {doc["_id"] for doc in migrations_col.find({}, {"_id": 1})}
+    ran = []
+    for name, func in MIGRATIONS:
+        if name in applied:
+            continue
+        result = func()
+        migrations_col.replace_one({"_id": name}, {"result": result, "applied_at": datetime.now()}, upsert=True)
+        ran.append(name)
+        print(f"🛠️ Migration '{name}' applied: {result}")
+    return ran
+
+def ensure_unique_nicknames():
+    """
+    สร้าง unique index ของ nickname_key ถ้าไม่มีชื่อที่ชนกันหลัง normalize
+    คืนค่า (report ของ index, list ชื่อที่ชนกัน) -> ชื่อที่ชนต้องให้แอดมินแก้เองก่อน แล้วรัน db-migrate ใหม่
+    """
+    collisions = find_nickname_collisions()
+    if collisions:
+        for c in collisions:
+            print(f"⚠️ Nickname collision '{c['_id']}': {c['nicknames']} ({', '.join(c['user_ids'])})")
+        return {"users": f"SKIPPED: {len(collisions)} nickname collision(s)"}, collisions
+    return ensure_indexes(POST_MIGRATION_INDEXES), []
+
+def migrate():
+    """
+    Bootstrap schema: index + data migration + index ที่ต้องรอ migration (idempotent รันซ้ำได้)
+    ถ้า worker อื่นถือ lease อยู่ (กำลัง migrate) จะข้ามแล้วคืนค่า skipped=True
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    if not acquire_lease(LEASE_NAME, owner, LEASE_SECONDS):
+        print("🛠️ Migration is running in another process, skipped.")
+        return {"indexes": {}, "migrations": [], "post_migration_indexes": {}, "nickname_collisions": [], "skipped": True}
+    try:
+        indexes = ensure_indexes()
+        migrations = run_migrations()
+        post_indexes, collisions = ensure_unique_nicknames()
+        return {
+            "indexes": indexes,
+            "migrations": migrations,
+            "post_migration_indexes": post_indexes,
+            "nickname_collisions": collisions,
+            "skipped": False,
+        }
+    finally:
+        release_lease(LEASE_NAME, owner)
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [s for s in stages if s]
+
+def verify_indexes():
+    """
+    explain() query หลักของระบบ แล้วเช็คว่าไม่มี COLLSCAN
+    คืนค่า list ของ (ชื่อ query, ผ่านไหม, stage ของ winning plan)
+    """
+    now = datetime.now()
+    queries = [
+        ("users by user_id", db["users"].find({"user_id": "U0"})),
+        ("users by nickname", db["users"].find({"nickname_key": "x"}).collation(NICKNAME_COLLATION)),
+        ("overdue users", db["users"].find({"next_due_date": {"$lte": now}})),
+        ("changed users", db["users"].find({"is_registered": True, "updated_at": {"$gt": now}})),
+        ("expired temp slips", db["users"].find({"temp_slip_id": {"$exists": True}, "slip_uploaded_at": {"$lt": now}})),
+        ("pending transactions by user", db["transactions"].find({"uid": "U0", "status": "pending"}).sort("created_at", DESCENDING)),
+        ("new slip hashes", db["slip_hashes"].find({"created_at": {"$gt": now}})),
+        ("due outbox messages", db["outbox"].find({"status": "pending", "next_attempt_at": {"$lte": now}}).sort("next_attempt_at", ASCENDING)),
+        ("export transactions", db["transactions"].find({"created_at": {"$gte": now, "$lt": now}}).sort("created_at", ASCENDING)),
+        ("export transactions by status", db["transactions"].find({"status": "completed", "created_at": {"$gte": now}}).sort("created_at", ASCENDING)),
+        ("export users", db["users"].find({"is_registered": True, "registered_at": {"$gte": now, "$lt": now}})),
+    ]
+    results = []
+    for name, cursor in queries:
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        results.append((name, "COLLSCAN" not in stages, stages))
+    return results
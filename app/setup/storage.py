@@ -0,0 +1,281 @@
+import os
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+import gridfs
+from gridfs.errors import NoFile
+from bson.objectid import ObjectId
+from .config import Config
+
+CHUNK_SIZE = 64 * 1024
+PREVIEW_SUFFIX = '.preview.jpg'
+
+class SlipTooLargeError(ValueError):
+    pass
+
+class SlipFile:
+    """ไฟล์สลิปที่เปิดอ่านได้ทีละ chunk (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)"""
+
+    def __init__(self, fileobj, length, filename, sha256):
+        self.fileobj = fileobj
+        self.length = length
+        self.filename = filename
+        self.sha256 = sha256
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        try:
+            while True:
+                data = self.fileobj.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            self.close()
+
+    def read(self):
+        try:
+            return self.fileobj.read()
+        finally:
+            self.close()
+
+    def close(self):
+        self.fileobj.close()
+
+class SlipStorage:
+    """
+    ที่เก็บรูปสลิปแบบ content-addressed (อ้างอิงด้วย SHA-256)
+    save() รับ iterable ของ bytes (เช่น message_content.iter_content()) แล้วเขียนทีละ chunk
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def _check_size(self, size):
+        if self.max_bytes and size > self.max_bytes:
+            raise SlipTooLargeError(f"❌ ไฟล์รูปใหญ่เกินไป (สูงสุด {self.max_bytes // (1024 * 1024)} MB)")
+
+    def save(self, chunks, filename):
+        raise NotImplementedError
+
+    def open(self, file_id):
+        """คืนค่า SlipFile หรือ None ถ้าไม่พบ"""
+        raise NotImplementedError
+
+    def delete(self, file_id):
+        raise NotImplementedError
+
+    def delete_many(self, file_ids):
+        """ลบหลายไฟล์ (รวม preview) คืนค่าจำนวน byte ที่ได้คืน"""
+        raise NotImplementedError
+
+    def iter_older_than(self, cutoff):
+        """ไล่ (file_id, length) ของสลิปต้นฉบับที่สร้างก่อน cutoff"""
+        raise NotImplementedError
+
+    def save_preview(self, file_id, data):
+        """เก็บรูป preview (JPEG ย่อขนาด) คู่กับสลิป file_id (ข้ามถ้ามีอยู่แล้ว)"""
+        raise NotImplementedError
+
+    def has_preview(self, file_id):
+        """มี preview ของสลิปนี้แล้วหรือยัง"""
+        raise NotImplementedError
+
+    def open_preview(self, file_id):
+        """คืนค่า SlipFile ของ preview หรือ None ถ้ายังไม่มี"""
+        raise NotImplementedError
+
+class GridFSSlipStorage(SlipStorage):
+    """เก็บใน GridFS (bucket 'slips' -> slips.files / slips.chunks)"""
+
+    def __init__(self, db, max_bytes, bucket_name='slips'):
+        super().__init__(max_bytes)
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self.files_col = db[f'{bucket_name}.files']
+        self.chunks_col = db[f'{bucket_name}.chunks']
+
+    def save(self, chunks, filename):
+        digest = hashlib.sha256()
+        size = 0
+        grid_in = self.bucket.open_upload_stream(filename, chunk_size_bytes=255 * 1024)
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                self._check_size(size)
+                digest.update(chunk)
+                grid_in.write(chunk)
+        except BaseException:
+            grid_in.abort()
+            raise
+        grid_in.close()
+
+        sha256 = digest.hexdigest()
+        # ถ้าเคยมีไฟล์เนื้อหาเดียวกันแล้ว ให้ใช้ตัวเดิม (ไม่เก็บซ้ำ)
+        existing = self.files_col.find_one(
+            {"metadata.sha256": sha256, "_id": {"$ne": grid_in._id}}, {"_id": 1}
+        )
+        if existing:
+            self.bucket.delete(grid_in._id)
+            return str(existing["_id"])
+
+        self.files_col.update_one(
+            {"_id": grid_in._id},
+            {"$set": {"metadata": {"sha256": sha256, "created_at": datetime.now()}}}
+        )
+        return str(grid_in._id)
+
+    def open(self, file_id):
+        try:
+            grid_out = self.bucket.open_download_stream(ObjectId(file_id))
+        except Exception:
+            return None
+        metadata = grid_out.metadata or {}
+        return SlipFile(grid_out, grid_out.length, grid_out.filename, metadata.get("sha256"))
+
+    def delete(self, file_id):
+        try:
+            self.bucket.delete(ObjectId(file_id))
+        except NoFile:
+            pass
+        # สลิปเดิมที่อัปโหลดซ้ำ (dedup ด้วย sha256) อาจมี preview ค้างจากรุ่นก่อนหลายไฟล์ -> ลบทั้งหมด
+        for preview in self.files_col.find({"metadata.preview_of": file_id}, {"_id": 1}):
+            self.bucket.delete(preview["_id"])
+
+    def delete_many(self, file_ids):
+        ids = [ObjectId(f) for f in file_ids if ObjectId.is_valid(f)]
+        if not ids:
+            return 0
+        docs = list(self.files_col.find(
+            {"$or": [{"_id": {"$in": ids}}, {"metadata.preview_of": {"$in": [str(i) for i in ids]}}]},
+            {"length": 1}
+        ))
+        all_ids = [d["_id"] for d in docs]
+        self.files_col.delete_many({"_id": {"$in": all_ids}})
+        self.chunks_col.delete_many({"files_id": {"$in": all_ids}})
+        return sum(d.get("length", 0) for d in docs)
+
+    def iter_older_than(self, cutoff):
+        # uploadDate ของ GridFS เป็น UTC ส่วน cutoff เป็นเวลาท้องถิ่นแบบ naive
+        cutoff_utc = cutoff.astimezone(timezone.utc).replace(tzinfo=None)
+        cursor = self.files_col.find(
+            {"uploadDate": {"$lt": cutoff_utc}, "metadata.preview_of": {"$exists": False}},
+            {"length": 1}
+        )
+        for doc in cursor:
+            yield str(doc["_id"]), doc.get("length", 0)
+
+    def save_preview(self, file_id, data):
+        if self.has_preview(file_id):
+            return
+        self.bucket.upload_from_stream(
+            f"{file_id}.preview.jpg", data,
+            metadata={"preview_of": file_id, "sha256": hashlib.sha256(data).hexdigest()}
+        )
+
+    def has_preview(self, file_id):
+        return self.files_col.find_one({"metadata.preview_of": file_id}, {"_id": 1}) is not None
+
+    def open_preview(self, file_id):
+        preview = self.files_col.find_one({"metadata.preview_of": file_id}, {"_id": 1})
+        if not preview:
+            return None
+        return self.open(str(preview["_id"]))
+
+class DiskSlipStorage(SlipStorage):
+    """เก็บเป็นไฟล์บนดิสก์ ชื่อไฟล์คือ SHA-256 ของเนื้อหา (<root>/ab/abcdef...)"""
+
+    def __init__(self, root, max_bytes):
+        super().__init__(max_bytes)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_id):
+        if len(file_id) != 64 or not all(c in "0123456789abcdef" for c in file_id):
+            return None
+        return os.path.join(self.root, file_id[:2], file_id)
+
+    def save(self, chunks, filename):
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    self._check_size(size)
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            file_id = digest.hexdigest()
+            path = self._path(file_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return file_id
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, file_id):
+        path = self._path(file_id)
+        if not path or not os.path.exists(path):
+            return None
+        return SlipFile(open(path, 'rb'), os.path.getsize(path), f"{file_id}.jpg", file_id)
+
+    def delete(self, file_id):
+        path = self._path(file_id)
+        if not path:
+            return
+        for p in (path, path + PREVIEW_SUFFIX):
+            if os.path.exists(p):
+                os.remove(p)
+
+    def delete_many(self, file_ids):
+        reclaimed = 0
+        for file_id in file_ids:
+            path = self._path(file_id)
+            if not path:
+                continue
+            for p in (path, path + PREVIEW_SUFFIX):
+                if os.path.exists(p):
+                    reclaimed += os.path.getsize(p)
+                    os.remove(p)
+        return reclaimed
+
+    def iter_older_than(self, cutoff):
+        cutoff_ts = cutoff.timestamp()
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith('.part') and entry.stat().st_mtime < cutoff_ts:
+                # ไฟล์ที่อัปโหลดค้างไว้ไม่จบ
+                os.remove(entry.path)
+                continue
+            if not entry.is_dir():
+                continue
+            for f in os.scandir(entry.path):
+                if self._path(f.name) and f.stat().st_mtime < cutoff_ts:
+                    yield f.name, f.stat().st_size
+
+    def save_preview(self, file_id, data):
+        if self.has_preview(file_id):
+            return
+        path = self._path(file_id)
+        tmp_path = path + PREVIEW_SUFFIX + '.part'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path + PREVIEW_SUFFIX)
+
+    def has_preview(self, file_id):
+        path = self._path(file_id)
+        return bool(path) and os.path.exists(path + PREVIEW_SUFFIX)
+
+    def open_preview(self, file_id):
+        path = self._path(file_id)
+        if not path or not os.path.exists(path + PREVIEW_SUFFIX):
+            return None
+        path += PREVIEW_SUFFIX
+        return SlipFile(open(path, 'rb'), os.path.getsize(path), f"{file_id}.preview.jpg", None)
+
+def create_slip_storage(db):
+    """เลือก backend ตาม Config.SLIP_STORAGE ("gridfs" หรือ "disk")"""
+    if Config.SLIP_STORAGE == "disk":
+        return DiskSlipStorage(Config.SLIP_STORAGE_DIR, Config.SLIP_MAX_BYTES)
+    return GridFSSlipStorage(db, Config.SLIP_MAX_BYTES)
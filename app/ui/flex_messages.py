@@ -24,10 +24,11 @@ def get_main_menu_flex():
         }
     }
 
-def create_admin_flex(name, amount, months, bill_month, tx_id):
+def create_admin_flex(name, amount, months, bill_month, tx_id, warning=None):
+    """การ์ดให้แอดมินกดรับยอด/ยกเลิก (warning = ข้อความเตือนสีแดงใต้รายละเอียด เช่น สลิปคล้ายของเดิม)"""
     display_amount = f"{amount:g}"
     
-    return {
+    bubble = {
         "type": "bubble",
         "body": {
             "type": "box",
@@ -152,4 +153,14 @@ def create_admin_flex(name, amount, months, bill_month, tx_id):
                 "separator": True
             }
         }
-    }
\ No newline at end of file
+    }
+    if warning:
+        bubble["body"]["contents"].append({
+            "type": "text",
+            "text": warning,
+            "wrap": True,
+            "size": "sm",
+            "color": "#D32F2F",
+            "margin": "xl"
+        })
+    return bubble
\ No newline at end of file
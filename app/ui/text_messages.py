@@ -0,0 +1,20 @@
+def format_overdue_report(report):
+    """ข้อความสรุปยอดค้างชำระ (จาก get_overdue_report)"""
+    lines = [
+        f"- {u.get('nickname', 'Unknown')} : ค้าง {u['months_overdue']} เดือน (฿{u['amount_owed']:g})"
+        for u in report
+    ]
+    total = sum(u['amount_owed'] for u in report)
+    return "\n".join(lines) + f"\n\nรวม ฿{total:g}"
+
+def format_billing_report(rollup, month_label):
+    """ข้อความสรุปยอดของรอบบิล 1 เดือน (จาก billing_rollups)"""
+    if not rollup:
+        return f"📊 รอบบิล {month_label}\nยังไม่มีรายการที่อนุมัติค่ะ"
+    return (
+        f"📊 รอบบิล {month_label}\n"
+        f"- คนจ่าย: {len(rollup.get('payers', []))} คน ({rollup.get('paid_count', 0)} รายการ)\n"
+        f"- ยอดรับ: ฿{rollup.get('amount_collected', 0):,.2f}\n"
+        f"- ยอดตามราคา: ฿{rollup.get('expected_amount', 0):,.2f}\n"
+        f"- ถูกปฏิเสธ: {rollup.get('rejected_count', 0)} รายการ"
+    )
\ No newline at end of file
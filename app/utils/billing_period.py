@@ -0,0 +1,107 @@
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+# ทุกแบบที่รับได้ของแต่ละเดือน (ตัวย่อจะรับทั้งแบบมีจุดและไม่มีจุด เช่น ม.ค. / มค)
+MONTH_NAMES = [
+    ("ม.ค.", "มกราคม"), ("ก.พ.", "กุมภาพันธ์"), ("มี.ค.", "มีนาคม"), ("เม.ย.", "เมษายน"),
+    ("พ.ค.", "พฤษภาคม"), ("มิ.ย.", "มิถุนายน"), ("ก.ค.", "กรกฎาคม"), ("ส.ค.", "สิงหาคม"),
+    ("ก.ย.", "กันยายน"), ("ต.ค.", "ตุลาคม"), ("พ.ย.", "พฤศจิกายน"), ("ธ.ค.", "ธันวาคม"),
+]
+
+def _month_key(token):
+    return token.replace(".", "").replace(" ", "")
+
+_MONTH_LOOKUP = {}
+for _i, (_abbr, _full) in enumerate(MONTH_NAMES, start=1):
+    _MONTH_LOOKUP[_month_key(_abbr)] = _i
+    _MONTH_LOOKUP[_full] = _i
+
+_MONTH_PATTERNS = sorted(
+    [re.escape(full) for _, full in MONTH_NAMES]
+    + [r"\.?\s?".join(re.escape(part) for part in abbr.strip(".").split(".")) + r"\.?" for abbr, _ in MONTH_NAMES],
+    key=len, reverse=True
+)
+_MONTH_YEAR = (
+    rf"(?P<{{p}}month>{'|'.join(_MONTH_PATTERNS)})"
+    r"(?:\s*(?P<{p}era>พ\.?\s?ศ\.?|ค\.?\s?ศ\.?)?\s*(?<!\d)(?P<{p}year>\d{{4}}|\d{{2}})(?!\d))?"
+)
+PERIOD_RE = re.compile(
+    _MONTH_YEAR.format(p="s")
+    + r"(?:\s*(?:-|–|ถึง)\s*" + _MONTH_YEAR.format(p="e") + ")?"
+)
+
+class BillingPeriod(namedtuple("BillingPeriod", "start_month start_year end_month end_year")):
+    """ช่วงเดือนที่จ่าย (ปีเป็น ค.ศ.) เช่น "ธ.ค. 68 - ม.ค. 69" -> (12, 2025, 1, 2026)"""
+    __slots__ = ()
+
+    @classmethod
+    def from_fields(cls, start, end):
+        """สร้างจาก period_start / period_end ที่เก็บไว้ในรายการ (datetime วันที่ 1 ของเดือน)"""
+        return cls(start.month, start.year, end.month, end.year)
+
+    @property
+    def months(self):
+        return (self.end_year * 12 + self.end_month) - (self.start_year * 12 + self.start_month) + 1
+
+    @property
+    def is_range(self):
+        return (self.start_month, self.start_year) != (self.end_month, self.end_year)
+
+    def next_due_date(self, months_paid):
+        """วันครบกำหนดรอบถัดไป: เดือนเริ่ม + จำนวนเดือนที่จ่าย (วันที่ 13)"""
+        total_months = self.start_month + months_paid
+        new_year = self.start_year + (total_months - 1) // 12
+        new_month = (total_months - 1) % 12 + 1
+        return datetime(new_year, new_month, 13, 23, 59, 59)
+
+def _to_ad(year, era):
+    """แปลงปีเป็น ค.ศ.: 2 หลัก = พ.ศ. ย่อ (68 -> 2025) ยกเว้นระบุ ค.ศ., 4 หลักเกิน 2400 = พ.ศ."""
+    if year is None:
+        return None
+    year = int(year)
+    if year < 100:
+        return 2000 + year if era and era.startswith("ค") else year + 2500 - 543
+    return year - 543 if year > 2400 else year
+
+@lru_cache(maxsize=4096)
+def _parse(text):
+    """แกะข้อความเป็น (เดือนเริ่ม, ปีเริ่ม, เดือนจบ, ปีจบ) ปีที่ไม่ได้ระบุเป็น None (cache ได้เพราะไม่ขึ้นกับวันนี้)"""
+    m = PERIOD_RE.search(text)
+    if not m:
+        return None
+    start_month = _MONTH_LOOKUP[_month_key(m.group("smonth"))]
+    start_year = _to_ad(m.group("syear"), m.group("sera"))
+    if not m.group("emonth"):
+        return (start_month, start_year, start_month, start_year)
+    end_month = _MONTH_LOOKUP[_month_key(m.group("emonth"))]
+    end_year = _to_ad(m.group("eyear"), m.group("eera"))
+    return (start_month, start_year, end_month, end_year)
+
+def parse_billing_period(text, today=None):
+    """
+    แกะช่วงเดือนจากข้อความ เช่น "ม.ค. 68", "มกราคม 2568 ถึง มีนาคม 2568", "ธ.ค. 68 - ม.ค. 69"
+    ปีที่ไม่ได้ระบุ: เอาจากอีกฝั่งของช่วง ไม่งั้นใช้ปีปัจจุบัน คืนค่า BillingPeriod หรือ None
+    """
+    parsed = _parse(text or "")
+    if not parsed:
+        return None
+    start_month, start_year, end_month, end_year = parsed
+    if start_year is None and end_year is None:
+        start_year = (today or datetime.now()).year
+    if end_year is None:
+        end_year = start_year + (1 if end_month < start_month else 0)
+    elif start_year is None:
+        start_year = end_year - (1 if end_month < start_month else 0)
+    return BillingPeriod(start_month, start_year, end_month, end_year)
+
+def parse_many(texts, dates=None):
+    """
+    แกะหลายข้อความพร้อมกัน (เช่น backfill field billing เก่า) คืนค่า list ตามลำดับ (None = แกะไม่ได้)
+    dates = วันที่อ้างอิงของแต่ละข้อความ (เช่น created_at) ใช้เติมปีที่ไม่ได้ระบุแทนปีปัจจุบัน
+    """
+    now = datetime.now()
+    if dates is None:
+        return [parse_billing_period(text, now) for text in texts]
+    return [parse_billing_period(text, date or now) for text, date in zip(texts, dates)]
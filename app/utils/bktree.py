@@ -0,0 +1,47 @@
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """
+    BK-tree สำหรับค้นหาค่าที่ใกล้เคียง (ตาม Hamming distance) โดยไม่ต้องเทียบทุกตัว
+    node = [value, item, {distance: child_node}]
+    """
+
+    def __init__(self, distance=hamming_distance):
+        self.distance = distance
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item=None):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, item, {}]
+            return
+        node = self.root
+        while True:
+            d = self.distance(value, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """คืนค่า list ของ (distance, value, item) ที่ห่างไม่เกิน max_distance เรียงจากใกล้สุด"""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = self.distance(value, node[0])
+            if d <= max_distance:
+                results.append((d, node[0], node[1]))
+            for child_d, child in node[2].items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda r: r[0])
+        return results
+
+    def __len__(self):
+        return self.size
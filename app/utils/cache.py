@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict
+from app.utils.context import scope_cache
+
+_MISSING = object()
+
+class LRUByteCache:
+    """
+    LRU cache ที่จำกัดขนาดรวมเป็น byte (thread-safe)
+    ใช้กับข้อมูลที่ไม่เปลี่ยนหลังสร้าง เช่น รูปสลิป
+    """
+
+    def __init__(self, max_bytes, max_item_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes // 8
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size):
+        """เก็บค่าลง cache (ข้ามถ้าใหญ่เกิน max_item_bytes) คืนค่า True ถ้าเก็บได้"""
+        if size > self.max_item_bytes or size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._items[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+        return True
+
+    def pop(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self._size -= item[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class ScopedCache:
+    """
+    cache 2 ชั้น: (1) ต่อ event (ล้างเองเมื่อ event จบ) (2) ข้าม event แบบมีอายุ ttl วินาที (ttl=0 = ปิด)
+    get() เรียก loader เมื่อไม่เจอทั้งสองชั้น, invalidate() ต้องเรียกทุกครั้งที่เขียนข้อมูลนั้น
+    """
+
+    def __init__(self, namespace, ttl=0, max_items=10000):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.scope_hits = 0
+        self.ttl_hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        scoped = scope_cache()
+        scoped_key = (self.namespace, key)
+        if scoped is not None:
+            value = scoped.get(scoped_key, _MISSING)
+            if value is not _MISSING:
+                with self._lock:
+                    self.scope_hits += 1
+                return value
+
+        value = self._get_shared(key)
+        if value is _MISSING:
+            with self._lock:
+                self.misses += 1
+            value = loader(key)
+            self._put_shared(key, value)
+
+        if scoped is not None:
+            scoped[scoped_key] = value
+        return value
+
+    def _get_shared(self, key):
+        if not self.ttl:
+            return _MISSING
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return _MISSING
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return _MISSING
+            self._items.move_to_end(key)
+            self.ttl_hits += 1
+            return value
+
+    def _put_shared(self, key, value):
+        if not self.ttl:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key):
+        scoped = scope_cache()
+        if scoped is not None:
+            scoped.pop((self.namespace, key), None)
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        scoped = scope_cache()
+        if scoped is not None:
+            for k in [k for k in scoped if k[0] == self.namespace]:
+                del scoped[k]
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.scope_hits + self.ttl_hits
+            lookups = hits + self.misses
+            return {
+                "items": len(self._items),
+                "scope_hits": self.scope_hits,
+                "ttl_hits": self.ttl_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,34 @@
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+@contextmanager
+def event_scope(event):
+    """ผูก event ที่กำลังประมวลผลไว้กับ thread ปัจจุบัน (ใช้ได้ทั้งโหมด sync และ worker pool)"""
+    previous = getattr(_local, 'event', None), getattr(_local, 'cache', None)
+    _local.event = event
+    _local.cache = {}
+    try:
+        yield event
+    finally:
+        _local.event, _local.cache = previous
+
+def current_event():
+    """คืนค่า event ที่กำลังประมวลผลอยู่ใน thread นี้ (None ถ้าอยู่นอก handler)"""
+    return getattr(_local, 'event', None)
+
+def scope_cache():
+    """dict ที่มีอายุเท่ากับ event ปัจจุบัน (None ถ้าอยู่นอก event_scope)"""
+    return getattr(_local, 'cache', None)
+
+def event_target_id(event):
+    """หา ID ปลายทางสำหรับ push_message จาก source ของ event (user / group / room)"""
+    source = getattr(event, 'source', None)
+    if source is None:
+        return None
+    if source.type == "group":
+        return source.group_id
+    if source.type == "room":
+        return source.room_id
+    return source.user_id
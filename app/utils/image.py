@@ -0,0 +1,31 @@
+import io
+from PIL import Image, ImageOps
+
+def render_preview(data, max_size=480, quality=70):
+    """ย่อรูปสลิปเป็น JPEG ขนาดเล็ก (ด้านยาวไม่เกิน max_size px) สำหรับ preview ในแชท"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_size, max_size))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+
+def dhash(data, hash_size=8):
+    """
+    Perceptual hash (difference hash) ขนาด hash_size^2 bit
+    รูปเดียวกันที่ถูกแคปหน้าจอ/ย่อ/บีบอัดใหม่ จะได้ค่าที่ Hamming distance ต่างกันน้อย
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
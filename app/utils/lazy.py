@@ -0,0 +1,34 @@
+import os
+import threading
+
+class ProcessLocal:
+    """
+    Proxy ที่สร้าง object จริงตอนใช้งานครั้งแรกของแต่ละ process
+    (import แอปไม่ต้องต่อ DB และปลอดภัยกับ gunicorn --preload เพราะหลัง fork จะสร้างใหม่)
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        pid = os.getpid()
+        if self._obj is None or self._pid != pid:
+            with self._lock:
+                if self._obj is None or self._pid != pid:
+                    self._obj = self._factory()
+                    self._pid = pid
+        return self._obj
+
+    @property
+    def ready(self):
+        """สร้าง object ของ process นี้แล้วหรือยัง"""
+        return self._obj is not None and self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __getitem__(self, key):
+        return self.get()[key]
@@ -0,0 +1,82 @@
+from collections import defaultdict
+from app.utils.validators import normalize_nickname
+
+def _ngrams(text, n=2):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+class NameIndex:
+    """
+    index ค้นหาชื่อในหน่วยความจำ (ไม่ thread-safe ต้องล็อกเอง)
+    - trie: ค้นด้วยคำขึ้นต้น (ทุก node เก็บ id ของชื่อที่ขึ้นต้นด้วย prefix นั้น)
+    - n-gram (bigram): ค้นแบบพิมพ์ผิดได้ ให้คะแนนด้วย Dice similarity
+    """
+
+    def __init__(self, min_similarity=0.4):
+        self.min_similarity = min_similarity
+        self.records = {}
+        self._names = {}
+        self._trie = {}
+        self._grams = defaultdict(set)
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, key, names, record):
+        """เพิ่ม/แทนที่ข้อมูลของ key (names = ชื่อที่ใช้ค้น, record = ข้อมูลที่คืนตอนค้นเจอ)"""
+        self.remove(key)
+        normalized = {normalize_nickname(name) for name in names if name}
+        normalized.discard("")
+        self.records[key] = record
+        self._names[key] = normalized
+        for name in normalized:
+            node = self._trie
+            for ch in name:
+                node = node.setdefault(ch, {})
+                node.setdefault("", set()).add(key)
+            for gram in _ngrams(name):
+                self._grams[gram].add(key)
+
+    def remove(self, key):
+        for name in self._names.pop(key, ()):
+            node = self._trie
+            for ch in name:
+                node = node.get(ch)
+                if node is None:
+                    break
+                node[""].discard(key)
+            for gram in _ngrams(name):
+                self._grams[gram].discard(key)
+        self.records.pop(key, None)
+
+    def search(self, query, limit=10):
+        """คืนค่า list ของ (score, record) เรียงจากตรงที่สุด: ตรงทั้งคำ 3+, ขึ้นต้นด้วย 2+, ใกล้เคียง < 1"""
+        q = normalize_nickname(query)
+        if not q:
+            return []
+        scores = {}
+
+        node = self._trie
+        for ch in q:
+            node = node.get(ch)
+            if node is None:
+                break
+        else:
+            for key in node.get("", ()):
+                exact = q in self._names[key]
+                scores[key] = (3.0 if exact else 2.0) + len(q) / max(len(n) for n in self._names[key])
+
+        q_grams = _ngrams(q)
+        candidates = set()
+        for gram in q_grams:
+            candidates |= self._grams.get(gram, set())
+        for key in candidates - scores.keys():
+            similarity = max(_dice(q_grams, _ngrams(name)) for name in self._names[key])
+            if similarity >= self.min_similarity:
+                scores[key] = similarity
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(score, self.records[key]) for key, score in ranked]
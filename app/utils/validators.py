@@ -1,35 +1,36 @@
-import re
+import unicodedata
 from datetime import datetime
-from app.utils.const import MONTH_MAP, THAI_MONTHS
-from app.utils.date_time import parse_month_year
+from app.utils.billing_period import parse_billing_period
 
-def validate_billing_period(billing_str, expected_months):
-    """เช็คว่าจำนวนเดือนในข้อความ ตรงกับตัวเลขที่แจ้งไหม"""
-    if "-" in billing_str or "ถึง" in billing_str:
-        parts = re.split(r'\s*-\s*|\s*ถึง\s*', billing_str)
-        if len(parts) >= 2:
-            start_data = parse_month_year(parts[0])
-            end_data = parse_month_year(parts[1])
+def normalize_nickname(nickname):
+    """
+    คีย์สำหรับเทียบชื่อเล่น: NFKC (รวมสระ/วรรณยุกต์ไทยที่พิมพ์ได้หลายแบบ เช่น ำ กับ ํา)
+    + casefold + ตัดช่องว่างซ้ำ
+    """
+    text = unicodedata.normalize("NFKC", nickname or "")
+    return " ".join(text.casefold().split())
 
-            if start_data and end_data:
-                start_m, start_y = start_data
-                end_m, end_y = end_data
-                diff_months = ((end_y * 12) + end_m) - ((start_y * 12) + start_m) + 1
-                
-                if diff_months != expected_months:
-                    raise ValueError(f"⚠️ จำนวนเดือนไม่ตรงกัน!\n\nแจ้งจ่าย **{expected_months} เดือน**\nแต่นับช่วงเวลาได้ **{diff_months} เดือน**")
-                return
+def split_lines(msg):
+    """แยกข้อความเป็นบรรทัด (ตัดช่องว่างหัวท้าย + ข้ามบรรทัดว่าง)"""
+    return [line.strip() for line in msg.split('\n') if line.strip()]
 
-    found_count = 0
-    for m in MONTH_MAP.keys():
-        if m in billing_str: found_count += 1
-    
-    if expected_months > 1 and found_count == 1:
+def validate_billing_period(billing_str, expected_months):
+    """เช็คว่าจำนวนเดือนในข้อความ ตรงกับตัวเลขที่แจ้งไหม คืนค่า BillingPeriod (None ถ้าแกะไม่ได้)"""
+    period = parse_billing_period(billing_str)
+    if not period:
+        return None
+
+    if period.is_range:
+        if period.months != expected_months:
+            raise ValueError(f"⚠️ จำนวนเดือนไม่ตรงกัน!\n\nแจ้งจ่าย **{expected_months} เดือน**\nแต่นับช่วงเวลาได้ **{period.months} เดือน**")
+    elif expected_months > 1:
          raise ValueError(f"⚠️ ข้อมูลไม่ชัดเจน!\n\nแจ้งจ่าย **{expected_months} เดือน** แต่ระบุมาแค่เดือนเดียว\n\n(ถ้าระบุเป็นช่วง ให้ใช้ขีดคั่น เช่น 'ม.ค. 68 - มี.ค. 68')")
+    return period
 
-def validate_slip_format(msg):
+def validate_slip_format(msg, lines=None):
     """ตรวจสอบ Format ข้อความ #โอน (แบบแยกบรรทัด)"""
-    lines = [line.strip() for line in msg.split('\n') if line.strip()]
+    if lines is None:
+        lines = split_lines(msg)
 
     # Format ที่คาดหวัง:
     # 0: #โอน
@@ -55,12 +56,13 @@ def validate_slip_format(msg):
 
     billing_str = lines[4]
     
-    # ตรวจสอบช่วงเดือน
-    validate_billing_period(billing_str, months_count)
+    # ตรวจสอบช่วงเดือน (แกะครั้งเดียว ใช้ต่อตอนคำนวณ Due Date)
+    period = validate_billing_period(billing_str, months_count)
 
     return {
         "nickname": nickname,
         "amount": amount,
         "months": months_count,
-        "billing": billing_str
+        "billing": billing_str,
+        "period": period
     }
\ No newline at end of file
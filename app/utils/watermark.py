@@ -0,0 +1,32 @@
+class Watermark:
+    """
+    จุดที่ sync ถึงแล้ว สำหรับดึงข้อมูลแบบ incremental ตาม timestamp (created_at / updated_at)
+    ดึงใหม่ตั้งแต่ (เวลาล่าสุดที่เห็น - overlap) ด้วย $gte: document ที่ worker อื่นเขียนทีหลังแต่เวลาเท่ากัน/เก่ากว่า
+    (เวลาเครื่องต่างกัน, insert ช้ากว่าตอนสร้าง timestamp) จะยังถูกดึงมา ส่วนที่เคยเห็นแล้วกรองออกด้วย (key, timestamp)
+    """
+
+    def __init__(self, overlap):
+        self.overlap = overlap
+        self.latest = None
+        self._seen = {} # key -> timestamp ที่ประมวลผลแล้ว (เก็บเฉพาะในช่วง overlap)
+
+    def since(self):
+        """ค่าที่ใช้ query ด้วย $gte (None = ยังไม่เคย sync ให้ดึงทั้งหมด)"""
+        return None if self.latest is None else self.latest - self.overlap
+
+    def is_new(self, key, ts):
+        """True ถ้ายังไม่เคยประมวลผล key ที่ timestamp นี้ (แล้วจำไว้ + เลื่อน watermark)"""
+        if ts is None:
+            return True
+        if self._seen.get(key) == ts:
+            return False
+        self._seen[key] = ts
+        if self.latest is None or ts > self.latest:
+            self.latest = ts
+        return True
+
+    def prune(self):
+        """ลืม key ที่เก่ากว่าช่วง overlap (query รอบหน้าไม่มีทางได้มาอีก)"""
+        cutoff = self.since()
+        if cutoff is not None:
+            self._seen = {key: ts for key, ts in self._seen.items() if ts >= cutoff}
@@ -0,0 +1,117 @@
+"""
+Benchmark ตัวแกะช่วงเดือนของรอบบิล (app/utils/billing_period.py) ไม่ต้องใช้ mongod
+
+    python -m bench.billing_period --texts 20000 --unique 300 --output billing-result.json
+
+เทียบ:
+- _parse แบบ cold: regex ที่ compile ไว้แล้ว แต่ไม่ผ่าน lru_cache (ข้อความที่ไม่เคยเห็น)
+- _parse แบบ cached: ข้อความซ้ำ (user ส่งรูปแบบเดิมทุกเดือน) ได้จาก lru_cache
+- parse_many: แกะทีละชุดแบบ backfill (มี dates) ทั้งตอน cache ว่างและตอน cache อุ่นแล้ว
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+def _configure_env():
+    # import app ต้องมี Config ครบ (ไม่ต่อ DB / ไม่เปิด scheduler)
+    for key, value in {
+        "PORT": "8000",
+        "CHANNEL_SECRET": "bench-channel-secret",
+        "CHANNEL_ACCESS_TOKEN": "bench-token",
+        "MONGO_URI": "mongodb://localhost:27017",
+        "LAZY_STARTUP": "1",
+        "SCHEDULER_MODE": "off",
+    }.items():
+        os.environ.setdefault(key, value)
+
+def _billing_texts(n, unique, seed=42):
+    """ข้อความ billing แบบที่ user พิมพ์จริง (ตัวย่อมี/ไม่มีจุด, ชื่อเต็ม, พ.ศ. 2/4 หลัก, ช่วงข้ามปี, มีคำอื่นปน)"""
+    from app.utils.billing_period import MONTH_NAMES
+
+    rng = random.Random(seed)
+
+    def month(i):
+        abbr, full = MONTH_NAMES[i % 12]
+        return rng.choice([abbr, abbr.replace(".", ""), full])
+
+    def year(y):
+        return rng.choice(["", f" {y % 100}", f" {y}", f" พ.ศ. {y}"])
+
+    templates = [
+        lambda m, y: f"{month(m)}{year(y)}",
+        lambda m, y: f"{month(m)}{year(y)} - {month(m + 1)}{year(y + (m % 12 == 11))}",
+        lambda m, y: f"{month(m)} ถึง {month(m + 2)}{year(y + (m % 12 >= 10))}",
+        lambda m, y: f"ค่า Spotify เดือน {month(m)}{year(y)} ค่ะ",
+        lambda m, y: f"จ่าย {month(m)}–{month(m + 1)}",
+    ]
+    pool = [rng.choice(templates)(rng.randrange(12), rng.choice([2567, 2568, 2569])) for _ in range(unique)]
+    return [rng.choice(pool) for _ in range(n)]
+
+def _timed(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+def _result(seconds, calls):
+    return {
+        "seconds": round(seconds, 4),
+        "us_per_text": round(seconds / calls * 1e6, 3) if calls else 0.0,
+        "texts_per_second": round(calls / seconds, 1) if seconds else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Billing period parser benchmark")
+    parser.add_argument("--texts", type=int, default=20000, help="จำนวนข้อความที่แกะต่อรอบ")
+    parser.add_argument("--unique", type=int, default=300, help="จำนวนรูปแบบข้อความที่ไม่ซ้ำกัน")
+    parser.add_argument("--output", help="ไฟล์ผล JSON (ไม่ใส่ = พิมพ์ออก stdout)")
+    args = parser.parse_args(argv)
+
+    _configure_env()
+    from datetime import datetime
+    from app.utils.billing_period import _parse, parse_many
+
+    texts = _billing_texts(args.texts, args.unique)
+    dates = [datetime(2026, 1, 1)] * len(texts)
+    unparsed = sum(1 for t in set(texts) if _parse.__wrapped__(t) is None)
+
+    def parse_all(func):
+        for text in texts:
+            func(text)
+
+    cold = _timed(parse_all, _parse.__wrapped__)
+    _parse.cache_clear()
+    parse_all(_parse)
+    cached = _timed(parse_all, _parse)
+
+    _parse.cache_clear()
+    many_cold = _timed(parse_many, texts, dates)
+    many_warm = _timed(parse_many, texts, dates)
+    info = _parse.cache_info()
+
+    report = {
+        "texts": len(texts),
+        "unique_texts": len(set(texts)),
+        "unparsed_unique_texts": unparsed,
+        "results": {
+            "_parse (cold, no cache)": _result(cold, len(texts)),
+            "_parse (lru_cached)": _result(cached, len(texts)),
+            "parse_many (empty cache)": _result(many_cold, len(texts)),
+            "parse_many (warm cache)": _result(many_warm, len(texts)),
+        },
+        "cache": {"hits": info.hits, "misses": info.misses, "maxsize": info.maxsize, "currsize": info.currsize},
+    }
+    for name, result in report["results"].items():
+        print(f"{name}: {result['us_per_text']} us/text", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
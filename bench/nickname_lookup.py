@@ -0,0 +1,135 @@
+"""
+Benchmark การหา user จากชื่อเล่นที่ 100k users (mongod ในเครื่อง, DB `ffortify_bench_users` จะถูกลบทุกครั้ง)
+
+    python -m bench.nickname_lookup --users 100000 --lookups 1000 --output nickname-result.json
+
+เทียบ:
+- regex (ก่อน): {"nickname": {"$regex": "^...$", "$options": "i"}} แบบเดิม -> ใช้ index ไม่ได้
+- check_nickname_available / find_users_by_nickname: exact lookup บน nickname_key (unique + collation)
+- user_search.search: index ในหน่วยความจำของ #check (ขึ้นต้น/พิมพ์ผิด)
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+def _configure_env(args):
+    # ต้องตั้งก่อน import app (Config อ่าน env ตอน import)
+    os.environ.update({
+        "PORT": "8000",
+        "CHANNEL_SECRET": "bench-channel-secret",
+        "CHANNEL_ACCESS_TOKEN": "bench-token",
+        "MONGO_URI": args.mongo_uri,
+        "MONGO_DB_NAME": args.db,
+        "LAZY_STARTUP": "1",
+        "SCHEDULER_MODE": "off",
+    })
+
+def _nickname(i):
+    # ชื่อไทย/อังกฤษปนกัน ให้ collation ภาษาไทยได้ทำงานจริง
+    return f"{'ฝ้าย' if i % 2 else 'Faii'}{i}"
+
+def _seed(users_col, n, batch_size=10000):
+    from datetime import datetime
+    from app.utils.validators import normalize_nickname
+
+    now = datetime.now()
+    for start in range(0, n, batch_size):
+        users_col.insert_many([
+            {
+                "user_id": f"U{i:032d}",
+                "nickname": _nickname(i),
+                "nickname_key": normalize_nickname(_nickname(i)),
+                "first_name": f"Bench{i}",
+                "is_registered": True,
+                "next_due_date": now,
+                "updated_at": now,
+            }
+            for i in range(start, min(n, start + batch_size))
+        ], ordered=False)
+
+def _timed(func, samples):
+    latencies = []
+    for sample in samples:
+        t0 = time.perf_counter()
+        func(sample)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+def _docs_examined(cursor):
+    return cursor.explain()["executionStats"]["totalDocsExamined"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nickname lookup benchmark")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="ffortify_bench_users", help="ฐานข้อมูลทดสอบ (ถูกลบทุกครั้งที่รัน)")
+    parser.add_argument("--output", help="ไฟล์ผล JSON (ไม่ใส่ = พิมพ์ออก stdout)")
+    args = parser.parse_args(argv)
+
+    _configure_env(args)
+    from pymongo import MongoClient
+    MongoClient(args.mongo_uri).drop_database(args.db)
+
+    from app.setup.database import users_col, check_nickname_available, find_users_by_nickname, NICKNAME_COLLATION
+    from app.setup.migrations import ensure_indexes, INDEXES, POST_MIGRATION_INDEXES
+    from app.modules.user_search import UserSearchIndex
+    from app.utils.validators import normalize_nickname
+
+    t0 = time.perf_counter()
+    _seed(users_col, args.users)
+    seed_seconds = time.perf_counter() - t0
+    ensure_indexes({"users": INDEXES["users"]})
+    ensure_indexes(POST_MIGRATION_INDEXES)
+
+    rng = random.Random(42)
+    # สลับตัวพิมพ์ให้ต่างจากที่ลงทะเบียนไว้ (ต้องหาเจอแบบไม่สนตัวพิมพ์)
+    samples = [_nickname(rng.randrange(args.users)).upper() for _ in range(args.lookups)]
+
+    def regex(nickname):
+        return users_col.find_one({"nickname": {"$regex": f"^{re.escape(nickname)}$", "$options": "i"}})
+
+    index = UserSearchIndex()
+    t0 = time.perf_counter()
+    index.sync(force=True)
+    index_load_seconds = time.perf_counter() - t0
+
+    sample = samples[0]
+    report = {
+        "users": args.users,
+        "lookups": args.lookups,
+        "seed_seconds": round(seed_seconds, 2),
+        "results": {
+            "regex (before)": dict(
+                _timed(regex, samples),
+                docs_examined=_docs_examined(users_col.find({"nickname": {"$regex": f"^{re.escape(sample)}$", "$options": "i"}}))
+            ),
+            "check_nickname_available": dict(
+                _timed(lambda n: check_nickname_available(n, "U-new"), samples),
+                docs_examined=_docs_examined(users_col.find({"nickname_key": normalize_nickname(sample)}).collation(NICKNAME_COLLATION))
+            ),
+            "find_users_by_nickname": _timed(find_users_by_nickname, samples),
+            "user_search.search (in-memory)": dict(_timed(index.search, samples), load_seconds=round(index_load_seconds, 2)),
+        },
+    }
+    for name, result in report["results"].items():
+        print(f"{name}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
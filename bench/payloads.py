@@ -0,0 +1,55 @@
+"""สร้าง webhook payload ปลอม (ลายเซ็นถูกต้องตาม CHANNEL_SECRET) สำหรับ benchmark"""
+import json
+import hmac
+import time
+import uuid
+import base64
+import hashlib
+import itertools
+
+_ids = itertools.count(10 ** 17)
+
+def user_id(i):
+    return "U" + hashlib.md5(f"bench-user-{i}".encode()).hexdigest()
+
+def group_id(i):
+    return "C" + hashlib.md5(f"bench-group-{i}".encode()).hexdigest()
+
+def sign(body, channel_secret):
+    digest = hmac.new(channel_secret.encode(), body.encode(), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+def _event(event_type, source, **fields):
+    return {
+        "type": event_type,
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": source,
+        "webhookEventId": uuid.uuid4().hex.upper()[:26],
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+        **fields,
+    }
+
+def user_source(uid):
+    return {"type": "user", "userId": uid}
+
+def group_source(gid, uid):
+    return {"type": "group", "groupId": gid, "userId": uid}
+
+def text_event(source, text):
+    return _event("message", source, message={"type": "text", "id": str(next(_ids)), "text": text})
+
+def image_event(source):
+    return _event("message", source, message={"type": "image", "id": str(next(_ids)), "contentProvider": {"type": "line"}})
+
+def postback_event(source, data):
+    return _event("postback", source, postback={"data": data})
+
+def follow_event(source):
+    return _event("follow", source)
+
+def webhook_request(events, channel_secret, destination="Ubench"):
+    """คืนค่า (body, headers) ของ POST /callback"""
+    body = json.dumps({"destination": destination, "events": events}, ensure_ascii=False)
+    return body, {"X-Line-Signature": sign(body, channel_secret), "Content-Type": "application/json"}
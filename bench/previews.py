@@ -0,0 +1,116 @@
+"""
+Benchmark ขนาดรูปที่ LINE ของแอดมินต้องโหลดต่อ 1 การแจ้งโอน (ก่อน/หลังมี preview)
+
+    python -m bench.previews --slips 50 --output preview-result.json
+    python -m bench.previews --images path/to/real/slips   # ใช้สลิปจริง (jpg/png) แทนสลิปปลอม
+
+ก่อน: preview_image_url ชี้ไปที่สลิปต้นฉบับ -> ทุกการแจ้งโอนโหลดไฟล์เต็ม
+หลัง: preview_image_url ชี้ไปที่ /slip/<id>/preview (JPEG ย่อจาก render_preview) ต้นฉบับโหลดเฉพาะตอนกดเปิดรูป
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+def _configure_env():
+    # Config อ่าน env ตอน import (ไม่ต่อ DB / ไม่เปิด scheduler)
+    for key, value in {
+        "PORT": "8000",
+        "CHANNEL_SECRET": "bench-channel-secret",
+        "CHANNEL_ACCESS_TOKEN": "bench-token",
+        "MONGO_URI": "mongodb://localhost:27017",
+        "LAZY_STARTUP": "1",
+        "SCHEDULER_MODE": "off",
+    }.items():
+        os.environ.setdefault(key, value)
+
+def _load_slips(args):
+    if args.images:
+        paths = sorted(
+            os.path.join(args.images, name) for name in os.listdir(args.images)
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        slips = []
+        for path in paths[:args.slips]:
+            with open(path, "rb") as f:
+                slips.append(f.read())
+        return slips
+
+    from bench.stub_line import fake_slip
+    # ขนาดเท่าภาพแคปหน้าจอมือถือ (แอปธนาคารส่วนใหญ่บันทึกสลิปขนาดนี้)
+    return [fake_slip(i, size=(1080, 1920)) for i in range(args.slips)]
+
+def _summary(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        "avg": round(sum(values) / len(values), 1),
+        "p50": values[len(values) // 2],
+        "max": values[-1],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bytes per admin notification: original vs preview")
+    parser.add_argument("--slips", type=int, default=50)
+    parser.add_argument("--images", help="โฟลเดอร์รูปสลิปจริง (ไม่ใส่ = สร้างสลิปปลอม)")
+    parser.add_argument("--output", help="ไฟล์ผล JSON (ไม่ใส่ = พิมพ์ออก stdout)")
+    args = parser.parse_args(argv)
+
+    _configure_env()
+    from app.setup.config import Config
+    from app.utils.image import render_preview
+
+    slips = _load_slips(args)
+    if not slips:
+        parser.error("ไม่พบรูปสลิป")
+
+    render_ms = []
+    previews = []
+    for data in slips:
+        t0 = time.perf_counter()
+        previews.append(render_preview(data, Config.PREVIEW_MAX_SIZE, Config.PREVIEW_QUALITY))
+        render_ms.append(round((time.perf_counter() - t0) * 1000, 2))
+
+    # throughput ของ process pool แบบเดียวกับ app/modules/previews.py
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=Config.PREVIEW_WORKERS) as pool:
+        list(pool.map(render_preview, slips, [Config.PREVIEW_MAX_SIZE] * len(slips), [Config.PREVIEW_QUALITY] * len(slips)))
+    pool_seconds = time.perf_counter() - t0
+
+    original_bytes = [len(d) for d in slips]
+    preview_bytes = [len(p) for p in previews]
+    before = sum(original_bytes)
+    after = sum(preview_bytes)
+    report = {
+        "slips": len(slips),
+        "source": args.images or "fake_slip 1080x1920",
+        "preview_max_size": Config.PREVIEW_MAX_SIZE,
+        "preview_quality": Config.PREVIEW_QUALITY,
+        # bytes ที่ต้องโหลดเพื่อแสดง bubble ในแชทแอดมิน 1 ครั้ง
+        "bytes_per_notification": {
+            "before": _summary(original_bytes),
+            "after": _summary(preview_bytes),
+            "saved_ratio": round(1 - after / before, 3) if before else 0.0,
+        },
+        "render_ms": _summary(render_ms),
+        "pool_workers": Config.PREVIEW_WORKERS,
+        "pool_previews_per_second": round(len(slips) / pool_seconds, 1) if pool_seconds else 0.0,
+    }
+    print(
+        f"before {report['bytes_per_notification']['before']['avg']} B -> "
+        f"after {report['bytes_per_notification']['after']['avg']} B per notification",
+        file=sys.stderr
+    )
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark ของ webhook (/callback) แบบ offline: LINE API ปลอม + mongod ในเครื่อง
+
+    python -m bench.run --users 200 --concurrency 8 --output bench-result.json
+
+ผลเป็น JSON (p50/p99 latency, throughput, Mongo ops ต่อ event, จำนวนเรียก LINE API) เอาไว้เทียบระหว่างเวอร์ชัน
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from bench import payloads
+from bench.stub_line import StubLineServer
+
+CHANNEL_SECRET = "bench-channel-secret"
+ADMIN_ID = payloads.user_id("admin")
+
+def _configure_env(args, stub_url):
+    # ต้องตั้งก่อน import app (Config อ่าน env ตอน import)
+    os.environ.update({
+        "PORT": "8000",
+        "CHANNEL_SECRET": CHANNEL_SECRET,
+        "CHANNEL_ACCESS_TOKEN": "bench-token",
+        "ADMIN_USER_ID": ADMIN_ID,
+        "MONGO_URI": args.mongo_uri,
+        "MONGO_DB_NAME": args.db,
+        "LINE_API_ENDPOINT": stub_url,
+        "LINE_DATA_ENDPOINT": stub_url,
+        "SCHEDULER_MODE": "off",
+        "LAZY_STARTUP": "0",
+        "AUTO_MIGRATE": "1",
+        "WEBHOOK_MODE": "sync",
+    })
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+def _mongo_ops():
+    from app.modules.metrics import MONGO_COMMAND_SECONDS
+    return sum(
+        sample.value
+        for metric in MONGO_COMMAND_SECONDS.collect()
+        for sample in metric.samples if sample.name.endswith("_count")
+    )
+
+class Runner:
+    def __init__(self, flask_app, stub, concurrency):
+        self.app = flask_app
+        self.stub = stub
+        self.concurrency = concurrency
+
+    def _post(self, events):
+        body, headers = payloads.webhook_request(events, CHANNEL_SECRET)
+        client = self.app.test_client()
+        t0 = time.perf_counter()
+        response = client.post("/callback", data=body.encode(), headers=headers)
+        return time.perf_counter() - t0, response.status_code
+
+    def run(self, name, requests):
+        """ส่ง request (list ของ list event) พร้อมกัน concurrency ตัว แล้วสรุปผล"""
+        from app.modules.outbox import outbox_worker
+
+        ops_before = _mongo_ops()
+        calls_before = self.stub.snapshot()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            results = list(pool.map(self._post, requests))
+        elapsed = time.perf_counter() - t0
+        # ส่ง push ที่ค้างใน outbox ให้หมด เพื่อให้นับ LINE API ของ scenario นี้ครบ
+        while outbox_worker.drain():
+            pass
+
+        latencies = [r[0] * 1000 for r in results]
+        events = sum(len(r) for r in requests)
+        calls_after = self.stub.snapshot()
+        return name, {
+            "requests": len(requests),
+            "events": events,
+            "errors": sum(1 for _, status in results if status != 200),
+            "seconds": round(elapsed, 3),
+            "throughput_eps": round(events / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p90_ms": round(_percentile(latencies, 90), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies, default=0.0), 2),
+            "mongo_ops_per_event": round((_mongo_ops() - ops_before) / events, 2) if events else 0.0,
+            "line_calls": {
+                k: v - calls_before.get(k, 0) for k, v in calls_after.items() if v - calls_before.get(k, 0)
+            },
+        }
+
+def _billing_text():
+    from app.utils.date_time import get_thai_month_year, calculate_next_bill_date
+    return get_thai_month_year(calculate_next_bill_date(None, 0))
+
+def build_scenarios(users):
+    """ลำดับ scenario (ต่อกันเป็นเรื่องเดียว: สมัคร -> ส่งสลิปวันที่ 13 -> แอดมินอนุมัติ)"""
+    uids = [payloads.user_id(i) for i in range(users)]
+    group = payloads.group_id(0)
+    billing = _billing_text()
+
+    def pending_approvals():
+        from app.setup.database import transactions_col
+        admin = payloads.user_source(ADMIN_ID)
+        return [
+            [payloads.postback_event(admin, f"action=approve&txid={tx['_id']}")]
+            for tx in transactions_col.find({"status": "pending"}, {"_id": 1})
+        ]
+
+    return [
+        ("follow", lambda: [[payloads.follow_event(payloads.user_source(u))] for u in uids]),
+        ("register", lambda: [
+            [payloads.text_event(payloads.user_source(u), f"#regis\nBench User{i}\nbench{i}\n0800000000\nbench{i}@example.com")]
+            for i, u in enumerate(uids)
+        ]),
+        ("group_chatter", lambda: [
+            [payloads.text_event(payloads.group_source(group, u), "55555 วันนี้กินอะไรดี")] for u in uids
+        ]),
+        ("status_check", lambda: [[payloads.text_event(payloads.user_source(u), "เช็คยอด")] for u in uids]),
+        ("slip_upload", lambda: [[payloads.image_event(payloads.user_source(u))] for u in uids]),
+        ("transfer_submit", lambda: [
+            [payloads.text_event(payloads.user_source(u), f"#โอน\nbench{i}\n41.5\n1\n{billing}")]
+            for i, u in enumerate(uids)
+        ]),
+        ("admin_approve", pending_approvals),
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline webhook benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="ffortify_bench", help="ฐานข้อมูลทดสอบ (ถูกลบทุกครั้งที่รัน)")
+    parser.add_argument("--scenarios", help="เลือกเฉพาะบาง scenario คั่นด้วย , (เช่น slip_upload,transfer_submit)")
+    parser.add_argument("--output", help="ไฟล์ผล JSON (ไม่ใส่ = พิมพ์ออก stdout)")
+    args = parser.parse_args(argv)
+
+    stub = StubLineServer().start()
+    _configure_env(args, stub.url)
+
+    from pymongo import MongoClient
+    MongoClient(args.mongo_uri).drop_database(args.db)
+
+    from app import app as flask_app
+    runner = Runner(flask_app, stub, args.concurrency)
+
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+    results = {}
+    for name, build in build_scenarios(args.users):
+        if selected and name not in selected:
+            continue
+        requests = build()
+        scenario, result = runner.run(name, requests)
+        results[scenario] = result
+        print(f"{scenario}: {result['throughput_eps']} events/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms", file=sys.stderr)
+
+    try:
+        version = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        version = None
+    report = {
+        "version": version,
+        "python": platform.python_version(),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""LINE Messaging API ปลอม: รับ reply/push/multicast (นับจำนวน) และส่งรูปสลิปปลอมให้ get_message_content"""
+import io
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image, ImageDraw
+
+_CONTENT_RE = re.compile(r"^/v2/bot/message/(\d+)/content$")
+
+def fake_slip(message_id, size=(400, 700)):
+    """
+    สลิปปลอม layout เดียวกันทุกใบ (แบบแอปธนาคารเดียวกัน) ต่างกันที่ยอด/วันที่/เลขอ้างอิง/ชื่อ
+    ไฟล์ไม่ซ้ำกันต่อ message id แต่ perceptual hash ใกล้กัน -> ได้ทดสอบเส้นทางเตือนแอดมินจริง
+    """
+    rng = random.Random(message_id)
+    width, height = size
+    img = Image.new("RGB", size, (245, 247, 250))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, height // 7], fill=(20, 120, 70))
+    draw.text((width // 12, height // 20), "Transfer successful", fill=(255, 255, 255))
+    lines = [
+        f"{rng.randint(1, 28):02d} Jan 2026 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        f"From  MEMBER {rng.randrange(10 ** 6):06d}",
+        "To    SPOTIFY FAMILY",
+        f"Amount  {rng.choice([41.5, 83, 124.5]):.2f} THB",
+        f"Ref  {rng.randrange(10 ** 12):012d}",
+    ]
+    for i, line in enumerate(lines):
+        draw.text((width // 12, height // 5 + i * height // 10), line, fill=(30, 30, 30))
+    draw.rectangle([width // 3, height * 3 // 4, width * 2 // 3, height * 3 // 4 + width // 3], outline=(30, 30, 30), width=3)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+class StubLineServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.calls = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _record(self):
+                path = _CONTENT_RE.sub("/v2/bot/message/{id}/content", self.path.split("?")[0])
+                with stub._lock:
+                    stub.calls[f"{self.command} {path}"] = stub.calls.get(f"{self.command} {path}", 0) + 1
+
+            def do_GET(self):
+                self._record()
+                m = _CONTENT_RE.match(self.path)
+                if m:
+                    self._send(200, fake_slip(int(m.group(1))), "image/jpeg")
+                else:
+                    self._send(200, json.dumps({"displayName": "bench", "userId": "Ubench"}).encode())
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self._record()
+                self._send(200, b"{}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="stub-line", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
@@ -0,0 +1,66 @@
+"""
+ตั้งค่าร่วมของ test: env ต้องตั้งก่อน import app (Config อ่านตอน import)
+test ที่ต้องใช้ MongoDB จะต่อ MONGO_TEST_URI (ค่าเริ่มต้น mongod ในเครื่อง) แล้วข้ามถ้าต่อไม่ได้
+"""
+import os
+import pytest
+
+MONGO_TEST_URI = os.environ.get("MONGO_TEST_URI", "mongodb://localhost:27017")
+TEST_DB_NAME = "ffortify_test"
+ADMIN_ID = "Uadmin"
+
+os.environ.update({
+    "PORT": "8000",
+    "CHANNEL_SECRET": "test-channel-secret",
+    "CHANNEL_ACCESS_TOKEN": "test-token",
+    "ADMIN_USER_ID": ADMIN_ID,
+    "MONGO_URI": MONGO_TEST_URI,
+    "MONGO_DB_NAME": TEST_DB_NAME,
+    "LAZY_STARTUP": "1",
+    "AUTO_MIGRATE": "0",
+    "SCHEDULER_MODE": "off",
+    "WEBHOOK_MODE": "sync",
+})
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+@pytest.fixture(scope="session")
+def mongo():
+    """MongoClient ของ test (ข้ามทั้ง test ถ้าไม่มี mongod)"""
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB not available at {MONGO_TEST_URI}: {e}")
+    client.drop_database(TEST_DB_NAME)
+    yield client
+    client.drop_database(TEST_DB_NAME)
+    client.close()
+
+@pytest.fixture
+def db(mongo):
+    """ฐานข้อมูลว่างสำหรับแต่ละ test"""
+    from app.setup.database import user_cache
+
+    database = mongo[TEST_DB_NAME]
+    for name in database.list_collection_names():
+        database.drop_collection(name)
+    user_cache.clear()
+    yield database
+
+@pytest.fixture
+def line_stub(monkeypatch):
+    """ให้ line_bot_api ส่งไป LINE API ปลอมในเครื่องแทน api.line.me (stub.snapshot() = จำนวน request ต่อ path)"""
+    from bench.stub_line import StubLineServer
+    from app.modules import line_api
+    from app.modules.handlers import postbacks
+    from app.utils.lazy import ProcessLocal
+
+    stub = StubLineServer().start()
+    api = ProcessLocal(lambda: line_api.LineApi("test-token", endpoint=stub.url))
+    monkeypatch.setattr(line_api, "line_bot_api", api)
+    monkeypatch.setattr(postbacks, "line_bot_api", api)
+    yield stub
+    stub.stop()
@@ -0,0 +1,94 @@
+import threading
+from datetime import datetime, timedelta
+from linebot.models import PostbackEvent
+from app.setup.database import create_transaction, approve_transaction, reject_transaction
+from app.modules.handlers.postbacks import _next_due_date, _notify_approved
+from app.modules.line_api import handler
+from conftest import ADMIN_ID
+
+USER_ID = "Upayer"
+CURRENT_DUE = datetime(2026, 1, 13, 23, 59, 59)
+
+def _seed(db, tx_id="tx1", billing="ก.พ. 69"):
+    db["users"].insert_one({
+        "user_id": USER_ID, "nickname": "payer", "nickname_key": "payer", "is_registered": True,
+        "next_due_date": CURRENT_DUE, "updated_at": datetime.now(),
+    })
+    create_transaction(tx_id, USER_ID, 41.5, 1, billing)
+
+def _postback(i, action, tx_id="tx1"):
+    return PostbackEvent(
+        timestamp=0, source={"type": "user", "userId": ADMIN_ID}, reply_token=f"reply-{i}",
+        postback={"data": f"action={action}&txid={tx_id}"}, webhook_event_id=f"evt-{action}-{i}",
+        delivery_context={"isRedelivery": False},
+    )
+
+def test_parallel_approve_applies_once(db, line_stub):
+    _seed(db)
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def tap(i):
+        barrier.wait()
+        try:
+            handler.dispatch(_postback(i, "approve"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=tap, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    tx = db["transactions"].find_one({"_id": "tx1"})
+    assert tx["status"] == "completed"
+    assert "approving_at" not in tx
+    # จ่าย ก.พ. 1 เดือน -> ครบกำหนด 13 มี.ค. (เลื่อนครั้งเดียว ไม่ใช่ +8 เดือน)
+    user = db["users"].find_one({"user_id": USER_ID})
+    assert user["next_due_date"] == datetime(2026, 3, 13, 23, 59, 59)
+    assert user["last_transaction_id"] == "tx1"
+    assert [doc["_id"] for doc in db["outbox"].find({"to": USER_ID})] == ["approved:tx1"]
+    assert db["billing_rollups"].find_one({"_id": "2026-02"})["paid_count"] == 1
+    # ทุกคนที่กดได้คำตอบ (สำเร็จ 1 คน ที่เหลือได้ข้อความว่าอนุมัติไปแล้ว/กำลังอนุมัติ)
+    assert line_stub.snapshot().get("POST /v2/bot/message/reply") == workers
+
+def test_in_progress_claim_blocks_approve_and_reject(db):
+    _seed(db)
+    db["transactions"].update_one({"_id": "tx1"}, {"$set": {"approving_at": datetime.now()}})
+    assert approve_transaction("tx1", _next_due_date) is None
+    assert reject_transaction("tx1") is None
+    assert db["transactions"].find_one({"_id": "tx1"})["status"] == "pending"
+
+def test_stale_claim_resumes_without_double_advance(db):
+    # approver ก่อนหน้าตายหลังอัปเดต user แต่ก่อนปิดรายการ
+    _seed(db)
+    applied_due = datetime(2026, 3, 13, 23, 59, 59)
+    db["transactions"].update_one({"_id": "tx1"}, {"$set": {"approving_at": datetime.now() - timedelta(hours=1)}})
+    db["users"].update_one({"user_id": USER_ID}, {"$set": {"next_due_date": applied_due, "last_transaction_id": "tx1"}})
+
+    # ตายหลังบันทึก outbox แล้วด้วย -> ข้อความแจ้ง user ต้องไม่ซ้ำ
+    db["outbox"].insert_one({"_id": "approved:tx1", "to": USER_ID, "status": "sent"})
+
+    tx, new_due_date = approve_transaction("tx1", _next_due_date, _notify_approved)
+    assert tx["status"] == "completed"
+    assert new_due_date == applied_due
+    assert db["users"].find_one({"user_id": USER_ID})["next_due_date"] == applied_due
+    assert "approving_at" not in db["transactions"].find_one({"_id": "tx1"})
+    assert db["outbox"].count_documents({"to": USER_ID}) == 1
+
+def test_reject_enqueues_notification_once(db, line_stub):
+    _seed(db)
+    handler.dispatch(_postback(0, "reject"))
+    handler.dispatch(_postback(1, "reject"))
+    assert db["transactions"].find_one({"_id": "tx1"})["status"] == "rejected"
+    assert [doc["_id"] for doc in db["outbox"].find({"to": USER_ID})] == ["rejected:tx1"]
+
+def test_fallback_due_date_uses_user_read_in_transaction():
+    # billing แกะไม่ได้ (ไม่มี period_start) -> ต่อจาก next_due_date ของ user ที่ approve_transaction อ่านมาให้
+    tx = {"_id": "tx9", "uid": USER_ID, "cnt_month": 2, "billing": "ค่าเพลง"}
+    future_due = datetime.now().replace(day=13, hour=23, minute=59, second=59, microsecond=0) + timedelta(days=62)
+    due = _next_due_date(tx, {"next_due_date": future_due})
+    assert (due.year * 12 + due.month) - (future_due.year * 12 + future_due.month) == 2
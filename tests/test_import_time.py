@@ -0,0 +1,51 @@
+import os
+import sys
+import subprocess
+
+# งบเวลา import แอป (cold start บน free tier) ปรับได้ด้วย IMPORT_TIME_BUDGET_MS
+IMPORT_TIME_BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", 1500))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _python(code, *flags, argv0=None):
+    env = dict(os.environ, LAZY_STARTUP="1", MONGO_URI="mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100")
+    if argv0:
+        code = f"import sys; sys.argv = [{argv0!r}, 'export', 'users']; {code}"
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+def _cumulative_us(importtime_output, module):
+    # รูปแบบ: "import time:  self [us] | cumulative | imported package"
+    for line in importtime_output.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+def test_import_time_budget():
+    # ใช้ค่าน้อยสุดจาก 3 รอบ กันเครื่องช้าชั่วคราว
+    best_ms = min(_cumulative_us(_python("import app", "-X", "importtime").stderr, "app") / 1000 for _ in range(3))
+    assert best_ms <= IMPORT_TIME_BUDGET_MS, f"import app took {best_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS} ms)"
+
+def test_lazy_import_opens_no_connections():
+    out = _python(
+        "import app\n"
+        "from app.setup.database import client\n"
+        "from app.modules.line_api import line_bot_api\n"
+        "from app.modules.scheduler import is_scheduler_running\n"
+        "from app.modules.outbox import outbox_worker\n"
+        "print(client.ready, line_bot_api.ready, is_scheduler_running(), outbox_worker.stats()['running'])"
+    ).stdout.split()
+    assert out == ["False", "False", "False", "False"]
+
+def test_cli_command_skips_warm_up():
+    # `flask export ...` ไม่ต้อง migrate / โหลด index / เปิด scheduler แม้ปิด LAZY_STARTUP
+    code = (
+        "import os; os.environ['LAZY_STARTUP'] = '0'\n"
+        "import app\n"
+        "from app.setup.database import client\n"
+        "from app.modules.outbox import outbox_worker\n"
+        "print(app._warmed_up, client.ready, outbox_worker.stats()['running'])"
+    )
+    out = _python(code, argv0="/usr/bin/flask").stdout.split()
+    assert out == ["False", "False", "False"]
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime
+import pytest
+from app.setup.migrations import migrate, verify_indexes, INDEXES, POST_MIGRATION_INDEXES
+
+def _seed(db):
+    # explain() บน collection ว่าง/ไม่มีอยู่จะได้ EOF แทน plan จริง -> ใส่ข้อมูลนิดหน่อยก่อน
+    now = datetime.now()
+    db["users"].insert_many([
+        {"user_id": f"U{i}", "nickname": f"user{i}", "nickname_key": f"user{i}", "is_registered": True,
+         "next_due_date": now, "updated_at": now, "registered_at": now}
+        for i in range(20)
+    ])
+    db["transactions"].insert_many([
+        {"_id": f"tx{i}", "uid": f"U{i}", "status": "pending", "created_at": now} for i in range(20)
+    ])
+    db["slip_hashes"].insert_one({"_id": "sha", "created_at": now, "tx_id": "tx0"})
+    db["outbox"].insert_one({"status": "pending", "next_attempt_at": now})
+
+def test_migrate_creates_every_index(db):
+    result = migrate()
+    assert not result["skipped"]
+    for col_name, models in list(INDEXES.items()) + list(POST_MIGRATION_INDEXES.items()):
+        existing = db[col_name].index_information()
+        for model in models:
+            assert model.document["name"] in existing, f"{col_name}.{model.document['name']}"
+
+def test_migrate_is_idempotent(db):
+    first = migrate()
+    second = migrate()
+    assert first["migrations"] == ["backfill_nickname_key", "backfill_billing_period", "build_billing_rollups"]
+    assert second["migrations"] == []
+    assert not any(isinstance(v, str) for v in second["indexes"].values())
+
+@pytest.mark.parametrize("name", [
+    "users by user_id", "users by nickname", "overdue users", "changed users", "expired temp slips",
+    "pending transactions by user", "new slip hashes", "due outbox messages",
+    "export transactions", "export transactions by status", "export users",
+])
+def test_query_uses_index(db, name):
+    _seed(db)
+    migrate()
+    results = {n: (ok, stages) for n, ok, stages in verify_indexes()}
+    ok, stages = results[name]
+    assert ok, f"{name}: {stages}"
+    assert any(stage in ("IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_IDHACK") for stage in stages), stages
+
+def test_nickname_unique_index_waits_for_clean_backfill(db):
+    # user เก่าก่อนมี nickname_key: "Faii" กับ "faii" ชนกันหลัง normalize
+    db["users"].insert_many([
+        {"user_id": "U1", "nickname": "Faii", "is_registered": True},
+        {"user_id": "U2", "nickname": "faii", "is_registered": True},
+    ])
+    result = migrate()
+    assert "backfill_nickname_key" in result["migrations"]
+    assert [sorted(c["user_ids"]) for c in result["nickname_collisions"]] == [["U1", "U2"]]
+    assert "nickname_key_unique" not in db["users"].index_information()
+
+    # แอดมินแก้ชื่อแล้วรันใหม่ -> สร้าง unique index ได้
+    db["users"].update_one({"user_id": "U2"}, {"$set": {"nickname": "faii2", "nickname_key": "faii2"}})
+    result = migrate()
+    assert result["nickname_collisions"] == []
+    assert "nickname_key_unique" in db["users"].index_information()
+
+def test_concurrent_workers_migrate_once(db):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(migrate())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    ran = [name for r in results for name in r["migrations"]]
+    assert sorted(ran) == sorted(set(ran))
+    assert db["migrations"].count_documents({}) == 3
@@ -0,0 +1,72 @@
+import json
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+from linebot.models import TextSendMessage
+from app.modules.line_api import LineApi
+from app.modules.line_http import PooledHttpClient
+from app.modules.metrics import LINE_API_RETRIES, LINE_SEND_FAILURES
+from app.utils.context import event_scope
+
+@pytest.fixture
+def failing_line():
+    """LINE API ปลอมที่ตอบ 500 ทุก request แล้วนับจำนวนครั้งต่อ path"""
+    calls = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            calls[self.path] = calls.get(self.path, 0) + 1
+            body = json.dumps({"message": "boom"}).encode()
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", calls
+    server.shutdown()
+
+def _api(url):
+    return LineApi("test-token", endpoint=url, http_client=partial(PooledHttpClient, max_retries=2, backoff=0))
+
+def _failures(kind):
+    return sum(
+        s.value for m in LINE_SEND_FAILURES.collect() for s in m.samples
+        if s.name.endswith("_total") and s.labels["kind"] == kind
+    )
+
+def _retries(endpoint):
+    return sum(
+        s.value for m in LINE_API_RETRIES.collect() for s in m.samples
+        if s.name.endswith("_total") and s.labels["endpoint"] == endpoint
+    )
+
+def test_reply_is_never_retried(failing_line):
+    url, calls = failing_line
+    api = _api(url)
+    before = _retries("POST /v2/bot/message/push"), _retries("POST /v2/bot/message/reply")
+    with pytest.raises(Exception):
+        api.reply_message("token", TextSendMessage(text="hi"))
+    with pytest.raises(Exception):
+        api.push_message("U1", TextSendMessage(text="hi"))
+    assert calls["/v2/bot/message/reply"] == 1
+    assert calls["/v2/bot/message/push"] == 3
+    assert (_retries("POST /v2/bot/message/push"), _retries("POST /v2/bot/message/reply")) == (before[0] + 2, before[1])
+
+def test_flush_counts_failures_instead_of_raising(failing_line):
+    url, _ = failing_line
+    api = _api(url)
+    event = SimpleNamespace(reply_token="token", source=SimpleNamespace(type="user", user_id="U1"))
+    before = _failures("reply")
+    with event_scope(event):
+        api.reply_message("token", TextSendMessage(text="hi"))
+        api.flush()
+    assert _failures("reply") == before + 1
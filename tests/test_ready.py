@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+from app import routes
+
+@pytest.fixture
+def client(monkeypatch):
+    # เฉพาะ blueprint (ไม่เรียก warm_up) + ไม่ต้องมี MongoDB จริง
+    monkeypatch.setattr(routes, "ping_database", lambda: True)
+    app = Flask(__name__)
+    app.register_blueprint(routes.bp)
+    return app.test_client()
+
+def test_ready_reports_slip_cache(client):
+    routes.slip_cache.put("slip-1", (b"x" * 10, "slip-1.jpg", "etag"), 10)
+    routes.slip_cache.get("slip-1")
+    routes.slip_cache.get("missing")
+
+    status = client.get("/ready").get_json()
+    cache = status["slip_cache"]
+    assert cache["hits"] >= 1 and cache["misses"] >= 1
+    assert {"evictions", "hit_rate", "bytes"} <= set(cache)
+
+def test_ready_reports_user_cache(client):
+    from app.setup.database import user_cache
+    from app.utils.context import event_scope
+
+    with event_scope(object()):
+        user_cache.get("U1", lambda key: {"user_id": key})
+        user_cache.get("U1", lambda key: {"user_id": key})
+
+    cache = client.get("/ready").get_json()["user_cache"]
+    assert cache["scope_hits"] >= 1 and cache["misses"] >= 1
+    assert "hit_rate" in cache
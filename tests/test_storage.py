@@ -0,0 +1,33 @@
+import pytest
+from app.setup.storage import DiskSlipStorage, GridFSSlipStorage
+
+SLIP = b"\xff\xd8" + b"slip" * 1000
+
+def _resend_twice(storage):
+    """สลิปเดิมถูกส่งสองครั้ง: ได้ file_id เดิม และ handler ขอ preview ทั้งสองครั้ง"""
+    file_id = storage.save([SLIP], "a.jpg")
+    storage.save_preview(file_id, b"preview-1")
+    assert storage.save([SLIP], "b.jpg") == file_id
+    storage.save_preview(file_id, b"preview-2")
+    return file_id
+
+def test_disk_preview_saved_once_and_deleted(tmp_path):
+    storage = DiskSlipStorage(str(tmp_path), max_bytes=0)
+    file_id = _resend_twice(storage)
+    assert storage.open_preview(file_id).read() == b"preview-1"
+    storage.delete(file_id)
+    assert not storage.has_preview(file_id)
+    assert storage.open(file_id) is None
+
+def test_gridfs_preview_saved_once_and_deleted(db):
+    storage = GridFSSlipStorage(db, max_bytes=0)
+    file_id = _resend_twice(storage)
+    previews = db["slips.files"].count_documents({"metadata.preview_of": file_id})
+    assert previews == 1
+    assert storage.open_preview(file_id).read() == b"preview-1"
+
+    # preview ซ้ำที่ค้างจากก่อนมีการเช็ค -> delete() ต้องลบทุกไฟล์
+    storage.bucket.upload_from_stream(f"{file_id}.preview.jpg", b"old", metadata={"preview_of": file_id})
+    storage.delete(file_id)
+    assert db["slips.files"].count_documents({}) == 0
+    assert db["slips.chunks"].count_documents({}) == 0
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from app.modules import duplicates
+from app.modules.duplicates import SlipHashIndex
+from app.utils.watermark import Watermark
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+def test_watermark_overlaps_and_skips_seen():
+    mark = Watermark(timedelta(seconds=60))
+    assert mark.since() is None
+    assert mark.is_new("a", T0)
+    assert mark.since() == T0 - timedelta(seconds=60)
+    assert not mark.is_new("a", T0)
+    # key เดิมแต่ timestamp ใหม่ (เช่น user แก้ชื่อ) ต้องนับเป็นของใหม่
+    assert mark.is_new("a", T0 + timedelta(seconds=1))
+
+    mark.is_new("b", T0 + timedelta(minutes=5))
+    mark.prune()
+    assert not mark.is_new("b", T0 + timedelta(minutes=5))
+    assert "a" not in mark._seen
+
+def test_slip_hash_sync_picks_up_late_insert(monkeypatch):
+    store = [{"_id": "sha-1", "phash": "0f" * 8, "created_at": T0}]
+
+    def iter_slip_hashes(since=None):
+        return [doc for doc in store if since is None or doc["created_at"] >= since]
+
+    monkeypatch.setattr(duplicates, "iter_slip_hashes", iter_slip_hashes)
+    index = SlipHashIndex(max_distance=4)
+    index._sync()
+
+    # worker อื่น insert ทีหลังแต่ created_at เก่ากว่าตัวล่าสุดที่เห็น
+    store.append({"_id": "sha-2", "phash": "f0" * 8, "created_at": T0 - timedelta(seconds=1)})
+    index._last_sync = 0
+    index._sync()
+
+    assert index._tree.size == 2
+    assert [item for _, _, item in index._tree.search(int("f0" * 8, 16), 0)] == ["sha-2"]
+
+def test_user_search_sync_picks_up_late_rename(monkeypatch):
+    from app.modules import user_search as module
+
+    store = {
+        "U1": {"user_id": "U1", "nickname": "faii", "first_name": "A", "updated_at": T0},
+        "U2": {"user_id": "U2", "nickname": "mook", "first_name": "B", "updated_at": T0},
+    }
+
+    def iter_users_for_search(since=None):
+        return [dict(u) for u in store.values() if since is None or u["updated_at"] >= since]
+
+    monkeypatch.setattr(module, "iter_users_for_search", iter_users_for_search)
+    index = module.UserSearchIndex()
+    index.sync(force=True)
+
+    # worker อื่นเปลี่ยนชื่อ U2 ด้วยเวลาเท่ากับ/เก่ากว่าตัวล่าสุดที่ process นี้เห็น
+    store["U2"] = {"user_id": "U2", "nickname": "ploy", "first_name": "B", "updated_at": T0 - timedelta(seconds=1)}
+    index.sync(force=True)
+
+    assert [u["user_id"] for u in index.search("ploy")] == ["U2"]
+    assert [u["user_id"] for u in index.search("faii")] == ["U1"]
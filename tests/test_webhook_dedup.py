@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+import pytest
+from linebot.models import FollowEvent, MessageEvent, TextMessage
+from app.modules.router import CommandRouter
+from app.modules.webhook import EventDeduplicator, EventHandler
+
+@pytest.fixture
+def store():
+    """store กลางของ marker (แทน collection webhook_events)"""
+    return set()
+
+@pytest.fixture
+def dedup(store):
+    def mark(event_id):
+        if event_id in store:
+            return False
+        store.add(event_id)
+        return True
+
+    return EventDeduplicator(mark, store.discard)
+
+def _handler(dedup, func):
+    handler = EventHandler("test-channel-secret", dedup=dedup)
+    handler.add(FollowEvent)(func)
+    return handler
+
+def _event(event_id="evt-1"):
+    return FollowEvent(
+        timestamp=0, source={"type": "user", "userId": "U1"}, reply_token="r",
+        webhook_event_id=event_id, delivery_context={"isRedelivery": False},
+    )
+
+def test_failed_handler_releases_marker(dedup, store):
+    calls = []
+
+    def flaky(event):
+        calls.append(event.webhook_event_id)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    handler = _handler(dedup, flaky)
+    with pytest.raises(RuntimeError):
+        handler.dispatch(_event())
+    assert store == set()
+
+    # LINE ส่งซ้ำ -> ต้องประมวลผลใหม่ ไม่ใช่ถูกทิ้งเป็น duplicate
+    handler.dispatch(_event())
+    assert calls == ["evt-1", "evt-1"]
+    assert store == {"evt-1"}
+    assert dedup.stats()["duplicates"] == 0
+
+def test_successful_handler_keeps_marker(dedup, store):
+    calls = []
+    handler = _handler(dedup, lambda event: calls.append(event.webhook_event_id))
+    handler.dispatch(_event())
+    handler.dispatch(_event())
+    assert calls == ["evt-1"]
+    assert store == {"evt-1"}
+    assert dedup.stats()["duplicates"] == 1
+
+def test_release_without_unmark_only_clears_lru():
+    dedup = EventDeduplicator(lambda event_id: True)
+    event = SimpleNamespace(webhook_event_id="evt-2")
+    assert not dedup.is_duplicate(event)
+    dedup.release(event)
+    assert dedup.stats()["cached"] == 0
+
+def test_filtered_chatter_skips_dedup(dedup, store):
+    router = CommandRouter(lambda user_id, reply_token: True)
+    routed = []
+    router.command("menu", r"^น้องฝอย")(lambda ctx: routed.append(ctx.msg))
+
+    handler = EventHandler("test-channel-secret", dedup=dedup)
+    handler.add(MessageEvent, message=TextMessage)(lambda event: router.route(event, event.message.text.strip()))
+    handler.filter(lambda event: router.matches(event.message.text.strip()))
+
+    def text(event_id, msg):
+        return MessageEvent(
+            timestamp=0, source={"type": "group", "groupId": "G1", "userId": "U1"}, reply_token="r",
+            message=TextMessage(id="m", text=msg), webhook_event_id=event_id,
+            delivery_context={"isRedelivery": False},
+        )
+
+    handler.dispatch(text("evt-chat", "กินข้าวยัง"))
+    handler.dispatch(text("evt-cmd", "น้องฝอย"))
+    assert store == {"evt-cmd"}
+    assert routed == ["น้องฝอย"]
+    assert router.stats()["unmatched"] == 1
@@ -0,0 +1,28 @@
+import threading
+import time
+from types import SimpleNamespace
+from app.modules.webhook import EventQueue
+
+class BlockingHandler:
+    """handler ที่ค้างจนกว่าจะปล่อย (จำลอง event ที่ประมวลผลนาน)"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def dispatch(self, event, payload=None):
+        self.started.set()
+        self.release.wait(5)
+
+def test_shutdown_with_full_queue_respects_drain_timeout():
+    handler = BlockingHandler()
+    events = EventQueue(handler, workers=1, maxsize=1, drain_timeout=0.3)
+    events.submit(SimpleNamespace(events=[SimpleNamespace(name="first")]))
+    assert handler.started.wait(1)
+    # worker ค้างอยู่ + คิวเต็ม -> ใส่ sentinel ไม่ได้
+    events._queue.put_nowait((SimpleNamespace(name="second"), None, time.monotonic()))
+
+    t0 = time.monotonic()
+    events.shutdown()
+    assert time.monotonic() - t0 < 1.0
+    handler.release.set()